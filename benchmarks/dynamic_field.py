@@ -0,0 +1,41 @@
+""" Benchmark the evaluation of dynamic fields.
+
+Compares the compiled evaluation of `DynamicField` (`generate_value`) with the
+token by token interpretation of its AST (`interpret`).
+
+Usage: python benchmarks/dynamic_field.py [number of evaluations]
+(with factory_boss installed, e.g., via `poetry install`)
+"""
+import sys
+import timeit
+
+from factory_boss.value_spec import DynamicField, Literal
+
+TEMPLATES = {
+    "passthrough": "$street",
+    "template": "$street $housenumber, $postcode $city",
+    "long template": "Dear $title $name, your order $order_id ships to $street $city.",
+}
+
+
+def resolved_references(field: DynamicField):
+    """ Resolve all references of `field` to constant literals """
+    return {ref: Literal(f"<{ref.target}>") for ref in field.references()}
+
+
+def main(n: int = 100_000):
+    print(f"{'field':<15} {'interpreted':>12} {'compiled':>12} {'speedup':>8}")
+    for label, code in TEMPLATES.items():
+        field = DynamicField(code, type="string")
+        refs = resolved_references(field)
+        assert field.generate_value(refs) == field.interpret(refs)
+        interpreted = timeit.timeit(lambda: field.interpret(refs), number=n)
+        compiled = timeit.timeit(lambda: field.generate_value(refs), number=n)
+        print(
+            f"{label:<15} {interpreted / n * 1e6:>10.2f}us {compiled / n * 1e6:>10.2f}us"
+            f" {interpreted / compiled:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
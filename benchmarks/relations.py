@@ -0,0 +1,70 @@
+""" Benchmark the creation of relations for deep "create(a, b)" chains.
+
+Every level of the chain creates between one and three instances of the next
+level, so the number of created instances grows with the depth of the chain. The
+time per instance should stay constant when the number of root instances grows,
+i.e., relation creation scales linearly.
+
+Usage: python benchmarks/relations.py [depth] [largest number of roots]
+(with factory_boss installed, e.g., via `poetry install`)
+"""
+import gc
+import sys
+import time
+from typing import Any, Dict
+
+from factory_boss.generator import Generator
+from factory_boss.spec_parser.parser import SpecParser
+
+
+def chain_schema(depth: int = 6) -> Dict:
+    """ Schema of entities Level0 to Level<depth>, each creating the next level """
+    entities = {}
+    for level in range(depth + 1):
+        fields: Dict[str, Any] = {"id": {"type": "integer"}}
+        if level < depth:
+            fields["children"] = {
+                "type": "relation",
+                "relation_type": "1tm",
+                "to": f"Level{level + 1}.parent_id",
+                "local_field": "id",
+                "remote_name": "parent",
+                "mock": {"relation_strategy": "create(1, 3)"},
+            }
+        entities[f"Level{level}"] = {"count": 0, "fields": fields}
+    return {"entities": entities}
+
+
+def chain_spec(depth: int):
+    """ Parsed `chain_schema` """
+    return SpecParser().parse(chain_schema(depth))
+
+
+def make_relations(generator: Generator, roots: int):
+    """ Return the number of instances and the seconds to make their relations """
+    # the cyclic garbage collector scans all live objects, which would add a
+    # superlinear term to the measurement that is unrelated to relation creation
+    gc.collect()
+    gc.disable()
+    try:
+        instances = generator.make_instances({"Level0": roots})
+        start = time.perf_counter()
+        instances = generator.make_relations(instances)
+        return len(instances), time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def main(depth: int = 6, max_roots: int = 8000):
+    generator = Generator(chain_spec(depth), seed=0)
+    generator.complete_relation_specs(generator.spec["entities"])
+    print(f"{'roots':>8} {'instances':>10} {'seconds':>8} {'us/instance':>12}")
+    roots = max(max_roots // 8, 1)
+    while roots <= max_roots:
+        n, seconds = make_relations(generator, roots)
+        print(f"{roots:>8} {n:>10} {seconds:>8.3f} {seconds / n * 1e6:>12.2f}")
+        roots *= 2
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,256 @@
+""" Benchmark suite: throughput, peak memory and time per phase of generation.
+
+Every case is a synthetic schema of a certain shape, generated with a number of
+root rows:
+
+* wide: one entity with 80 fields of all types;
+* chain: a deep chain of "create(1, 3)" relations;
+* fan_in: many rows picking their targets from a few rows with "pick_random";
+* self_1t1: a one-to-one relation of an entity to itself, created per row;
+* template: dynamic fields formatting several references.
+
+Each case runs in a fresh process, so that the peak RSS is the peak of that case.
+The objects backend is timed phase by phase, the columnar backend as a whole.
+References are resolved while values are evaluated, so their resolution is part
+of the "execute_plan" phase.
+
+Usage (with factory_boss installed, e.g., via `poetry install`)::
+
+    python benchmarks/suite.py --sizes 1000 10000 --output before.json
+    ... change the code ...
+    python benchmarks/suite.py --sizes 1000 10000 --output after.json
+    python benchmarks/suite.py --compare before.json after.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+# benchmarks/relations.py: scripts find the modules next to them
+from relations import chain_schema
+
+from factory_boss.generator import Generator
+from factory_boss.spec_parser.parser import SpecParser
+from factory_boss.stats import peak_rss_mb
+
+
+def wide_schema() -> Dict:
+    fields: Dict[str, Any] = {"id": {"type": "integer"}}
+    for i in range(20):
+        fields[f"int_{i}"] = {"type": "integer"}
+        fields[f"str_{i}"] = {"type": "string"}
+        fields[f"date_{i}"] = {"type": "date"}
+    for i in range(19):
+        fields[f"name_{i}"] = {"type": "string", "mock": {"faker": "first_name"}}
+    return {"entities": {"Wide": {"fields": fields}}}
+
+
+def fan_in_schema() -> Dict:
+    return {
+        "entities": {
+            "Shop": {"count": 10, "fields": {"shop_id": {"type": "integer"}}},
+            "Sale": {
+                "fields": {
+                    "sale_id": {"type": "integer"},
+                    "shop": {
+                        "type": "relation",
+                        "relation_type": "mt1",
+                        "to": "Shop.shop_id",
+                        "local_field": "shop_id",
+                        "remote_name": "sales",
+                        "mock": {"relation_strategy": "pick_random"},
+                    },
+                }
+            },
+        }
+    }
+
+
+def self_1t1_schema() -> Dict:
+    return {
+        "entities": {
+            "Person": {
+                "fields": {
+                    "person_id": {"type": "integer"},
+                    "name": {"type": "string", "mock": {"faker": "name"}},
+                    "partner": {
+                        "type": "relation",
+                        "relation_type": "1t1",
+                        "to": "Person.person_id",
+                        "local_field": "partner_id",
+                        "remote_name": "partner",
+                        "mock": {"relation_strategy": "create"},
+                    },
+                }
+            }
+        }
+    }
+
+
+def template_schema() -> Dict:
+    fields: Dict[str, Any] = {
+        "street": {"type": "string", "mock": {"faker": "street_name"}},
+        "number": {"type": "integer"},
+        "postcode": {"type": "string"},
+        "city": {"type": "string", "mock": {"faker": "city"}},
+    }
+    for i in range(10):
+        fields[f"line_{i}"] = {
+            "type": "string",
+            "mock": f"{i}: $street $number, ${{postcode[:5]}} $city",
+        }
+    return {"entities": {"Letter": {"fields": fields}}}
+
+
+CASES: Dict[str, Callable[[], Dict]] = {
+    "wide": wide_schema,
+    "chain": chain_schema,
+    "fan_in": fan_in_schema,
+    "self_1t1": self_1t1_schema,
+    "template": template_schema,
+}
+""" schema per case """
+
+ROOTS = {"wide": "Wide", "chain": "Level0", "fan_in": "Sale"}
+""" entity whose number of root rows is set by the size, if not the only one """
+
+
+def run_case(case: str, size: int, backend: str) -> Dict[str, Any]:
+    """ Generate `case` with `size` root rows and return the measurements """
+    spec = SpecParser().parse(CASES[case]())
+    entities = spec["entities"]
+    root = ROOTS.get(case, next(iter(entities)))
+    counts = {root: size}
+    generator = Generator(spec, backend=backend, seed=0)
+    phases: Dict[str, float] = {}
+
+    def timed(phase: str, func: Callable, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        phases[phase] = time.perf_counter() - start
+        return result
+
+    start = time.perf_counter()
+    if backend == "objects":
+        generator.complete_relation_specs(entities)
+        counts = generator.instance_counts(counts)
+        instances = timed("make_instances", generator.make_instances, counts)
+        instances = timed("make_relations", generator.make_relations, instances)
+        plan = timed("make_plan", generator.make_plan, instances)
+        timed("execute_plan", generator.execute_plan, plan)
+        output = timed(
+            "instances_to_dict", generator.instances_to_dict, instances, False
+        )
+    else:
+        output = generator.generate(False, counts)
+    seconds = time.perf_counter() - start
+    rows = sum(len(rows) for rows in output.values())
+    return {
+        "case": case,
+        "size": size,
+        "backend": backend,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "phases": phases,
+    }
+
+
+def run_in_subprocess(case: str, size: int, backend: str) -> Dict[str, Any]:
+    command = [sys.executable, __file__, "--run", case, str(size), backend]
+    result = subprocess.run(command, check=True, stdout=subprocess.PIPE)
+    return json.loads(result.stdout)
+
+
+def git_commit() -> str:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        return result.stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(cases: List[str], sizes: List[int], backends: List[str]) -> Dict:
+    results = []
+    for case in cases:
+        for size in sizes:
+            for backend in backends:
+                result = run_in_subprocess(case, size, backend)
+                print(
+                    f"{case:<10} {size:>8} {backend:<9} {result['rows']:>9} rows "
+                    f"{result['rows_per_second']:>10,.0f} rows/s "
+                    f"{result['peak_rss_mb']:>8.1f} MB",
+                    file=sys.stderr,
+                )
+                results.append(result)
+    return {
+        "commit": git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(before_path: str, after_path: str):
+    """ Print the change of throughput and peak memory between two result files """
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    baseline = {(r["case"], r["size"], r["backend"]): r for r in before["results"]}
+    print(f"{'case':<10} {'size':>8} {'backend':<9} {'speed':>8} {'memory':>8}")
+    for result in after["results"]:
+        old = baseline.get((result["case"], result["size"], result["backend"]))
+        if old is None:
+            continue
+        speed = result["rows_per_second"] / old["rows_per_second"]
+        memory = result["peak_rss_mb"] / old["peak_rss_mb"]
+        print(
+            f"{result['case']:<10} {result['size']:>8} {result['backend']:<9} "
+            f"{speed:>7.2f}x {memory:>7.2f}x"
+        )
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=Generator.BACKENDS,
+        default=list(Generator.BACKENDS),
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two results"
+    )
+    parser.add_argument("--run", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.run:
+        case, size, backend = args.run
+        print(json.dumps(run_case(case, int(size), backend)))
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        results = run_suite(args.cases, args.sizes, args.backends)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        else:
+            print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
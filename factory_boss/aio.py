@@ -0,0 +1,46 @@
+""" Helpers to drive the synchronous generation from an asyncio event loop. """
+import asyncio
+from concurrent.futures import Executor
+from typing import AsyncIterator, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def iterate_in_executor(
+    iterator: Iterator[T], executor: Executor = None
+) -> AsyncIterator[T]:
+    """Yield the items of `iterator`, computing each one in `executor`.
+
+    The next item is computed while the current one is consumed. `iterator` is
+    never advanced by two threads at once, and it is closed when the iteration
+    ends, also if it is ended early.
+
+    Parameters
+    ----------
+    iterator : Iterator
+        e.g., `Generator.iter_batches`
+    executor : Executor, optional
+        executor which advances the iterator, typically a `ThreadPoolExecutor`.
+        Default: None, i.e., the default executor of the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    pending = loop.run_in_executor(executor, next, iterator, _DONE)
+    try:
+        while True:
+            item = await pending
+            if item is _DONE:
+                return
+            pending = loop.run_in_executor(executor, next, iterator, _DONE)
+            yield item
+    finally:
+        if not pending.done():
+            # the iterator cannot be closed while it is being advanced
+            await asyncio.wait([pending])
+        if not pending.cancelled():
+            # retrieve the exception of a prefetched item nobody will consume
+            pending.exception()
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,206 @@
+""" Generation of instances batch by batch. """
+from typing import TYPE_CHECKING, Any, Dict, List, Set, Tuple
+
+from factory_boss.columnar import ColumnarEngine
+from factory_boss.instance import Instance
+from factory_boss.relation_maker import RelationMaker
+
+if TYPE_CHECKING:
+    from factory_boss.generator import Generator
+
+Rows = List[Tuple[str, Dict[str, Any]]]
+Fingerprints = List[Set[int]]
+""" fingerprints of the values of each unique field, see `Generator.unique_values` """
+
+
+class BatchRunner:
+    """Generate batches of root instances and return their flat rows.
+
+    The first batch contains the targets of "pick_random" relations. It is kept, so
+    that all later batches can pick them. Every later batch is released as soon as
+    its rows have been returned, which restores the state after the first batch.
+
+    The keys of the root instances are derived from their indices with the random
+    streams of the generator. Hence the rows of a batch only depend on the seed,
+    the kept batch and the root instances of the batch, no matter in which process
+    and in which order the batches are generated.
+
+    Unique fields are only unique within a batch, until the batches are passed to
+    `merge` in order, in the main process.
+
+    Parameters
+    ----------
+    generator : Generator
+        the generator whose spec is generated
+    columns : Dict[str, List[str]], optional
+        fields to output per entity. Default: all fields
+    shards : int, optional
+        number of batches of the run. Every batch is one shard, see
+        `ValueSpec.start_shard`. Default: 1
+    """
+
+    def __init__(
+        self,
+        generator: "Generator",
+        columns: Dict[str, List[str]] = None,
+        shards: int = 1,
+    ):
+        self.generator = generator
+        self.columns = columns or {}
+        self.shards = shards
+        self.kept = False
+        self.merged: Fingerprints = [set() for _ in generator.unique_values()]
+
+    def run(self, batch: Dict[str, range], shard: int = 0) -> Tuple[Rows, Fingerprints]:
+        """Generate the root instances with indices `batch` and their relations
+
+        `shard` is the number of the batch in the run. Returns the rows and the
+        fingerprints of the values of the unique fields in the batch.
+        """
+        generator = self.generator
+        generator.start_shard(shard, self.shards)
+        rows = self.generate(batch)
+        fingerprints = [unique.fingerprints for unique in generator.unique_values()]
+        if not self.kept:
+            self.keep()
+            self.kept = True
+        else:
+            self.release()
+        return rows, fingerprints
+
+    def merge(
+        self,
+        batch: Dict[str, range],
+        shard: int,
+        rows: Rows,
+        fingerprints: Fingerprints,
+    ) -> Rows:
+        """Merge the result of `run` into the run, in the order of the batches.
+
+        If the batch repeats a value of a unique field of an earlier batch, it is
+        generated again in this process, excluding the values of all earlier
+        batches. Hence unique fields are unique in the whole run, and the rows do
+        not depend on which process has generated which batch.
+        """
+        merged = self.merged
+        if any(new & old for new, old in zip(fingerprints, merged)):
+            uniques = self.generator.unique_values()
+            excluded = [unique.excluded for unique in uniques]
+            for unique, old in zip(uniques, merged):
+                unique.excluded = unique.excluded | old
+            try:
+                rows, fingerprints = self.run(batch, shard)
+            finally:
+                for unique, values in zip(uniques, excluded):
+                    unique.excluded = values
+        for new, old in zip(fingerprints, merged):
+            old.update(new)
+        return rows
+
+    def generate(self, batch: Dict[str, range]) -> Rows:
+        raise NotImplementedError
+
+    def keep(self):
+        """ Keep the batch which has just been generated """
+        raise NotImplementedError
+
+    def release(self):
+        """ Release the batch which has just been generated """
+        raise NotImplementedError
+
+
+class ObjectBatchRunner(BatchRunner):
+    """ Generate batches as `Instance`s """
+
+    def __init__(
+        self,
+        generator: "Generator",
+        columns: Dict[str, List[str]] = None,
+        shards: int = 1,
+    ):
+        super().__init__(generator, columns, shards)
+        self.relation_maker = RelationMaker(
+            [], generator.entities, profiler=generator.profiler
+        )
+        self.checkpoint: Dict[str, int] = None
+        self.instances: List[Instance] = []
+
+    def generate(self, batch: Dict[str, range]) -> Rows:
+        generator = self.generator
+        instances = generator.make_instances(
+            counts={ename: len(indices) for ename, indices in batch.items()},
+            first_index={ename: indices.start for ename, indices in batch.items()},
+        )
+        instances = generator.make_relations(instances, self.relation_maker)
+        if not generator.lazy:
+            plan = generator.make_plan(instances)
+            generator.execute_plan(plan)
+        self.instances = instances
+        if generator.profiler is not None:
+            with generator.profiler.phase("instances_to_dict"):
+                return self.rows(instances)
+        return self.rows(instances)
+
+    def rows(self, instances: List[Instance]) -> Rows:
+        """ Return the flat rows of `instances` """
+        columns = self.columns
+        return [
+            (
+                instance.entity.name,
+                instance.to_dict(
+                    with_related_objects=False,
+                    fields=columns.get(instance.entity.name),
+                ),
+            )
+            for instance in instances
+        ]
+
+    def keep(self):
+        self.checkpoint = self.relation_maker.snapshot()
+        self.relation_maker.link_picked_targets = False
+        self.instances = []
+
+    def release(self):
+        self.relation_maker.restore(self.checkpoint)
+        for instance in self.instances:
+            instance.release()
+        self.instances = []
+
+
+class ColumnarBatchRunner(BatchRunner):
+    """ Generate batches into the `ColumnTable`s of a `ColumnarEngine` """
+
+    def __init__(
+        self,
+        generator: "Generator",
+        columns: Dict[str, List[str]] = None,
+        shards: int = 1,
+    ):
+        super().__init__(generator, columns, shards)
+        self.engine = ColumnarEngine(
+            generator.entities, generator.streams, generator.profiler
+        )
+        self.checkpoint: Dict[str, int] = None
+
+    def generate(self, batch: Dict[str, range]) -> Rows:
+        engine = self.engine
+        start = engine.snapshot()
+        for ename, indices in batch.items():
+            engine.add_rows(ename, len(indices), indices.start)
+        engine.make_relations()
+        engine.evaluate()
+        rows = []
+        for ename, table in engine.tables.items():
+            fields = self.columns.get(ename)
+            for row in table.rows(start[ename]):
+                if fields is not None:
+                    row = {f: row[f] for f in fields if f in row}
+                rows.append((ename, row))
+        return rows
+
+    def keep(self):
+        self.checkpoint = self.engine.snapshot()
+        self.engine.link_picked_targets = False
+
+    def release(self):
+        self.engine.restore(self.checkpoint)
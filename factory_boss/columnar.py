@@ -0,0 +1,800 @@
+""" Columnar (struct-of-arrays) storage and generation of instances.
+
+Instead of one `Instance` with one `InstanceValue` per field, the rows of an
+entity are stored in a `ColumnTable`: one list per value field and one array of
+row indices per relation. `ColumnarInstance` is a thin view on one row of a table.
+"""
+import time
+from array import array
+from graphlib import CycleError, TopologicalSorter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from factory_boss.entity import Entity
+from factory_boss.errors import ConfigurationError
+from factory_boss.instance import Instance
+from factory_boss.profiling import Profiler
+from factory_boss.random_streams import (
+    RandomStreams,
+    child_keys,
+    randint,
+    value_seed,
+    value_seeds,
+)
+from factory_boss.target_index import TargetIndex
+from factory_boss.value_spec import Reference, RelationSpec, ValueSpec
+
+NO_ROW = -1
+""" row index of an unset relation """
+
+
+class Variant:
+    """Set of relation overrides the rows of a table are created with.
+
+    Parameters
+    ----------
+    index : int
+        index of the variant in `ColumnTable.variants`
+    overrides : Dict[str, ValueSpec]
+        the relation overrides
+    context : ColumnTable
+        table of the creating rows, in whose context the overrides are evaluated
+    """
+
+    def __init__(
+        self,
+        index: int,
+        overrides: Dict[str, ValueSpec],
+        context: "ColumnTable" = None,
+    ):
+        self.index = index
+        self.overrides = overrides
+        self.context = context
+
+
+class ColumnTable:
+    """All generated rows of one entity, stored column by column.
+
+    * value fields are stored in one list per field,
+    * many-to-one and one-to-one relations are stored as arrays of row indices
+      into the target table (`links`),
+    * one-to-many relations with a "create" strategy are stored as the first row
+      index and the number of created rows in the target table (`ranges`),
+    * all other one-to-many relations are the inverse of a link of the target
+      table and are looked up on demand.
+
+    Additionally, each row stores its 64-bit key (see `factory_boss.random_streams`),
+    its index among the root rows of the entity (`NO_ROW` for created rows), the
+    index of its `Variant` and the row index of the creating row in the variant's
+    context table.
+    """
+
+    def __init__(self, entity: Entity, tables: Dict[str, "ColumnTable"]):
+        self.entity = entity
+        self.name = entity.name
+        self.tables = tables
+        self.n_rows = 0
+        self.value_fields: List[str] = []
+        self.relation_fields: List[Tuple[str, RelationSpec]] = []
+        self.columns: Dict[str, List[Any]] = {}
+        self.links: Dict[str, array] = {}
+        self.ranges: Dict[str, Tuple[array, array]] = {}
+        self.inverse: Dict[str, Tuple[str, Optional[str]]] = {}
+        for fname, spec in entity.fields.items():
+            if not isinstance(spec, RelationSpec):
+                self.value_fields.append(fname)
+                self.columns[fname] = []
+                continue
+            self.relation_fields.append((fname, spec))
+            if spec.relation_type != RelationSpec.ONE_TO_MANY:
+                self.links[fname] = array("q")
+            elif spec.relation_strategy.startswith("create"):
+                self.ranges[fname] = (array("q"), array("q"))
+            else:
+                self.inverse[fname] = (spec.target_entity, spec.remote_name)
+        self.keys = array("Q")
+        self.indices = array("q")
+        self.variant = array("L")
+        self.context = array("q")
+        self.variants: List[Variant] = [Variant(0, {})]
+        self._variants_by_overrides: Dict[Tuple[int, str], Variant] = {}
+        self._inverse_cache: Dict[str, Tuple[int, Dict[int, List[int]]]] = {}
+        self._dict_cache: Dict[int, Dict[str, Any]] = {}
+
+    def variant_for(
+        self, overrides: Dict[str, ValueSpec], context: "ColumnTable"
+    ) -> Variant:
+        """ Return the variant for rows created by `context` with `overrides` """
+        if not overrides:
+            return self.variants[0]
+        key = (id(overrides), context.name)
+        try:
+            return self._variants_by_overrides[key]
+        except KeyError:
+            variant = Variant(len(self.variants), overrides, context)
+            self.variants.append(variant)
+            self._variants_by_overrides[key] = variant
+            return variant
+
+    def append_rows(
+        self,
+        keys: List[int],
+        variant: Variant = None,
+        context: int = NO_ROW,
+        first_index: int = NO_ROW,
+    ) -> int:
+        """Append empty rows with `keys` and return the index of the first one.
+
+        Root rows pass the `first_index` of the first row among all root rows.
+        """
+        first = self.n_rows
+        n = len(keys)
+        self.n_rows += n
+        self.keys.extend(keys)
+        if first_index == NO_ROW:
+            self.indices.extend([NO_ROW] * n)
+        else:
+            self.indices.extend(range(first_index, first_index + n))
+        self.variant.extend([variant.index if variant else 0] * n)
+        self.context.extend([context] * n)
+        for link in self.links.values():
+            link.extend([NO_ROW] * n)
+        for starts, counts in self.ranges.values():
+            starts.extend([0] * n)
+            counts.extend([0] * n)
+        return first
+
+    def truncate(self, n: int):
+        """ Drop all rows with index `n` or higher """
+        self.n_rows = min(self.n_rows, n)
+        arrays = [
+            self.keys,
+            self.indices,
+            self.variant,
+            self.context,
+            *self.links.values(),
+        ]
+        for starts, counts in self.ranges.values():
+            arrays += [starts, counts]
+        for values in arrays + list(self.columns.values()):
+            del values[n:]
+        self._inverse_cache.clear()
+        self._dict_cache.clear()
+
+    def instance(self, row: int) -> Optional["ColumnarInstance"]:
+        if row == NO_ROW:
+            return None
+        return ColumnarInstance(self, row)
+
+    def value(self, name: str, row: int) -> Any:
+        """ Return the value of field `name` of `row` """
+        if name in self.columns:
+            return self.columns[name][row]
+        elif name in self.links:
+            return self.tables[self.entity.fields[name].target_entity].instance(
+                self.links[name][row]
+            )
+        elif name in self.ranges:
+            target = self.tables[self.entity.fields[name].target_entity]
+            starts, counts = self.ranges[name]
+            return [
+                target.instance(r)
+                for r in range(starts[row], starts[row] + counts[row])
+            ]
+        elif name in self.inverse:
+            target = self.tables[self.inverse[name][0]]
+            return [target.instance(r) for r in self.inverse_rows(name).get(row, [])]
+        else:
+            raise KeyError(f"{self.name} has no field '{name}'")
+
+    def inverse_rows(self, name: str) -> Dict[int, List[int]]:
+        """ Return the rows of the target table per row for an inverse relation """
+        target_name, remote_name = self.inverse[name]
+        target = self.tables[target_name]
+        cached = self._inverse_cache.get(name)
+        if cached is not None and cached[0] == target.n_rows:
+            return cached[1]
+        rows: Dict[int, List[int]] = {}
+        if remote_name is not None:
+            for trow, row in enumerate(target.links[remote_name]):
+                if row != NO_ROW:
+                    rows.setdefault(row, []).append(trow)
+        self._inverse_cache[name] = (target.n_rows, rows)
+        return rows
+
+    def rows(self, start: int = 0, stop: int = None) -> Iterator[Dict[str, Any]]:
+        """ Yield flat rows (without relations) from `start` to `stop` """
+        if stop is None:
+            stop = self.n_rows
+        columns = [(fname, self.columns[fname]) for fname in self.value_fields]
+        for row in range(start, stop):
+            yield {fname: values[row] for fname, values in columns}
+
+    def __repr__(self):
+        return f"ColumnTable('{self.name}', {self.n_rows} rows)"
+
+
+class ColumnarInstance(Instance):
+    """ View on one row of a `ColumnTable` """
+
+    def __init__(self, table: ColumnTable, row: int):
+        self.entity = table.entity
+        self.table = table
+        self.row = row
+
+    def ivalue(self, name):
+        raise NotImplementedError("Columnar instances do not have InstanceValues")
+
+    def value(self, name):
+        return self.table.value(name, self.row)
+
+    def to_dict(
+        self, with_related_objects: bool = True, fields: List[str] = None
+    ) -> Dict[str, Any]:
+        """Return all values of this row as a dictionary.
+
+        See `Instance.to_dict`.
+        """
+        if fields is not None:
+            d = {}
+            for fname in fields:
+                if fname not in self.table.value_fields:
+                    if not with_related_objects:
+                        continue
+                    value = self.value(fname)
+                    if isinstance(value, Instance):
+                        value = value.to_dict()
+                    if isinstance(value, list):
+                        value = [v.to_dict() for v in value]
+                else:
+                    value = self.table.columns[fname][self.row]
+                d[fname] = value
+            return d
+        if not with_related_objects:
+            return {
+                fname: self.table.columns[fname][self.row]
+                for fname in self.table.value_fields
+            }
+        cache = self.table._dict_cache
+        if self.row not in cache:
+            # register the dict before filling it, so that cycles terminate
+            d = cache[self.row] = {}
+            for fname in self.entity.fields:
+                value = self.value(fname)
+                if isinstance(value, Instance):
+                    value = value.to_dict()
+                if isinstance(value, list):
+                    value = [v.to_dict() for v in value]
+                d[fname] = value
+        return cache[self.row]
+
+    def release(self):
+        pass
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ColumnarInstance)
+            and self.table is other.table
+            and self.row == other.row
+        )
+
+    def __hash__(self):
+        return hash((id(self.table), self.row))
+
+    def __repr__(self):
+        return f"ColumnarInstance('{self.entity.name}', row={self.row})"
+
+
+class _Cursor:
+    """ Row in whose context references are currently evaluated """
+
+    __slots__ = ("row",)
+
+    def __init__(self):
+        self.row = NO_ROW
+
+
+class _ColumnReference:
+    """A reference which looks up its value through a compiled path of links.
+
+    It takes the place of a `ResolvedReference`, but is bound to a field of a
+    table instead of a single instance: its value is looked up for the current row
+    of the cursor. Hence, one object serves all rows.
+    """
+
+    __slots__ = ("cursor", "links", "getter")
+
+    def __init__(
+        self, cursor: _Cursor, links: List[array], getter: Callable[[int], Any]
+    ):
+        self.cursor = cursor
+        self.links = links
+        self.getter = getter
+
+    def value(self):
+        row = self.cursor.row
+        for link in self.links:
+            row = link[row]
+            if row == NO_ROW:
+                return None
+        return self.getter(row)
+
+
+class ColumnarEngine:
+    """Generate instances of all entities into `ColumnTable`s.
+
+    Usage: add root rows with `add_rows`, then call `make_relations` and
+    `evaluate`. Both only process rows which have been added since their last call,
+    so the engine can generate in batches. Use `snapshot` and `restore` to drop
+    the rows of a batch again.
+
+    Parameters
+    ----------
+    entities : Dict[str, Entity]
+        all entities of the spec
+    streams : RandomStreams, optional
+        random streams from which the keys of root rows are derived. Default: a
+        new `RandomStreams` with a random seed
+    profiler : Profiler, optional
+        if given, the time of `make_relations` and `evaluate`, the time per field
+        and the number of rows created per relation are recorded
+    """
+
+    def __init__(
+        self,
+        entities: Dict[str, Entity],
+        streams: RandomStreams = None,
+        profiler: Profiler = None,
+    ):
+        self.entities = entities
+        self.streams = streams or RandomStreams()
+        self.profiler = profiler
+        self.tables: Dict[str, ColumnTable] = {}
+        for ename, entity in entities.items():
+            self.tables[ename] = ColumnTable(entity, self.tables)
+        self.link_picked_targets = True
+        self._related: Dict[str, int] = {ename: 0 for ename in entities}
+        self._evaluated: Dict[str, int] = {ename: 0 for ename in entities}
+        self._cursor = _Cursor()
+        self._create_variants()
+        self._field_order = self._compile_field_order()
+        self._bindings: Dict[Tuple[str, str], List[Tuple[ValueSpec, Dict, bool]]] = {}
+        self.target_indices: Dict[Tuple[str, str], TargetIndex] = {}
+
+    def add_rows(self, ename: str, n: int, first_index: int = 0) -> int:
+        """Add `n` root rows of entity `ename` and return the first row index.
+
+        `first_index` is the index of the first root row among all root rows of the
+        entity, from which the keys of the rows are derived.
+        """
+        keys = self.streams.root_keys(ename, first_index, n)
+        return self.tables[ename].append_rows(keys, first_index=first_index)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {ename: table.n_rows for ename, table in self.tables.items()}
+
+    def restore(self, snapshot: Dict[str, int]):
+        """ Drop all rows that have been added after `snapshot` was taken """
+        for ename, table in self.tables.items():
+            n = snapshot.get(ename, 0)
+            table.truncate(n)
+            self._related[ename] = min(self._related[ename], n)
+            self._evaluated[ename] = min(self._evaluated[ename], n)
+        for (ename, fname), index in self.target_indices.items():
+            target = self.entities[ename].fields[fname].target_entity
+            index.truncate(self.tables[target].n_rows)
+
+    def instances(self, ename: str, start: int = 0) -> List[ColumnarInstance]:
+        table = self.tables[ename]
+        return [ColumnarInstance(table, row) for row in range(start, table.n_rows)]
+
+    # ----------------------------------------------------------------------------
+    # compilation
+
+    def _create_variants(self):
+        """ Create the variants of all tables for relations with overrides """
+        for ename, entity in self.entities.items():
+            for relation in entity.relations():
+                if relation.relation_strategy.startswith("create"):
+                    target = self.tables[relation.target_entity]
+                    target.variant_for(relation.relation_overrides, self.tables[ename])
+
+    def _compile_path(
+        self, table: ColumnTable, target: str
+    ) -> Tuple[List[Tuple[ColumnTable, str]], ColumnTable, Optional[str]]:
+        """Compile the target of a reference into a path through relations.
+
+        Returns
+        -------
+        steps : List[Tuple[ColumnTable, str]]
+            the table and to-one relation field of every intermediate step
+        end : ColumnTable
+            the table of the last step
+        field : Optional[str]
+            the referenced field of `end`. None if the reference points to a row
+            itself, e.g., "$SELF".
+        """
+        tokens = [token for token in target.split(".") if token != "SELF"]
+        steps = []
+        current = table
+        for token in tokens[:-1]:
+            spec = current.entity.fields.get(token)
+            if token not in current.links:
+                raise ConfigurationError(
+                    f"Cannot resolve reference '{target}': "
+                    f"'{current.name}.{token}' is not a many-to-one or one-to-one "
+                    f"relation."
+                )
+            steps.append((current, token))
+            current = self.tables[spec.target_entity]
+        field = tokens[-1] if tokens else None
+        if field is not None and field not in current.entity.fields:
+            raise ConfigurationError(
+                f"Cannot resolve reference '{target}': "
+                f"'{current.name}' has no field '{field}'."
+            )
+        return steps, current, field
+
+    def _context_table(self, table: ColumnTable, variant: Variant, fname: str):
+        """ Return the table in whose context `fname` of `variant` is evaluated """
+        if fname in variant.overrides:
+            return variant.context
+        return table
+
+    def _spec(self, table: ColumnTable, variant: Variant, fname: str) -> ValueSpec:
+        return variant.overrides.get(fname, table.entity.fields[fname])
+
+    def _compile_field_order(self) -> List[Tuple[str, str]]:
+        """Return the evaluation order of all value fields of all tables.
+
+        The same field is evaluated for all rows of a table at once, so the order is
+        determined on the level of fields, not of individual values.
+        """
+        sorter: TopologicalSorter = TopologicalSorter()
+        for ename, table in self.tables.items():
+            for fname in table.value_fields:
+                dependencies = []
+                for variant in table.variants:
+                    context = self._context_table(table, variant, fname)
+                    spec = self._spec(table, variant, fname)
+                    for ref in spec.references():
+                        _, end, field = self._compile_path(context, ref.target)
+                        if field is not None and field in end.columns:
+                            dependencies.append((end.name, field))
+                sorter.add((ename, fname), *dependencies)
+        try:
+            return list(sorter.static_order())
+        except CycleError as e:
+            raise ConfigurationError(
+                f"Circular reference between fields {e.args[1]}. The columnar "
+                f"backend evaluates each field for all rows at once and cannot "
+                f"generate fields that depend on themselves through relations."
+            )
+
+    def _bind(self, table: ColumnTable, variant: Variant, fname: str):
+        """Compile `fname` of `variant` into a spec and bound references.
+
+        Returns
+        -------
+        Tuple[ValueSpec, Dict[Reference, _ColumnReference], bool]
+            the spec, its bound references and whether it is evaluated in the
+            context of the creating row.
+        """
+        context = self._context_table(table, variant, fname)
+        spec = self._spec(table, variant, fname)
+        refs: Dict[Reference, _ColumnReference] = {}
+        for ref in spec.references():
+            steps, end, field = self._compile_path(context, ref.target)
+            links = [t.links[token] for t, token in steps]
+            getter: Callable[[int], Any]
+            if field is None:
+                getter = end.instance
+            elif field in end.columns:
+                getter = end.columns[field].__getitem__
+            else:
+                getter = _FieldGetter(end, field)
+            refs[ref] = _ColumnReference(self._cursor, links, getter)
+        return spec, refs, fname in variant.overrides
+
+    def _bindings_of(self, table: ColumnTable, fname: str):
+        """ Return the bindings of `fname` for all variants of `table` """
+        key = (table.name, fname)
+        try:
+            return self._bindings[key]
+        except KeyError:
+            bindings = [self._bind(table, v, fname) for v in table.variants]
+            self._bindings[key] = bindings
+            return bindings
+
+    def _target_index(self, table: ColumnTable, fname: str) -> TargetIndex:
+        """ Return the index which picks the targets of relation `fname` """
+        key = (table.name, fname)
+        try:
+            return self.target_indices[key]
+        except KeyError:
+            relspec: RelationSpec = table.entity.fields[fname]  # type: ignore
+            options = relspec.relation_strategy_options
+            target = self.tables[relspec.target_entity]
+            options.validate(target.entity, f"{table.name}.{fname}")
+
+            weight_of = _ColumnWeight(self, target, options.weight_field)
+            index = self.target_indices[key] = TargetIndex(options, weight_of)
+            return index
+
+    # ----------------------------------------------------------------------------
+    # relations
+
+    def make_relations(self):
+        """Populate the relations of all rows whose relations are not made yet.
+
+        Rows are processed table by table in the order they were added. Rows that
+        are created by a relation are processed in a later round.
+        """
+        if self.profiler is not None:
+            with self.profiler.phase("make_relations"):
+                self._make_all_relations()
+        else:
+            self._make_all_relations()
+
+    def _make_all_relations(self):
+        progress = True
+        while progress:
+            progress = False
+            for ename, table in self.tables.items():
+                start = self._related[ename]
+                stop = table.n_rows
+                if start < stop:
+                    self._related[ename] = stop
+                    self._make_relations(table, start, stop)
+                    progress = True
+
+    def _make_relations(self, table: ColumnTable, start: int, stop: int):
+        for fname, relspec in table.relation_fields:
+            overridden = [v.index for v in table.variants if fname in v.overrides]
+            if relspec.relation_strategy == "pick_random" and (
+                relspec.relation_type != RelationSpec.ONE_TO_MANY
+            ):
+                self._pick_targets(table, fname, relspec, start, stop, overridden)
+                continue
+            for row in range(start, stop):
+                if overridden and table.variant[row] in overridden:
+                    self._resolve_overridden_relation(table, fname, row)
+                elif relspec.relation_type == RelationSpec.ONE_TO_MANY:
+                    self._make_one_to_many_relation(table, fname, relspec, row)
+                elif table.links[fname][row] == NO_ROW:
+                    self._make_many_to_one_relation(table, fname, relspec, row)
+
+    def _make_one_to_many_relation(
+        self, table: ColumnTable, fname: str, relspec: RelationSpec, row: int
+    ):
+        strat = relspec.relation_strategy
+        if strat == "none":
+            return
+        elif strat == "pick_random":
+            raise ConfigurationError(
+                f"{table.name}.{fname}: 'pick_random' is not a supported strategy "
+                "for a one-to-many relationship, only 'create'"
+            )
+        a, b = relspec.create_bounds()
+        key = table.keys[row]
+        n = randint(value_seed(key, fname), a, b) if a != b else a
+        target = self.tables[relspec.target_entity]
+        variant = target.variant_for(relspec.relation_overrides, table)
+        first = target.append_rows(child_keys(key, fname, n), variant, row)
+        if self.profiler is not None:
+            self.profiler.count_created(table.name, fname, n)
+        starts, counts = table.ranges[fname]
+        starts[row] = first
+        counts[row] = n
+        if relspec.remote_name:
+            remote = target.links[relspec.remote_name]
+            remote[first : first + n] = array("q", [row] * n)
+
+    def _pick_targets(
+        self,
+        table: ColumnTable,
+        fname: str,
+        relspec: RelationSpec,
+        start: int,
+        stop: int,
+        overridden: List[int],
+    ):
+        """ Populate a to-one "pick_random" relation with one batched draw """
+        links = table.links[fname]
+        rows = []
+        for row in range(start, stop):
+            if overridden and table.variant[row] in overridden:
+                self._resolve_overridden_relation(table, fname, row)
+            elif links[row] == NO_ROW:
+                rows.append(row)
+        if not rows:
+            return
+        target = self.tables[relspec.target_entity]
+        index = self._target_index(table, fname)
+        index.extend(target.n_rows)
+        seeds = value_seeds([table.keys[row] for row in rows], fname)
+        picks = index.pick_many(seeds)
+        for row, target_row in zip(rows, picks):
+            links[row] = target_row
+        link_remote = self.link_picked_targets and (
+            relspec.remote_name and relspec.relation_type == RelationSpec.ONE_TO_ONE
+        )
+        if link_remote:
+            remote = target.links[relspec.remote_name]
+            for row, target_row in zip(rows, picks):
+                remote[target_row] = row
+
+    def _make_many_to_one_relation(
+        self, table: ColumnTable, fname: str, relspec: RelationSpec, row: int
+    ):
+        strat = relspec.relation_strategy
+        target = self.tables[relspec.target_entity]
+        link_remote = relspec.remote_name and (
+            relspec.relation_type == RelationSpec.ONE_TO_ONE
+        )
+        if strat == "create":
+            variant = target.variant_for(relspec.relation_overrides, table)
+            keys = child_keys(table.keys[row], fname, 1)
+            target_row = target.append_rows(keys, variant, row)
+            if self.profiler is not None:
+                self.profiler.count_created(table.name, fname)
+        elif strat == "none":
+            return
+        else:
+            raise ConfigurationError(
+                f"Invalid relation_strategy. "
+                f"Expected one of 'pick_random', 'create', "
+                f"but got '{strat}' instead."
+            )
+        table.links[fname][row] = target_row
+        if link_remote:
+            target.links[relspec.remote_name][target_row] = row
+
+    def _resolve_overridden_relation(self, table: ColumnTable, fname: str, row: int):
+        variant = table.variants[table.variant[row]]
+        spec, refs, in_context = self._bindings_of(table, fname)[variant.index]
+        self._cursor.row = table.context[row] if in_context else row
+        target = spec.generate_seeded(refs, value_seed(table.keys[row], fname))
+        expected_target_entity = table.entity.fields[fname].target_entity
+        if not isinstance(target, ColumnarInstance):
+            raise ConfigurationError(
+                f"{table.name}.{fname}: "
+                f"Overrides of relation fields must point to an Instance."
+            )
+        if target.entity.name != expected_target_entity:
+            raise ConfigurationError(
+                f"Overrides of relation fields must point to the same type of entity. "
+                f'Expected "{expected_target_entity}" but got "{target.entity.name}" '
+                f'for "{table.name}.{fname}"'
+            )
+        if fname in table.links:
+            table.links[fname][row] = target.row
+        else:
+            raise ConfigurationError(
+                f"{table.name}.{fname}: only to-one relations can be overridden."
+            )
+
+    # ----------------------------------------------------------------------------
+    # values
+
+    def evaluate(self):
+        """ Evaluate all value fields of all rows which are not evaluated yet """
+        if self.profiler is not None:
+            with self.profiler.phase("evaluate"):
+                self._evaluate_all()
+        else:
+            self._evaluate_all()
+
+    def _evaluate_all(self):
+        profiler = self.profiler
+        stops = {ename: table.n_rows for ename, table in self.tables.items()}
+        for ename, fname in self._field_order:
+            start = self._evaluated[ename]
+            if start < stops[ename]:
+                table = self.tables[ename]
+                begin = time.perf_counter()
+                self._evaluate_field(table, fname, start, stops[ename])
+                if profiler is not None:
+                    seconds = time.perf_counter() - begin
+                    spec = table.entity.fields[fname]
+                    n = stops[ename] - start
+                    profiler.record_values(ename, fname, spec, seconds, n)
+        self._evaluated = stops
+
+    def _evaluate_field(self, table: ColumnTable, fname: str, start: int, stop: int):
+        """Append the values of `fname` for rows `start` to `stop` to its column.
+
+        Values of variants whose spec has no references are generated with one call
+        of `ValueSpec.generate_batch` (or `generate_indexed`). Every value is seeded
+        with the key of its row.
+        """
+        column = table.columns[fname]
+        bindings = self._bindings_of(table, fname)
+        cursor = self._cursor
+        seeds = value_seeds(table.keys[start:stop], fname)
+        if len(bindings) == 1:
+            spec, refs, _ = bindings[0]
+            if not refs and spec.indexed:
+                column.extend(spec.generate_indexed(_indices(table, start, stop)))
+                return
+            if not refs:
+                column.extend(spec.generate_batch(stop - start, seeds=seeds))
+                return
+            for row, seed in zip(range(start, stop), seeds):
+                cursor.row = row
+                column.append(spec.generate_seeded(refs, seed))
+        else:
+            variants = table.variant
+            contexts = table.context
+            batches = {}
+            for index, (spec, refs, _) in enumerate(bindings):
+                if not refs and spec.indexed:
+                    indices = [
+                        row_index
+                        for row_index, variant in zip(
+                            _indices(table, start, stop), variants[start:stop]
+                        )
+                        if variant == index
+                    ]
+                    if indices:
+                        batches[index] = iter(spec.generate_indexed(indices))
+                elif not refs:
+                    variant_seeds = [
+                        seed
+                        for seed, variant in zip(seeds, variants[start:stop])
+                        if variant == index
+                    ]
+                    if variant_seeds:
+                        batches[index] = iter(
+                            spec.generate_batch(len(variant_seeds), seeds=variant_seeds)
+                        )
+            for row, seed in zip(range(start, stop), seeds):
+                index = variants[row]
+                if index in batches:
+                    column.append(next(batches[index]))
+                    continue
+                spec, refs, in_context = bindings[index]
+                cursor.row = contexts[row] if in_context else row
+                column.append(spec.generate_seeded(refs, seed))
+
+
+def _indices(table: ColumnTable, start: int, stop: int) -> List[Optional[int]]:
+    """ Return the root indices of rows `start` to `stop`, None for created rows """
+    return [None if i == NO_ROW else i for i in table.indices[start:stop]]
+
+
+class _FieldGetter:
+    """ Look up a (relation) field of a row through `ColumnTable.value` """
+
+    __slots__ = ("table", "field")
+
+    def __init__(self, table: ColumnTable, field: str):
+        self.table = table
+        self.field = field
+
+    def __call__(self, row: int) -> Any:
+        return self.table.value(self.field, row)
+
+
+class _ColumnWeight:
+    """Look up the weight field of a row of `table`.
+
+    The weight field has no references, so its value can be generated before the
+    other values, with the same seed. A class rather than a closure, so that a
+    `TargetIndex` can be pickled.
+    """
+
+    __slots__ = ("engine", "table", "field")
+
+    def __init__(self, engine: "ColumnarEngine", table: ColumnTable, field: str):
+        self.engine = engine
+        self.table = table
+        self.field = field
+
+    def __call__(self, row: int) -> float:
+        table = self.table
+        column = table.columns[self.field]
+        if row < len(column):
+            return column[row]
+        bindings = self.engine._bindings_of(table, self.field)
+        spec, refs, _ = bindings[table.variant[row]]
+        return spec.generate_seeded(refs, value_seed(table.keys[row], self.field))
@@ -1,6 +1,7 @@
-from typing import TYPE_CHECKING, Dict
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 
 from factory_boss.errors import ConfigurationError
+from factory_boss.evaluation_plan import EvaluationPlan
 from factory_boss.instance import Instance, InstanceValue
 
 if TYPE_CHECKING:
@@ -10,9 +11,14 @@ from factory_boss.value_spec import RelationSpec
 
 
 class Entity:
-    def __init__(self, name: str, fields: Dict[str, "ValueSpec"]):
+    def __init__(
+        self, name: str, fields: Dict[str, "ValueSpec"], count: Optional[int] = None
+    ):
         self.name = name
         self.fields = fields
+        self.count = count
+        self._plans: Dict[int, EvaluationPlan] = {}
+        self._relation_fields: Optional[Tuple[str, ...]] = None
 
     def __str__(self):
         s = f"""Entity('{self.name}') {{
@@ -29,9 +35,19 @@ Fields
     def __repr__(self):
         return f"Entity('{self.name}', {len(self.fields)} fields)"
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # plans are cached by the id of their overrides, which changes on unpickling
+        self._plans = {
+            id(plan.overrides) if plan.overrides else 0: plan
+            for plan in self._plans.values()
+        }
+
     def add_field(self, name, field: "ValueSpec"):
         if name not in self.fields:
             self.fields[name] = field
+            self._plans.clear()
+            self._relation_fields = None
         else:
             raise ConfigurationError(f"Field '{name}' already defined in {self}")
 
@@ -39,8 +55,11 @@ Fields
         self,
         overrides: Dict[str, "ValueSpec"],
         override_context: Instance = None,
+        key: int = None,
+        index: int = None,
     ) -> Instance:
-        instance = Instance(self)
+        instance = Instance(self, key, index)
+        instance.plan = self.evaluation_plan(overrides)
         for fname, field in self.fields.items():
             if fname in overrides:
                 field = overrides[fname]
@@ -53,5 +72,29 @@ Fields
             instance.instance_values[fname] = ivalue
         return instance
 
+    def evaluation_plan(
+        self, overrides: Dict[str, "ValueSpec"] = None
+    ) -> EvaluationPlan:
+        """Return the compiled evaluation plan for instances with `overrides`.
+
+        Plans are cached per overrides dictionary. The plan keeps a reference to
+        its overrides, so the id used as cache key cannot be reused.
+        """
+        key = id(overrides) if overrides else 0
+        try:
+            return self._plans[key]
+        except KeyError:
+            plan = EvaluationPlan(self, overrides or {})
+            self._plans[key] = plan
+            return plan
+
     def relations(self):
         return [f for f in self.fields.values() if isinstance(f, RelationSpec)]
+
+    def relation_fields(self) -> Tuple[str, ...]:
+        """ Return the names of all relation fields, computed only once """
+        if self._relation_fields is None:
+            self._relation_fields = tuple(
+                fname for fname, spec in self.fields.items() if spec.type == "relation"
+            )
+        return self._relation_fields
@@ -22,3 +22,9 @@ class UnresolvedReferenceError(FactoryBossError):
 
 class ResolveError(FactoryBossError):
     pass
+
+
+class UniqueValueError(FactoryBossError):
+    """ No new value of a unique field was found within the allowed attempts """
+
+    pass
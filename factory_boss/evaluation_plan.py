@@ -0,0 +1,83 @@
+from graphlib import CycleError, TopologicalSorter
+from typing import TYPE_CHECKING, Dict, FrozenSet, List
+
+from factory_boss.errors import ConfigurationError
+
+if TYPE_CHECKING:
+    from factory_boss.entity import Entity
+    from factory_boss.value_spec import ValueSpec
+
+
+class EvaluationPlan:
+    """Evaluation order of the fields of an entity.
+
+    The order only depends on the entity and on the relation overrides its
+    instances are created with, so it is compiled once and shared by all instances
+    of that variant.
+
+    References which stay within the instance (e.g., `$name` or `$SELF.name`)
+    determine the order. All other references, i.e., references through relations
+    and references of overridden fields, which are resolved in the context of
+    another instance, cross instances. Fields with such references are listed in
+    `crossing` and must be scheduled together with their dependencies.
+
+    Parameters
+    ----------
+    entity : Entity
+        the entity whose fields are ordered
+    overrides : Dict[str, ValueSpec]
+        relation overrides the instances are created with
+    """
+
+    def __init__(self, entity: "Entity", overrides: Dict[str, "ValueSpec"]):
+        self.entity = entity
+        self.overrides = overrides
+        self.order: List[str] = []
+        self.crossing: FrozenSet[str] = frozenset()
+        self.compile()
+
+    def compile(self):
+        sorter: TopologicalSorter = TopologicalSorter()
+        crossing = set()
+        for fname, spec in self.entity.fields.items():
+            local_dependencies = []
+            if fname in self.overrides:
+                # overrides are resolved in the context of the creating instance
+                if self.overrides[fname].references():
+                    crossing.add(fname)
+            else:
+                for ref in spec.references():
+                    dependency = self.local_dependency(ref.target)
+                    if dependency is None:
+                        crossing.add(fname)
+                    elif dependency != "SELF":
+                        local_dependencies.append(dependency)
+            sorter.add(fname, *local_dependencies)
+        try:
+            self.order = list(sorter.static_order())
+        except CycleError as e:
+            raise ConfigurationError(
+                f"Circular reference between fields of {self.entity.name}: {e.args[1]}"
+            )
+        self.crossing = frozenset(crossing)
+
+    def local_dependency(self, target: str):
+        """Return the local field `target` refers to.
+
+        Returns "SELF" if `target` refers to the instance itself and None if it
+        refers to another instance.
+        """
+        tokens = target.split(".")
+        if tokens[0] == "SELF":
+            tokens = tokens[1:]
+        if not tokens:
+            return "SELF"
+        if len(tokens) == 1 and tokens[0] in self.entity.fields:
+            return tokens[0]
+        return None
+
+    def __repr__(self):
+        return (
+            f"EvaluationPlan('{self.entity.name}', order={self.order}, "
+            f"crossing={sorted(self.crossing)})"
+        )
@@ -0,0 +1,74 @@
+""" Faker instances per locale and resolution of their provider methods.
+
+`Faker` objects are expensive to create, and looking up a provider method through
+a `Faker` object goes through its locale proxy on every call. The `FakerPool`
+creates one `Faker` per locale, and `FakerField`s resolve their provider method
+once, when they are created.
+
+All `Faker` objects share one random generator, so reseeding it (see
+`FakerPool.random`) reseeds every locale.
+"""
+import inspect
+from typing import Any, Callable, Dict, Optional
+
+from faker import Faker
+
+from factory_boss.errors import ConfigurationError
+
+
+class FakerPool:
+    """ One `Faker` per locale """
+
+    def __init__(self):
+        self._fakers: Dict[Optional[str], Faker] = {}
+
+    def faker(self, locale: str = None) -> Faker:
+        """ Return the `Faker` of `locale`, or of the default locale if None """
+        try:
+            return self._fakers[locale]
+        except KeyError:
+            pass
+        try:
+            faker = Faker(locale)
+        except AttributeError as e:
+            raise ConfigurationError(f"Unknown Faker locale '{locale}': {e}")
+        self._fakers[locale] = faker
+        return faker
+
+    @property
+    def random(self):
+        """ the random generator of all fakers """
+        return self.faker().random
+
+    def method(
+        self, faker_func: str, faker_kwargs: Dict[str, Any], locale: str = None
+    ) -> Callable:
+        """Return the bound provider method `faker_func` of the `Faker` of `locale`.
+
+        Raises
+        ------
+        ConfigurationError
+            if there is no such method or it does not accept `faker_kwargs`
+        """
+        # the generator of a single locale Faker, which holds the provider methods
+        generator = self.faker(locale).factories[0]
+        method = getattr(generator, faker_func, None)
+        if not callable(method) or faker_func.startswith("_"):
+            raise ConfigurationError(
+                f"Unknown Faker function '{faker_func}' for locale "
+                f"'{locale or 'default'}'."
+            )
+        try:
+            inspect.signature(method).bind(**faker_kwargs)
+        except TypeError as e:
+            raise ConfigurationError(
+                f"Invalid arguments {faker_kwargs} for Faker function "
+                f"'{faker_func}': {e}"
+            )
+        except ValueError:  # pragma: no cover, no signature available
+            pass
+        return method
+
+
+faker_pool = FakerPool()
+""" the pool shared by all specs """
@@ -1,87 +1,843 @@
-from graphlib import TopologicalSorter
-from typing import Dict, List
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import Executor
+from multiprocessing.context import BaseContext
+from typing import Any, AsyncIterator, Dict, Iterator, List, Set, Tuple, Union
 
+from factory_boss.aio import iterate_in_executor
+from factory_boss.batches import (
+    BatchRunner,
+    ColumnarBatchRunner,
+    ObjectBatchRunner,
+    Rows,
+)
+from factory_boss.columnar import ColumnarEngine
 from factory_boss.entity import Entity
-from factory_boss.instance import Instance, InstanceValue
-from factory_boss.reference_resolver import ReferenceResolver
+from factory_boss.errors import ConfigurationError
+from factory_boss.instance import Instance, InstanceValue, RowReference
+from factory_boss.parallel import run_batches
+from factory_boss.profiling import Profiler
+from factory_boss.projection import prune_entities
+from factory_boss.random_streams import RandomStreams, value_seeds
 from factory_boss.relation_maker import RelationMaker
+from factory_boss.sinks import AsyncSink, Sink, ThreadedSink
+from factory_boss.stats import GenerationStats
+from factory_boss.unique import UniqueValues
+from factory_boss.value_spec import FakerField, RelationSpec, ValueSpec
+
+logger = logging.getLogger(__name__)
+
+
+def _phase(method):
+    """ Record the calls of a `Generator` method as a phase of its profiler """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.profiler is None:
+            return method(self, *args, **kwargs)
+        with self.profiler.phase(name):
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class Generator:
-    def __init__(self, spec: Dict):
+    """Generate instances of all entities of a parsed spec.
+
+    Parameters
+    ----------
+    spec : Dict
+        a spec as returned by `SpecParser.parse`
+    backend : str, optional
+        how generated instances are stored:
+        * "objects": one `Instance` with one `InstanceValue` per field;
+        * "columnar": one `ColumnTable` per entity, with one list per field and
+          relations stored as row indices. Needs a fraction of the memory.
+        Default: "objects"
+    seed : int, optional
+        seed of the run. Every value and every relation is drawn from its own
+        random stream, derived from the seed, the row and the field (see
+        `factory_boss.random_streams`). Hence runs with the same seed produce the
+        same rows, and adding a field or more rows to the spec does not change the
+        values of the other fields. If None, every run draws a random seed.
+    lazy : bool, optional
+        if True, values are not evaluated up front, but only when they are output
+        or referenced by an output value, e.g., via `Instance.value`. Only
+        supported by the "objects" backend.
+        Default: False
+    profiler : Profiler, optional
+        records the time per phase, per field and per kind of spec, and the number
+        of instances created per relation. Default: None, i.e., do not record
+    """
+
+    DEFAULT_COUNT = 3
+    """ number of instances of an entity if neither spec nor caller specify one """
+
+    DEFAULT_BATCH_SIZE = 10_000
+    """ number of root instances per batch in `generate_batched` """
+
+    BACKENDS = ("objects", "columnar")
+
+    def __init__(
+        self,
+        spec: Dict,
+        backend: str = "objects",
+        seed: int = None,
+        lazy: bool = False,
+        profiler: Profiler = None,
+    ):
+        if backend not in self.BACKENDS:
+            raise ConfigurationError(
+                f"Unknown backend '{backend}'. Expected one of {self.BACKENDS}."
+            )
+        if lazy and backend != "objects":
+            raise ConfigurationError(
+                f"Lazy evaluation is not supported by the {backend} backend."
+            )
         self.spec = spec
-        self.resolver = ReferenceResolver()
+        self.backend = backend
+        self.seed = seed
+        self.lazy = lazy
+        self.profiler = profiler
+        self.entities: Dict[str, Entity] = spec["entities"]
+        """ entities of the current run, without the fields which are not needed """
+        self.streams = RandomStreams(seed)
+        self.stats: GenerationStats = None
 
     def generate(
-        self, output_with_related_objects: bool = True
+        self,
+        output_with_related_objects: Union[bool, str] = True,
+        counts: Dict[str, int] = None,
+        columns: Dict[str, List[str]] = None,
     ) -> Dict[str, List[Dict]]:
-        """ Generate a dictionary from entity name to list of generated instances """
+        """Generate a dictionary from entity name to list of generated instances
+
+        Parameters
+        ----------
+        output_with_related_objects : bool or str, optional
+            if True, related objects are embedded in the output dictionaries. An
+            object related to several others is embedded as one shared dictionary,
+            and cyclic relations result in cyclic dictionaries.
+            If "references", related objects are output as `RowReference`s, i.e.,
+            as the entity and index of their rows in the output.
+            If False, related objects are not output. Default: True
+        counts : Dict[str, int], optional
+            number of instances to generate per entity. Overrides the `count`
+            of the entity in the spec.
+        columns : Dict[str, List[str]], optional
+            fields to output per entity. Entities which are not in `columns` are
+            output with all fields. Default: all fields of all entities
+            Fields which are not needed to generate the output fields are pruned
+            before generation, see `factory_boss.projection`.
+        """
+        self.stats = GenerationStats()
+        self.stats.start()
+        self.streams = RandomStreams(self.seed)
         self.complete_relation_specs(self.spec["entities"])
-        instances = self.make_instances()
-        instances = self.make_relations(instances)
-        self.resolver.resolve_references(instances)
-        plan = self.make_plan(instances)
-        self.execute_plan(plan)
+        counts = self.instance_counts(counts)
+        self.reset_value_specs({ename: range(n) for ename, n in counts.items()})
+        columns = self.output_columns(columns)
+        self.entities = prune_entities(self.spec["entities"], columns)
+        if self.backend == "columnar":
+            engine = ColumnarEngine(self.entities, self.streams, self.profiler)
+            for ename, n in counts.items():
+                engine.add_rows(ename, n)
+            engine.make_relations()
+            engine.evaluate()
+            instances: List[Instance] = []
+            for ename in engine.tables:
+                instances += engine.instances(ename)
+        else:
+            instances = self.make_instances(counts)
+            instances = self.make_relations(instances)
+            if not self.lazy:
+                plan = self.make_plan(instances)
+                self.execute_plan(plan)
         dicts = self.instances_to_dict(
-            instances, with_related_objects=output_with_related_objects
+            instances, with_related_objects=output_with_related_objects, columns=columns
         )
+        for ename, rows in dicts.items():
+            self.stats.add_rows(ename, len(rows))
+        self.stats.stop()
+        logger.info(f"Generated {self.stats}")
         return dicts
 
+    async def agenerate(
+        self,
+        output_with_related_objects: Union[bool, str] = True,
+        counts: Dict[str, int] = None,
+        columns: Dict[str, List[str]] = None,
+        executor: Executor = None,
+        mp_context: BaseContext = None,
+    ) -> Dict[str, List[Dict]]:
+        """Like `generate`, but run in `executor`, so the event loop is not blocked.
+
+        Parameters
+        ----------
+        executor : Executor, optional
+            executor which runs the generation. Must be able to run methods of this
+            generator, i.e., a `ThreadPoolExecutor`. Default: None, i.e., the
+            default executor of the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        generate = functools.partial(
+            self.generate, output_with_related_objects, counts, columns
+        )
+        return await loop.run_in_executor(executor, generate)
+
+    async def aiter_rows(
+        self,
+        counts: Dict[str, int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = 1,
+        columns: Dict[str, List[str]] = None,
+        executor: Executor = None,
+        mp_context: BaseContext = None,
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Asynchronously yield the rows of `iter_rows`.
+
+        Every batch is generated in `executor`, and the next batch is generated
+        while the rows of the current batch are consumed. Hence the event loop is
+        only busy with yielding rows. With `workers` > 1, the batches are generated
+        in worker processes started by `mp_context`, see `iter_rows`.
+
+        Parameters
+        ----------
+        executor : Executor, optional
+            executor which generates the batches, see `agenerate`. Default: None,
+            i.e., the default executor of the running event loop
+        """
+        batches = self.iter_batches(counts, batch_size, workers, columns, mp_context)
+        async for rows in iterate_in_executor(batches, executor):
+            for row in rows:
+                yield row
+
+    async def awrite(
+        self,
+        sink: Union[Sink, AsyncSink],
+        counts: Dict[str, int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = 1,
+        columns: Dict[str, List[str]] = None,
+        executor: Executor = None,
+        mp_context: BaseContext = None,
+    ) -> GenerationStats:
+        """Like `write`, but generate and write asynchronously.
+
+        The rows of each batch are written while the next batch is generated (see
+        `aiter_rows`). An `AsyncSink` is awaited in the event loop. The writes to a
+        `Sink` run in `executor`, see `ThreadedSink`.
+        """
+        if isinstance(sink, Sink):
+            sink = ThreadedSink(sink, executor)
+        batches = self.iter_batches(counts, batch_size, workers, columns, mp_context)
+        async for rows in iterate_in_executor(batches, executor):
+            for ename, row in rows:
+                await sink.write(ename, row)
+            await sink.end_batch()
+        await sink.flush()
+        return self.stats
+
+    def generate_batched(
+        self,
+        counts: Dict[str, int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = 1,
+        columns: Dict[str, List[str]] = None,
+        mp_context: BaseContext = None,
+    ) -> Dict[str, List[Dict]]:
+        """Generate large numbers of instances in batches.
+
+        Collects the rows of `iter_rows` into a dictionary from entity name to list
+        of flat rows. See `iter_rows` for details.
+        """
+        dicts: Dict[str, List[Dict]] = {}
+        for ename, row in self.iter_rows(
+            counts, batch_size, workers, columns, mp_context
+        ):
+            try:
+                dicts[ename].append(row)
+            except KeyError:
+                dicts[ename] = [row]
+        return dicts
+
+    def write(
+        self,
+        sink: Sink,
+        counts: Dict[str, int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = 1,
+        columns: Dict[str, List[str]] = None,
+        mp_context: BaseContext = None,
+    ) -> GenerationStats:
+        """Generate instances in batches and write them to `sink`.
+
+        The rows of `iter_rows` are written as they are generated, so neither the
+        generated instances nor the output exist in memory as a whole. After the
+        rows of each batch, `sink.end_batch` is called. The sink is flushed, but not
+        closed.
+
+        Returns
+        -------
+        GenerationStats
+            the statistics of the run, which are also stored in `self.stats`
+        """
+        for rows in self.iter_batches(counts, batch_size, workers, columns, mp_context):
+            for ename, row in rows:
+                sink.write(ename, row)
+            sink.end_batch()
+        sink.flush()
+        return self.stats
+
+    def iter_rows(
+        self,
+        counts: Dict[str, int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = 1,
+        columns: Dict[str, List[str]] = None,
+        mp_context: BaseContext = None,
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Generate instances in batches and yield them as flat rows.
+
+        Only the targets of "pick_random" relations are kept in memory for the
+        whole run, because instances of every batch may pick them. All other
+        instances are generated in batches of `batch_size` root instances plus the
+        instances they create. As soon as all values of a batch are evaluated, its
+        rows are yielded and the batch is released. Peak memory is therefore bounded
+        by the kept targets plus one batch, no matter how many rows are produced.
+
+        Rows are flat, i.e., related objects are never embedded. The remote side of
+        a "pick_random" relation (e.g., the list of persons living at an address)
+        does not contain instances generated in batches. Picking targets without
+        replacement is not supported.
+
+        Targets of a "pick_random" relation which are created by relations of
+        instances generated in batches (e.g., A creates B and C, and C picks a B)
+        can only be picked within their batch, because they are not kept.
+
+        With `workers` > 1, the kept targets are generated first and then sent to a
+        pool of worker processes, which generate the remaining batches in parallel.
+        Rows are still yielded in the order of the batches. If the generator has a
+        `seed`, the rows only depend on the seed and the `batch_size`, but not on
+        the number of workers. Unless targets are picked within their batch, they
+        do not depend on the `batch_size` either.
+
+        Throughput is recorded in `self.stats`. Time spent by the consumer of the
+        rows is not included.
+
+        Parameters
+        ----------
+        counts : Dict[str, int], optional
+            number of instances to generate per entity. Overrides the `count`
+            of the entity in the spec.
+        batch_size : int, optional
+            number of root instances generated per batch
+        workers : int, optional
+            number of worker processes. Default: 1, i.e., generate all batches in
+            this process
+        columns : Dict[str, List[str]], optional
+            fields to output per entity, see `generate`
+        mp_context : BaseContext, optional
+            multiprocessing context which starts the worker processes, e.g.,
+            `multiprocessing.get_context("spawn")`. Default: None, i.e., the
+            default start method of the platform
+
+        Yields
+        ------
+        Tuple[str, Dict[str, Any]]
+            tuples of entity name and generated row
+        """
+        for rows in self.iter_batches(counts, batch_size, workers, columns, mp_context):
+            yield from rows
+
+    def iter_batches(
+        self,
+        counts: Dict[str, int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = 1,
+        columns: Dict[str, List[str]] = None,
+        mp_context: BaseContext = None,
+    ) -> Iterator[Rows]:
+        """Like `iter_rows`, but yield the rows of each batch as one list"""
+        if batch_size < 1:
+            raise ConfigurationError(f"batch_size must be positive, not {batch_size}")
+        # every batch starts from the kept targets, so batches cannot know which
+        # targets other batches have picked
+        self._require_picks_with_replacement("batched generation")
+        self.stats = GenerationStats()
+        self.stats.start()
+        self.complete_relation_specs(self.spec["entities"])
+        columns = self.output_columns(columns)
+        self.entities = prune_entities(self.spec["entities"], columns)
+        counts = self.instance_counts(counts)
+        batches = list(self.batches(counts, batch_size))
+        self.streams = RandomStreams(self.seed)
+        self.reset_value_specs({ename: range(n) for ename, n in counts.items()})
+        if self.backend == "columnar":
+            runner: BatchRunner = ColumnarBatchRunner(self, columns, len(batches))
+        else:
+            runner = ObjectBatchRunner(self, columns, len(batches))
+        for rows in run_batches(runner, batches, workers, mp_context):
+            for ename, _ in rows:
+                self.stats.add_rows(ename)
+            # do not count the time of the consumer
+            self.stats.stop()
+            yield rows
+            self.stats.start()
+        self.stats.stop()
+        logger.info(f"Generated {self.stats}")
+
+    def generate_delta(
+        self,
+        existing: Dict[str, List[Dict]],
+        counts: Dict[str, int],
+        output_with_related_objects: bool = False,
+    ) -> Dict[str, List[Dict]]:
+        """Generate additional instances which extend an `existing` dataset.
+
+        The rows of `existing` are loaded as known instances (see
+        `load_instances`), so "pick_random" relations of the new instances can pick
+        them. Only the new root instances in `counts` and the instances they create
+        are generated and returned, i.e., the delta. The existing rows are not
+        changed; in particular, their remote sides of picked relations do not point
+        to the new instances.
+
+        The keys of the new root instances of an entity start after the number of
+        its existing rows, so with the same seed they differ from the keys of the
+        existing root instances, and the same delta is generated again for the
+        same `existing` rows.
+
+        Parameters
+        ----------
+        existing : Dict[str, List[Dict]]
+            rows of the existing dataset per entity, e.g., the output of `generate`
+            or `generate_batched`, or rows read back from files
+        counts : Dict[str, int]
+            number of new root instances per entity. Other entities get no new
+            root instances.
+        output_with_related_objects : bool, optional
+            if True, related objects are embedded in the output dictionaries.
+            Related existing rows are embedded without their relations.
+            Default: False
+
+        Returns
+        -------
+        Dict[str, List[Dict]]
+            the new instances per entity
+        """
+        if self.backend != "objects":
+            raise ConfigurationError(
+                f"Delta generation is not supported by the {self.backend} backend."
+            )
+        # the picks of the existing dataset are not known
+        self._require_picks_with_replacement("delta generation")
+        self.stats = GenerationStats()
+        self.stats.start()
+        self.streams = RandomStreams(self.seed)
+        self.complete_relation_specs(self.spec["entities"])
+        self.entities = self.spec["entities"]
+        counts = {
+            ename: n
+            for ename, n in self.instance_counts(counts).items()
+            if ename in counts
+        }
+        first_index = {ename: len(existing.get(ename, [])) for ename in counts}
+        self.reset_value_specs(
+            {
+                ename: range(first_index[ename], first_index[ename] + n)
+                for ename, n in counts.items()
+            }
+        )
+        # continue sequences and keep unique fields unique across both datasets
+        for ename, rows in existing.items():
+            entity = self.entities.get(ename)
+            for fname, spec in entity.fields.items() if entity else ():
+                spec.exclude(row.get(fname) for row in rows)
+        relation_maker = RelationMaker(
+            self.load_instances(existing),
+            self.entities,
+            link_picked_targets=False,
+            profiler=self.profiler,
+        )
+        instances = self.make_instances(counts, first_index)
+        instances = self.make_relations(instances, relation_maker)
+        if not self.lazy:
+            plan = self.make_plan(instances)
+            self.execute_plan(plan)
+        dicts = self.instances_to_dict(instances, output_with_related_objects)
+        for ename, rows in dicts.items():
+            self.stats.add_rows(ename, len(rows))
+        self.stats.stop()
+        logger.info(f"Generated delta {self.stats}")
+        return dicts
+
+    def load_instances(self, rows: Dict[str, List[Dict]]) -> List[Instance]:
+        """Create instances whose values are taken from existing `rows`.
+
+        Relations are not restored: to-one relations are None and to-many
+        relations are empty. Foreign keys are taken from the rows like any other
+        value. Fields which are missing in a row are None.
+
+        Parameters
+        ----------
+        rows : Dict[str, List[Dict]]
+            rows per entity
+        """
+        unknown = set(rows) - set(self.entities)
+        if unknown:
+            raise ConfigurationError(
+                f"Cannot load rows of unknown entities {sorted(unknown)}."
+            )
+        instances: List[Instance] = []
+        for ename, erows in rows.items():
+            entity = self.entities[ename]
+            for row in erows:
+                instance = entity.make_instance(overrides={})
+                for fname, ivalue in instance.instance_values.items():
+                    spec = ivalue.spec
+                    if isinstance(spec, RelationSpec):
+                        ivalue.override_value(spec.default_value())
+                    elif spec.type == "relation":
+                        ivalue.override_value(None)
+                    else:
+                        ivalue.override_value(row.get(fname))
+                instances.append(instance)
+        return instances
+
+    def value_specs(self) -> Iterator[ValueSpec]:
+        """ Yield the specs of all fields, including the overrides of relations """
+        for entity in self.spec["entities"].values():
+            for spec in entity.fields.values():
+                yield spec
+                if isinstance(spec, RelationSpec) and spec.relation_overrides:
+                    yield from spec.relation_overrides.values()
+
+    def reset_value_specs(self, roots: Dict[str, range] = None):
+        """Reset the state of all specs at the start of a run, see `ValueSpec`.
+
+        `roots` are the indices of the root instances per entity in this run.
+        """
+        roots = roots or {}
+        for ename, entity in self.spec["entities"].items():
+            for spec in entity.fields.values():
+                spec.reset(roots.get(ename, range(0)))
+                if isinstance(spec, RelationSpec) and spec.relation_overrides:
+                    for override in spec.relation_overrides.values():
+                        override.reset()
+
+    def start_shard(self, shard: int, shards: int):
+        """ Prepare all specs for shard `shard` of `shards`, see `ValueSpec` """
+        for spec in self.value_specs():
+            spec.start_shard(shard, shards)
+
+    def unique_values(self) -> List[UniqueValues]:
+        """ Return the values of all unique Faker fields, see `factory_boss.unique` """
+        return [
+            spec.unique
+            for spec in self.value_specs()
+            if isinstance(spec, FakerField) and spec.unique is not None
+        ]
+
+    def _require_picks_with_replacement(self, mode: str):
+        for entity in self.spec["entities"].values():
+            for relation in entity.relations():
+                if not relation.relation_strategy_options.replace:
+                    raise ConfigurationError(
+                        f"{entity.name}.{relation.name}: picking targets without "
+                        f"replacement is not supported in {mode}."
+                    )
+
+    def batches(
+        self, counts: Dict[str, int], batch_size: int
+    ) -> Iterator[Dict[str, range]]:
+        """Split `counts` into the root instances of all batches.
+
+        The first batch contains all instances of the targets of "pick_random"
+        relations. These are kept for the whole run. All other entities follow in
+        batches of at most `batch_size` instances.
+
+        Yields
+        ------
+        Dict[str, range]
+            indices of the root instances of each batch per entity
+        """
+        kept = self.pick_random_targets()
+        yield {ename: range(n) for ename, n in counts.items() if ename in kept}
+        for ename, n in counts.items():
+            if ename in kept:
+                continue
+            for start in range(0, n, batch_size):
+                yield {ename: range(start, min(start + batch_size, n))}
+
     def complete_relation_specs(self, entities: Dict[str, Entity]):
-        """ Create value specs for the remote side of each relation. """
+        """Create value specs for the remote side of each relation.
+
+        Remote specs which already exist, e.g., from a previous call, are kept.
+        """
         for ename, entity in entities.items():
             for relation in entity.relations():
                 if relation.relation_strategy != "none":
                     target = entities[relation.target_entity]
+                    existing = target.fields.get(relation.remote_name)
+                    if (
+                        isinstance(existing, RelationSpec)
+                        and existing.remote_name == relation.name
+                        and existing.target_entity == ename
+                    ):
+                        continue
                     remote_relation = relation.make_remote_spec(ename)
                     if remote_relation:
                         target.add_field(relation.remote_name, remote_relation)
 
-    def make_instances(self) -> List[Instance]:
-        """ Generate all `Instance`s including `InstanceValue`s """
-        n = 3  # generate 3 instances of each entity  # TODO make configurable
+    def instance_counts(self, counts: Dict[str, int] = None) -> Dict[str, int]:
+        """Return the number of root instances to generate per entity.
+
+        Explicit `counts` take precedence over the `count` of each entity in the
+        spec, which in turn takes precedence over `DEFAULT_COUNT`.
+        """
+        entities = self.spec["entities"]
+        counts = counts or {}
+        unknown = set(counts) - set(entities)
+        if unknown:
+            raise ConfigurationError(
+                f"Cannot set counts of unknown entities {sorted(unknown)}."
+            )
+        result = {}
+        for ename, entity in entities.items():
+            if ename in counts:
+                n = counts[ename]
+            elif entity.count is not None:
+                n = entity.count
+            else:
+                n = self.DEFAULT_COUNT
+            if n < 0:
+                raise ConfigurationError(f"Count of {ename} must not be negative.")
+            result[ename] = n
+        return result
+
+    def output_columns(
+        self, columns: Dict[str, List[str]] = None
+    ) -> Dict[str, List[str]]:
+        """ Check that all `columns` are fields of their entities and return them """
+        entities = self.spec["entities"]
+        columns = columns or {}
+        for ename, fields in columns.items():
+            if ename not in entities:
+                raise ConfigurationError(
+                    f"Cannot select columns of unknown entity {ename}."
+                )
+            unknown = [f for f in fields if f not in entities[ename].fields]
+            if unknown:
+                raise ConfigurationError(
+                    f"Cannot select unknown fields {unknown} of {ename}."
+                )
+        return {ename: list(fields) for ename, fields in columns.items()}
+
+    def pick_random_targets(self) -> Set[str]:
+        """ Return names of all entities that are targets of a random pick. """
+        return {
+            relation.target_entity
+            for entity in self.entities.values()
+            for relation in entity.relations()
+            if relation.relation_strategy == "pick_random"
+        }
+
+    @_phase
+    def make_instances(
+        self, counts: Dict[str, int] = None, first_index: Dict[str, int] = None
+    ) -> List[Instance]:
+        """Generate all `Instance`s including `InstanceValue`s
+
+        Parameters
+        ----------
+        counts : Dict[str, int], optional
+            number of instances per entity. Only entities in `counts` are
+            instantiated. Default: `instance_counts()`
+        first_index : Dict[str, int], optional
+            index of the first instance per entity, from which the keys of the
+            instances are derived. Default: 0
+        """
+        if counts is None:
+            counts = self.instance_counts()
+        first_index = first_index or {}
         instances: List[Instance] = []
-        for ename, ent in self.spec["entities"].items():
-            for i in range(n):
-                instance = ent.make_instance(overrides={})
+        for ename, n in counts.items():
+            ent = self.entities[ename]
+            first = first_index.get(ename, 0)
+            keys = self.streams.root_keys(ename, first, n)
+            for index, key in enumerate(keys, first):
+                instance = ent.make_instance(overrides={}, key=key, index=index)
                 instances.append(instance)
         return instances
 
-    def make_relations(self, instances: List[Instance]) -> List[Instance]:
-        all_instances = instances
-        new_instances = all_instances
-        relation_maker = RelationMaker([], self.spec["entities"])
-        while new_instances:
-            relation_maker.add_known_instances(new_instances)
-            new_instances = relation_maker.make_relations(new_instances)
-            all_instances += new_instances
-        return all_instances
-
-    def make_plan(self, instances) -> List[InstanceValue]:
-        """ Return evaluation order of instance values """
-        sorter = TopologicalSorter()
+    @_phase
+    def make_relations(
+        self, instances: List[Instance], relation_maker: RelationMaker = None
+    ) -> List[Instance]:
+        """Populate all relations, creating new instances if necessary.
+
+        Returns `instances` followed by all created instances, see
+        `RelationMaker.make_relations`.
+        """
+        if relation_maker is None:
+            relation_maker = RelationMaker([], self.entities, profiler=self.profiler)
+        return relation_maker.make_relations(instances)
+
+    @_phase
+    def make_plan(self, instances: List[Instance]) -> List[InstanceValue]:
+        """Return evaluation order of instance values
+
+        The values of each instance are scheduled in the order of the compiled
+        `EvaluationPlan` of its entity. Only values with references to other
+        instances are scheduled together with their dependencies in a depth first
+        search. Each value is visited once, so the plan is built in linear time.
+        """
+        plan: List[InstanceValue] = []
+        scheduled: Set[InstanceValue] = set()
         for instance in instances:
-            for ivalue in instance.instance_values.values():
-                references = ivalue.resolved_references().values()
-                dependencies = [ref.resolved_target for ref in references]
-                sorter.add(ivalue, *dependencies)
-        plan = sorter.static_order()
-        plan = list(plan)
+            eplan = instance.plan or instance.entity.evaluation_plan()
+            for fname in eplan.order:
+                ivalue = instance.instance_values[fname]
+                if ivalue.defined or ivalue in scheduled:
+                    continue
+                if fname in eplan.crossing:
+                    self._schedule_with_dependencies(ivalue, plan, scheduled)
+                else:
+                    scheduled.add(ivalue)
+                    plan.append(ivalue)
         return plan
 
-    def execute_plan(self, plan):
+    @staticmethod
+    def _schedule_with_dependencies(
+        ivalue: InstanceValue, plan: List[InstanceValue], scheduled: Set[InstanceValue]
+    ):
+        """ Append `ivalue` and all its unscheduled dependencies to `plan` """
+
+        def dependencies(iv):
+            for target in iv.resolved_targets(keep=True):
+                if isinstance(target, InstanceValue) and not target.defined:
+                    yield target
+
+        stack = [(ivalue, dependencies(ivalue))]
+        visiting = {ivalue}
+        while stack:
+            current, deps = stack[-1]
+            for dep in deps:
+                if dep in scheduled:
+                    continue
+                if dep in visiting:
+                    raise ConfigurationError(
+                        f"Circular reference: {dep.owner.entity.name}.{dep.name} "
+                        f"depends on itself."
+                    )
+                visiting.add(dep)
+                stack.append((dep, dependencies(dep)))
+                break
+            else:
+                stack.pop()
+                visiting.discard(current)
+                scheduled.add(current)
+                plan.append(current)
+
+    @_phase
+    def execute_plan(self, plan: List[InstanceValue]):
+        """Evaluate all instance values of `plan` in order.
+
+        Values whose spec has no references are generated up front, with one call
+        of `ValueSpec.generate_batch` (or `generate_indexed`) per spec and field.
+        """
+        batches: Dict[Tuple[ValueSpec, str], List[InstanceValue]] = {}
+        for ivalue in plan:
+            spec = ivalue.spec
+            if not (
+                ivalue.defined
+                or spec.references()
+                or isinstance(spec, RelationSpec)
+                or ivalue.owner.key is None
+            ):
+                try:
+                    batches[spec, ivalue.name].append(ivalue)
+                except KeyError:
+                    batches[spec, ivalue.name] = [ivalue]
+        profiler = self.profiler
+        for (spec, fname), ivalues in batches.items():
+            start = time.perf_counter()
+            if spec.indexed:
+                values = spec.generate_indexed([iv.owner.index for iv in ivalues])
+            else:
+                seeds = value_seeds([ivalue.owner.key for ivalue in ivalues], fname)
+                values = spec.generate_batch(len(ivalues), seeds=seeds)
+            for ivalue, value in zip(ivalues, values):
+                ivalue.override_value(value)
+            if profiler is not None:
+                ename = ivalues[0].owner.entity.name
+                seconds = time.perf_counter() - start
+                profiler.record_values(ename, fname, spec, seconds, len(ivalues))
+        if profiler is None:
+            for ivalue in plan:
+                ivalue.make_value()
+            return
         for ivalue in plan:
+            if ivalue.defined:
+                continue
+            start = time.perf_counter()
             ivalue.make_value()
+            seconds = time.perf_counter() - start
+            profiler.record_values(
+                ivalue.owner.entity.name, ivalue.name, ivalue.spec, seconds
+            )
 
+    @_phase
     def instances_to_dict(
-        self, instances: List[Instance], with_related_objects: bool = True
+        self,
+        instances: List[Instance],
+        with_related_objects: Union[bool, str] = True,
+        columns: Dict[str, List[str]] = None,
     ) -> Dict[str, List[Dict]]:
+        columns = columns or {}
+        if with_related_objects == "references":
+            return self._instances_to_rows_with_references(instances, columns)
         dicts: Dict[str, List[Dict]] = {}
         for instance in instances:
             ename = instance.entity.name
-            idict = instance.to_dict(with_related_objects)
+            idict = instance.to_dict(with_related_objects, columns.get(ename))
             try:
                 dicts[ename].append(idict)
             except KeyError:
                 dicts[ename] = [idict]
         return dicts
+
+    def _instances_to_rows_with_references(
+        self, instances: List[Instance], columns: Dict[str, List[str]]
+    ) -> Dict[str, List[Dict]]:
+        """Output every instance as one row, with related objects as `RowReference`s
+
+        Each row is built exactly once and does not contain other rows, so the
+        output is linear in the number of instances, and cyclic relations need no
+        special handling. Related objects which are not part of the output (e.g.,
+        existing rows in delta generation) are output as None.
+        """
+        references: Dict[Instance, RowReference] = {}
+        dicts: Dict[str, List[Dict]] = {}
+        for instance in instances:
+            ename = instance.entity.name
+            rows = dicts.setdefault(ename, [])
+            references[instance] = RowReference(ename, len(rows))
+            rows.append({})
+        for instance in instances:
+            entity = instance.entity
+            row = dicts[entity.name][references[instance].index]
+            relation_fields = entity.relation_fields()
+            fields = columns.get(entity.name)
+            for name in entity.fields if fields is None else fields:
+                value = instance.value(name)
+                if name in relation_fields:
+                    if isinstance(value, list):
+                        value = [references.get(v) for v in value]
+                    elif value is not None:
+                        value = references.get(value)
+                row[name] = value
+        return dicts
@@ -1,42 +1,138 @@
-""" Work in progress for a proper grammar for dynamic field specifications.
+""" Grammar and parser for the code of dynamic fields.
 
-Not in use yet."""
+Code consists of literal text and references to other fields:
+
+* `$name` or `$relation.name` refers to a field, `$SELF` to the instance itself;
+* `${ relation.name }` does the same, but ends explicitly at the closing brace;
+* `$name[1]` and `$name[:4]` index or slice the value of the referenced field;
+* `\\$` is a literal dollar sign and `\\\\` a literal backslash.
+
+A dot or a bracket directly after a reference is part of the reference only if it
+continues it, i.e., if a name follows the dot or the brackets contain an index or
+a slice. Otherwise it is literal text. That way the grammar is LALR(1), and code is
+parsed with Lark's fast LALR parser and contextual lexer.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+
+from lark import Lark, Token, Transformer
+from lark.exceptions import LarkError, VisitError
+
+from factory_boss.errors import InvalidReferenceError
 
 value_grammar = r"""
-start : expression
-expression : (reference | literal)+
-reference.10 : "$" _reference_body
-          | "${" _WS* _reference_body _WS* "}"
-_reference_body : ref_element ("." ref_element)*
-ref_element.10 : element_name [element_access]
-element_name.10 : CNAME
-element_access.10 :  "[" _WS* _element_accessor _WS* "]"
-_element_accessor : slice | index
-slice : [[SIGNED_INT ":"] SIGNED_INT] ":" [SIGNED_INT]
-index : SIGNED_INT
-
-literal.-1: (/[^$\\]+/ | _escape DOLLAR | _escaped_backslash )+
-DOLLAR: "$"
-_escape : _BACKSLASH
-_escaped_backslash : _BACKSLASH BACKSLASH
-BACKSLASH : "\\"
-_BACKSLASH : "\\"
-
-_WS: WS
-
-%import common.WS
-%import common.NUMBER
-%import common.SIGNED_NUMBER
-%import common.INT
-%import common.SIGNED_INT
-%import common.CNAME
+start : _part*
+_part : reference | braced_reference | LITERAL | ESCAPE
+
+reference : "$" _path
+_path : element (DOT element)*
+element : NAME (INDEX | SLICE)?
+
+braced_reference : LBRACE _braced_path RBRACE
+_braced_path : braced_element (DOT braced_element)*
+braced_element : NAME (INDEX | SLICE)?
+
+NAME : /[a-zA-Z_]\w*/
+DOT.2 : /\.(?=[a-zA-Z_])/
+INDEX.2 : /\[\s*[+-]?\d+\s*\]/
+SLICE.2 : /\[\s*([+-]?\d+)?\s*:\s*([+-]?\d+)?\s*(:\s*([+-]?\d+)?\s*)?\]/
+LBRACE.2 : /\$\{\s*/
+RBRACE : /\s*\}/
+ESCAPE.1 : /\\[$\\]/
+LITERAL : /([^$\\]|\\(?![$\\]))+/
 """
 
-if __name__ == "__main__":
-    from lark import Lark
+Accessor = Union[int, slice, None]
+""" index or slice of a reference, None if the whole value is referenced """
+
+CodePart = Union[str, Tuple[str, Accessor]]
+""" literal text, or target and accessor of a reference """
+
+
+@lru_cache(maxsize=None)
+def value_parser() -> Lark:
+    """ Return the LALR parser for dynamic fields, constructed only once """
+    return Lark(value_grammar, parser="lalr", lexer="contextual")
+
+
+class _CodeTransformer(Transformer):
+    """ Transform a parse tree into a tuple of `CodePart`s """
+
+    def start(self, children) -> Tuple[CodePart, ...]:
+        parts = []
+        for child in children:
+            if isinstance(child, Token):
+                text = child[1] if child.type == "ESCAPE" else str(child)
+                if parts and isinstance(parts[-1], str):
+                    parts[-1] += text
+                else:
+                    parts.append(text)
+            else:
+                parts.append(child)
+        return tuple(parts)
+
+    def element(self, children) -> Tuple[str, Accessor]:
+        name, *access = children
+        return str(name), _accessor(access[0]) if access else None
+
+    braced_element = element
+
+    def reference(self, children) -> Tuple[str, Accessor]:
+        elements = [child for child in children if not isinstance(child, Token)]
+        if any(accessor is not None for _, accessor in elements[:-1]):
+            raise InvalidReferenceError(
+                "Only the last element of a reference can be indexed or sliced."
+            )
+        return ".".join(name for name, _ in elements), elements[-1][1]
+
+    braced_reference = reference
+
+
+def _accessor(token: Token) -> Accessor:
+    inner = token[1:-1]
+    if token.type == "INDEX":
+        return int(inner)
+    bounds = [int(bound) if bound.strip() else None for bound in inner.split(":")]
+    return slice(*bounds)
+
+
+@lru_cache(maxsize=4096)
+def parse_code(code: str) -> Tuple[CodePart, ...]:
+    """Parse the code of a dynamic field.
+
+    Results are memoized by code, so fields which share the same code are parsed
+    only once.
+
+    Returns
+    -------
+    Tuple[CodePart, ...]
+        the literal texts (merged) and references in order of appearance
+
+    Raises
+    ------
+    InvalidReferenceError
+        if the code cannot be parsed, e.g., because a `$` is not followed by a name
+    """
+    try:
+        tree = value_parser().parse(code)
+        return _CodeTransformer().transform(tree)
+    except VisitError as e:
+        raise e.orig_exc
+    except LarkError as e:
+        raise InvalidReferenceError(
+            f"Cannot parse '{code}'. Use '\\$' for a literal dollar sign.\n{e}"
+        )
 
-    parser = Lark(value_grammar, parser="earley")
 
-    code = r"$a[-56: ].b${ this.is.a.ref}fgds gfd $FIRST.x[1] \$test \\$test2 \\\$test3 \\\\$test4"
-    print(parser.parse(code))
-    print(parser.parse(code).pretty())
+def reference_str(target: str, accessor: Optional[Accessor]) -> str:
+    """ Format a reference as code, e.g., "postcode[:4]" """
+    if accessor is None:
+        return target
+    if isinstance(accessor, slice):
+        bounds = [accessor.start, accessor.stop]
+        if accessor.step is not None:
+            bounds.append(accessor.step)
+        inner = ":".join("" if b is None else str(b) for b in bounds)
+    else:
+        inner = str(accessor)
+    return f"{target}[{inner}]"
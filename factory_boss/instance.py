@@ -1,23 +1,53 @@
 from __future__ import annotations
 
 import collections.abc
+import threading
 import typing
 from pprint import pformat
-from typing import Any, Dict
+from typing import Any, Dict, List, NamedTuple
 
-from factory_boss.errors import UndefinedValueError
+from factory_boss.errors import ConfigurationError, UndefinedValueError
+from factory_boss.random_streams import value_seed
 
 if typing.TYPE_CHECKING:
     from factory_boss.entity import Entity
-    from factory_boss.value_spec import Reference, ResolvedReference, ValueSpec
+    from factory_boss.evaluation_plan import EvaluationPlan
+    from factory_boss.reference_resolver import ReferencePath
+    from factory_boss.value_spec import ValueSpec
+
+
+class RowReference(NamedTuple):
+    """Reference to an output row: the row at `index` in the rows of `entity`.
+
+    Used in place of related objects by `Generator.generate` with
+    ``output_with_related_objects="references"``.
+    """
+
+    entity: str
+    index: int
 
 
 class Instance:
-    """One instance of an entity, i.e., an object with zero or more fields."""
+    """One instance of an entity, i.e., an object with zero or more fields.
+
+    Parameters
+    ----------
+    entity : Entity
+        the entity of the instance
+    key : int, optional
+        64-bit key of the instance, see `factory_boss.random_streams`. If set, all
+        values of the instance are seeded from it.
+    index : int, optional
+        index of a root instance among all root instances of its entity. None for
+        instances created by relations, see `ValueSpec.generate_indexed`.
+    """
 
-    def __init__(self, entity: "Entity"):
+    def __init__(self, entity: "Entity", key: int = None, index: int = None):
         self.entity = entity
+        self.key = key
+        self.index = index
         self.instance_values: Dict[str, InstanceValue] = {}
+        self.plan: "EvaluationPlan" = None
         self._dict: Dict[str, Any] = None
 
     def ivalue(self, name):
@@ -27,21 +57,32 @@ class Instance:
         return self.instance_values[name].make_value()
 
     def relations(self) -> typing.List["InstanceValue"]:
-        return [
-            self.instance_values[n]
-            for n, spec in self.entity.fields.items()
-            if spec.type == "relation"
-        ]
+        instance_values = self.instance_values
+        return [instance_values[n] for n in self.entity.relation_fields()]
 
-    def to_dict(self, with_related_objects: bool = True) -> Dict[str, Any]:
+    def to_dict(
+        self, with_related_objects: bool = True, fields: List[str] = None
+    ) -> Dict[str, Any]:
         """Return all values of this instance as a dictionary.
 
+        Values which have not been evaluated yet are evaluated on demand, together
+        with the values they depend on.
+
+        The dictionary with related objects is built only once and cached. Related
+        objects are embedded as their own cached dictionaries, so an instance that
+        is related to many others is embedded as one shared dictionary, and cyclic
+        relations (e.g., partners) result in cyclic dictionaries instead of endless
+        recursion.
+
         Parameters
         ----------
         with_related_objects : bool, optional
             if True, related objects are placed into the dictionary. If False,
             they are not in the dictionary, but only the foreign key is set to the id
             (if applicable). Default: True
+        fields : List[str], optional
+            if given, only these fields are placed into the dictionary, and only
+            their values (and the values they depend on) are evaluated.
 
         Returns
         -------
@@ -49,33 +90,91 @@ class Instance:
             A dictionary representing this instance.
 
         """
-        undefined_values = [n for n, v in self.instance_values.items() if not v.defined]
-        if undefined_values:
-            raise UndefinedValueError(
-                f"Cannot create dict because the following values of "
-                f"Instance('{self.entity.name}') are undefined: {undefined_values}"
-            )
-        if self._dict is None:
-            self._dict = {}
-            for name, ivalue in self.instance_values.items():
-                value = ivalue.make_value()
-                if (
-                    not with_related_objects
-                    and self.entity.fields[name].type == "relation"
-                ):
-                    continue
-                if isinstance(value, Instance):
-                    value = value.to_dict()
-                if isinstance(value, list):
-                    # unwrap relation lists
-                    value = [v.to_dict() for v in value]
-                self._dict[name] = value
-        return self._dict
+        if fields is None and with_related_objects and self._dict is not None:
+            return self._dict
+        d: Dict[str, Any] = {}
+        if fields is None and with_related_objects:
+            # register the dict before filling it, so that cycles terminate
+            self._dict = d
+        relation_fields = self.entity.relation_fields()
+        for name in self.instance_values if fields is None else fields:
+            if name in relation_fields and not with_related_objects:
+                continue
+            value = self.instance_values[name].make_value()
+            if isinstance(value, Instance):
+                value = value.to_dict()
+            if isinstance(value, list):
+                # unwrap relation lists
+                value = [v.to_dict() for v in value]
+            d[name] = value
+        return d
+
+    def release(self):
+        """Drop all values of this instance.
+
+        `InstanceValue`s point back to their owner, so an instance and its values
+        form a reference cycle. Releasing an instance breaks that cycle, so the
+        memory is freed as soon as the instance is not referenced anymore instead
+        of waiting for the garbage collector.
+        """
+        self.instance_values = {}
+        self._dict = None
 
     def __repr__(self):
         return f"Instance({pformat(self.instance_values)})"
 
 
+_PENDING = object()
+""" value of an `InstanceValue` while it is being generated """
+
+Target = typing.Union[Instance, "InstanceValue"]
+""" what a reference resolves to: an instance value, or an instance itself """
+
+
+class _Evaluation(threading.local):
+    """ The `InstanceValue` which is currently evaluated in this thread """
+
+    ivalue: "InstanceValue" = None
+
+
+_evaluation = _Evaluation()
+
+
+class BoundReference:
+    """A reference which looks up its target for the value being evaluated.
+
+    It takes the place of a `ResolvedReference`, but is bound to a spec instead of
+    a single value: its target is resolved in the context of the `InstanceValue`
+    whose `make_value` currently runs. Hence, one object serves all values of the
+    spec, see `ValueSpec.bound_references`.
+
+    Parameters
+    ----------
+    position : int
+        position of the reference in the references of the spec
+    path : ReferencePath
+        compiled target of the reference
+    """
+
+    __slots__ = ("position", "path")
+
+    def __init__(self, position: int, path: "ReferencePath"):
+        self.position = position
+        self.path = path
+
+    def value(self):
+        ivalue = _evaluation.ivalue
+        targets = ivalue._targets
+        if targets is None:
+            target = self.path.resolve(ivalue.context)
+        else:
+            target = targets[self.position]
+        if isinstance(target, InstanceValue):
+            # generates the target value on demand in lazy mode
+            return target.make_value()
+        return target
+
+
 class InstanceValue:
     """One field of an instance, i.e., one field.
 
@@ -97,7 +196,7 @@ class InstanceValue:
         self._value = None
         self.defined = False
         self.context = context or owner
-        self._resolved_references: Dict[Reference, ResolvedReference] = {}
+        self._targets: List[Target] = None
 
     def value(self):
         if self.defined:
@@ -106,20 +205,60 @@ class InstanceValue:
             raise UndefinedValueError(f"value of {self.name} is not defined")
 
     def make_value(self):
+        """Return the value, generating it first if it is not defined yet.
+
+        References are pulled through `make_value` as well, so the values this value
+        depends on are generated on demand.
+        """
         if not self.defined:
-            self.defined = True
-            self._value = self.spec.generate_value(self.resolved_references())
+            if self._value is _PENDING:
+                raise ConfigurationError(
+                    f"Circular reference: {self.owner.entity.name}.{self.name} "
+                    f"depends on itself."
+                )
+            self._value = _PENDING
+            spec = self.spec
+            key = self.owner.key
+            evaluation = _evaluation
+            outer = evaluation.ivalue
+            evaluation.ivalue = self
+            try:
+                refs = spec.bound_references()
+                if spec.indexed and not refs:
+                    value = spec.generate_indexed([self.owner.index])[0]
+                elif key is None:
+                    value = spec.generate_value(refs)
+                else:
+                    value = spec.generate_seeded(refs, value_seed(key, self.name))
+            except BaseException:
+                self._value = None
+                raise
+            finally:
+                evaluation.ivalue = outer
+                # targets resolved while planning are only used once
+                self._targets = None
+            self.override_value(value)
         return self._value
 
     def override_value(self, value):
         self._value = value
         self.defined = True
 
-    def add_resolved_reference(self, reference: "ResolvedReference"):
-        self._resolved_references[reference.parent] = reference
+    def resolved_targets(self, keep: bool = False) -> List[Target]:
+        """Resolve the references of the spec in the context of this value.
 
-    def resolved_references(self):
-        return self._resolved_references
+        Returns the targets in the order of `spec.references()`. Each reference is
+        looked up through its compiled `ReferencePath`. When the value is
+        evaluated, its `BoundReference`s resolve the targets again, unless `keep` is
+        True: then the targets are kept for the next evaluation of the value, e.g.,
+        when they have been resolved to plan the evaluation order, and dropped by
+        it.
+        """
+        context = self.context
+        targets = [ref.path.resolve(context) for ref in self.spec.references()]
+        if keep and targets:
+            self._targets = targets
+        return targets
 
     def unresolved_references(self):
         return self.spec.references()
@@ -140,8 +279,6 @@ class CopiedInstanceValue(InstanceValue):
         self.name = name
         self.owner = owner
         self.copy_of = copy_of
-        self.reference = Reference("<autogenerated>")
-        self.resolved_reference = ResolvedReference(None, copy_of)
 
     def value(self):
         return self.copy_of.value()
@@ -152,5 +289,5 @@ class CopiedInstanceValue(InstanceValue):
     def unresolved_references(self):
         return []
 
-    def resolved_references(self):
-        return {self.reference: self.resolved_reference}
+    def resolved_targets(self, keep=False):
+        return [self.copy_of]
@@ -0,0 +1,70 @@
+""" Generation of batches in a pool of worker processes. """
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Deque, Dict, Iterator, Tuple
+
+from factory_boss.batches import BatchRunner, Fingerprints, Rows
+
+_runner: BatchRunner = None
+
+
+def _init_worker(runner: BatchRunner):
+    global _runner
+    _runner = runner
+
+
+def _run_batch(shard: int, batch: Dict[str, range]) -> Tuple[Rows, Fingerprints]:
+    return _runner.run(batch, shard)
+
+
+def run_batches(
+    runner: BatchRunner,
+    batches: Iterator[Dict[str, range]],
+    workers: int = 1,
+    mp_context: BaseContext = None,
+) -> Iterator[Rows]:
+    """Generate `batches` with `runner` and yield the rows of each batch in order.
+
+    The first batch is always generated in this process. If `workers` is greater
+    than 1, the runner, including the kept first batch, is sent to `workers` worker
+    processes once, and all further batches are distributed among them. At most
+    two batches per worker are in flight, so memory stays bounded even if the
+    consumer of the rows is slow.
+
+    Because all random decisions are seeded per row, and the batches are merged in
+    order in this process (see `BatchRunner.merge`), the yielded rows are the same
+    for any number of workers.
+
+    `mp_context` is the multiprocessing context which starts the worker processes,
+    e.g., `multiprocessing.get_context("spawn")`. Default: None, i.e., the default
+    start method of the platform.
+    """
+    tasks = enumerate(batches)
+    first = next(tasks, None)
+    if first is None:
+        return
+    shard, batch = first
+    yield runner.merge(batch, shard, *runner.run(batch, shard))
+    if workers <= 1:
+        for shard, batch in tasks:
+            yield runner.merge(batch, shard, *runner.run(batch, shard))
+        return
+
+    with ProcessPoolExecutor(
+        workers, mp_context, initializer=_init_worker, initargs=(runner,)
+    ) as executor:
+        pending: Deque[Tuple[int, Dict[str, range], Future]] = deque()
+        try:
+            for shard, batch in tasks:
+                future = executor.submit(_run_batch, shard, batch)
+                pending.append((shard, batch, future))
+                if len(pending) >= 2 * workers:
+                    shard, batch, future = pending.popleft()
+                    yield runner.merge(batch, shard, *future.result())
+            while pending:
+                shard, batch, future = pending.popleft()
+                yield runner.merge(batch, shard, *future.result())
+        finally:
+            for _, _, future in pending:
+                future.cancel()
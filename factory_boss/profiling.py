@@ -0,0 +1,136 @@
+""" Instrumentation of generation runs.
+
+Pass a `Profiler` to the `Generator` to record where the time of a run goes::
+
+    profiler = Profiler()
+    Generator(spec, profiler=profiler).generate()
+    print(profiler.report())
+
+Without a profiler, the generator only checks once per phase and per field
+whether it should record anything.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Tuple
+
+if TYPE_CHECKING:
+    from factory_boss.value_spec import ValueSpec
+
+
+class Timing:
+    """ Accumulated wall time and number of calls """
+
+    __slots__ = ("seconds", "calls")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+
+    def add(self, seconds: float, calls: int = 1):
+        self.seconds += seconds
+        self.calls += calls
+
+    def __repr__(self):
+        return f"Timing(seconds={self.seconds:.6f}, calls={self.calls})"
+
+
+def spec_label(spec: "ValueSpec") -> str:
+    """ Name of the kind of a spec, e.g., "FakerField(name)" or "DynamicField" """
+    faker_func = getattr(spec, "faker_func", None)
+    name = type(spec).__name__
+    return f"{name}({faker_func})" if faker_func else name
+
+
+class Profiler:
+    """Wall time and call counts of generation runs.
+
+    Records
+
+    * per phase (e.g., "make_relations" or "execute_plan"): wall time and calls;
+    * per field of an entity and per kind of spec (see `spec_label`): the time
+      spent generating values and the number of generated values;
+    * per relation: the number of instances it created.
+
+    The records of all runs of a generator are accumulated. With `workers` > 1,
+    only the work done in the calling process is recorded.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, Timing] = defaultdict(Timing)
+        self.fields: Dict[Tuple[str, str], Timing] = defaultdict(Timing)
+        self.specs: Dict[str, Timing] = defaultdict(Timing)
+        self.created: Dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """ Record the wall time of the block as one call of phase `name` """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name].add(time.perf_counter() - start)
+
+    def record_values(
+        self, entity: str, field: str, spec: "ValueSpec", seconds: float, n: int = 1
+    ):
+        """ Record that `n` values of `field` of `entity` took `seconds` """
+        self.fields[entity, field].add(seconds, n)
+        self.specs[spec_label(spec)].add(seconds, n)
+
+    def count_created(self, entity: str, relation: str, n: int = 1):
+        """ Record that `relation` of `entity` created `n` instances """
+        self.created[f"{entity}.{relation}"] += n
+
+    def entities(self) -> Dict[str, Timing]:
+        """ Return the time spent generating values per entity """
+        timings: Dict[str, Timing] = defaultdict(Timing)
+        for (entity, _), timing in self.fields.items():
+            timings[entity].add(timing.seconds, timing.calls)
+        return dict(timings)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Return all records as a JSON serializable dictionary """
+
+        def timings(records: Dict[str, Timing]) -> Dict[str, Dict[str, Any]]:
+            return {
+                name: {"seconds": timing.seconds, "calls": timing.calls}
+                for name, timing in records.items()
+            }
+
+        return {
+            "phases": timings(self.phases),
+            "entities": timings(self.entities()),
+            "fields": timings(
+                {f"{entity}.{field}": t for (entity, field), t in self.fields.items()}
+            ),
+            "specs": timings(self.specs),
+            "created": dict(self.created),
+        }
+
+    def report(self, top: int = 10) -> str:
+        """ Return a human readable report, with the `top` slowest fields """
+        lines: List[str] = []
+
+        def section(title: str, records: Dict[str, Timing], limit: int = None):
+            lines.append(title)
+            lines.append("-" * len(title))
+            ranked = sorted(records.items(), key=lambda item: -item[1].seconds)
+            for name, timing in ranked[:limit]:
+                per_call = timing.seconds / timing.calls * 1e6 if timing.calls else 0
+                lines.append(
+                    f"{name:<40} {timing.seconds:>9.3f} s {timing.calls:>10} calls "
+                    f"{per_call:>10.1f} us/call"
+                )
+            lines.append("")
+
+        section("Phases", self.phases)
+        section("Entities", self.entities())
+        section("Specs", self.specs)
+        fields = {f"{entity}.{field}": t for (entity, field), t in self.fields.items()}
+        section(f"Slowest fields (top {top})", fields, top)
+        lines.append("Created instances")
+        lines.append("-----------------")
+        for relation, n in sorted(self.created.items()):
+            lines.append(f"{relation:<40} {n:>10}")
+        return "\n".join(lines)
@@ -0,0 +1,119 @@
+""" Pruning of fields which are not needed for the selected output columns. """
+from typing import Dict, List, Set, Tuple
+
+from factory_boss.entity import Entity
+from factory_boss.value_spec import RelationSpec, ValueSpec
+
+
+def required_fields(
+    entities: Dict[str, Entity], columns: Dict[str, List[str]]
+) -> Dict[str, Set[str]]:
+    """Return the fields per entity which are needed to output `columns`.
+
+    A field is needed if
+
+    * it is selected in `columns`, or its entity is not in `columns` at all;
+    * a needed field refers to it, directly or through relations, e.g., the
+      `local_field` of a relation refers to the key of the target;
+    * it is a relation which creates instances, because it determines the number
+      of rows, or the remote side or `weight_field` of a needed relation;
+    * a needed relation overrides a needed field of its target with a spec that
+      refers to it.
+
+    The remote sides of relations must already exist, i.e., call
+    `Generator.complete_relation_specs` first.
+
+    Parameters
+    ----------
+    entities : Dict[str, Entity]
+        all entities of the spec
+    columns : Dict[str, List[str]]
+        selected fields per entity
+
+    Returns
+    -------
+    Dict[str, Set[str]]
+        names of the needed fields per entity
+    """
+    required: Dict[str, Set[str]] = {ename: set() for ename in entities}
+    queue = []
+
+    def require(ename: str, fname: str):
+        entity = entities.get(ename)
+        if entity is not None and fname in entity.fields:
+            if fname not in required[ename]:
+                required[ename].add(fname)
+                queue.append((ename, fname))
+
+    def require_path(ename: str, target: str):
+        for token in target.split("."):
+            if token == "SELF":
+                continue
+            require(ename, token)
+            spec = entities[ename].fields.get(token)
+            if not isinstance(spec, RelationSpec):
+                return
+            ename = spec.target_entity
+
+    for ename, entity in entities.items():
+        for fname, spec in entity.fields.items():
+            if (
+                ename not in columns
+                or fname in columns[ename]
+                or (
+                    isinstance(spec, RelationSpec)
+                    and spec.relation_strategy.startswith("create")
+                )
+            ):
+                require(ename, fname)
+
+    # overrides of needed relations, by target entity and overridden field, with
+    # the entity in whose context they are evaluated
+    overrides: Dict[str, Dict[str, List[Tuple[str, ValueSpec]]]] = {}
+    while queue:
+        ename, fname = queue.pop()
+        spec = entities[ename].fields[fname]
+        for ref in spec.references():
+            require_path(ename, ref.target)
+        for context, override in overrides.get(ename, {}).get(fname, []):
+            for ref in override.references():
+                require_path(context, ref.target)
+        if not isinstance(spec, RelationSpec):
+            continue
+        target = spec.target_entity
+        if spec.remote_name:
+            require(target, spec.remote_name)
+        weight_field = spec.relation_strategy_options.weight_field
+        if weight_field is not None:
+            require(target, weight_field)
+        for overridden, override in (spec.relation_overrides or {}).items():
+            by_field = overrides.setdefault(target, {})
+            by_field.setdefault(overridden, []).append((ename, override))
+            if overridden in required[target]:
+                for ref in override.references():
+                    require_path(ename, ref.target)
+    return required
+
+
+def prune_entities(
+    entities: Dict[str, Entity], columns: Dict[str, List[str]]
+) -> Dict[str, Entity]:
+    """Return copies of `entities` without the fields not needed for `columns`.
+
+    See `required_fields`. If `columns` is empty, `entities` are returned as is.
+    """
+    if not columns:
+        return entities
+    required = required_fields(entities, columns)
+    return {
+        ename: Entity(
+            ename,
+            {
+                fname: spec
+                for fname, spec in entity.fields.items()
+                if fname in required[ename]
+            },
+            count=entity.count,
+        )
+        for ename, entity in entities.items()
+    }
@@ -0,0 +1,102 @@
+""" Counter-based random streams for reproducible generation.
+
+Every generated row has a 64-bit key. Root rows derive their key from the seed of
+the run, their entity and their index. Rows created through a relation derive it
+from the key of the creating row, the relation and their position. Every random
+decision, i.e., every value and every relation, is seeded with a hash of the key of
+its row and the name of its field.
+
+Hence a value only depends on the seed, on the position of its row in the graph of
+created rows and on its field. It does not depend on the order in which rows are
+generated, on the process that generates them, on the number of other rows or on
+the other fields of the entity.
+"""
+import hashlib
+import random
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+MASK64 = (1 << 64) - 1
+
+
+def splitmix64(x: int) -> int:
+    """ Finalizer of the SplitMix64 generator: a fast, well mixing 64-bit hash """
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def splitmix64_array(x: "np.ndarray") -> "np.ndarray":
+    """ `splitmix64` of every element of a NumPy array of dtype uint64 """
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+@lru_cache(maxsize=None)
+def name_key(name: str) -> int:
+    """ Stable 64-bit key of a name (unlike `hash`, equal in every process) """
+    digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+    return splitmix64(int.from_bytes(digest, "big"))
+
+
+def mix(key: int, name: str) -> int:
+    """ Combine a 64-bit key with a name into a new key """
+    return splitmix64(key ^ name_key(name))
+
+
+def child_keys(parent_key: int, relation: str, n: int) -> List[int]:
+    """ Keys of `n` rows created by `relation` of the row with key `parent_key` """
+    relation_key = mix(parent_key, relation)
+    return [splitmix64(relation_key + index) for index in range(n)]
+
+
+def value_seed(row_key: int, field: str) -> int:
+    """ Seed of the value of `field` in the row with key `row_key` """
+    return mix(row_key, field)
+
+
+def value_seeds(row_keys: Sequence[int], field: str) -> List[int]:
+    """ `value_seed` of `field` for many rows at once """
+    if np is None or len(row_keys) < 64:
+        field_key = name_key(field)
+        return [splitmix64(key ^ field_key) for key in row_keys]
+    keys = np.asarray(row_keys, dtype=np.uint64)
+    return splitmix64_array(keys ^ np.uint64(name_key(field))).tolist()
+
+
+def randint(seed: int, a: int, b: int) -> int:
+    """ Random integer N with a <= N <= b, derived from `seed` """
+    return a + ((splitmix64(seed) * (b - a + 1)) >> 64)
+
+
+class RandomStreams:
+    """Derive the keys of root rows from the seed of a run.
+
+    Parameters
+    ----------
+    seed : int, optional
+        seed of the run. If None, a random seed is drawn.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self._seed_key = splitmix64(seed & MASK64)
+
+    def root_keys(self, entity: str, start: int, n: int) -> List[int]:
+        """ Keys of the root rows number `start` to `start + n - 1` of `entity` """
+        entity_key = mix(self._seed_key, entity)
+        return [splitmix64(entity_key + index) for index in range(start, start + n)]
+
+    def __repr__(self):
+        return f"RandomStreams(seed={self.seed})"
@@ -1,32 +1,84 @@
-from factory_boss.instance import InstanceValue
+""" Resolution of references through precompiled paths. """
+import warnings
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple, Union
+
+from factory_boss.errors import InvalidReferenceError
+from factory_boss.instance import Instance, InstanceValue
+
+
+class ReferencePath:
+    """The compiled target of a reference, e.g., "SELF.current_address.postcode".
+
+    The target is split once into the relations to follow (`hops`) and the
+    referenced `field`, which is None if the reference points to an instance
+    itself. Resolving a reference is then a short loop over the hops, without any
+    string processing.
+
+    Use `compile_path` to create paths, so that all references with the same
+    target share one path.
+    """
+
+    __slots__ = ("target", "hops", "field")
+
+    def __init__(self, target: str):
+        tokens = [token for token in target.split(".") if token != "SELF"]
+        self.target = target
+        self.hops: Tuple[str, ...] = tuple(tokens[:-1])
+        self.field = tokens[-1] if tokens else None
+
+    def resolve(self, context: Instance) -> Union[Instance, InstanceValue]:
+        """ Return the instance value or instance the path points to from `context` """
+        name = None
+        try:
+            for name in self.hops:
+                context = context.instance_values[name].value()
+            if self.field is None:
+                return context
+            name = self.field
+            return context.instance_values[name]
+        except KeyError:
+            raise InvalidReferenceError(
+                f"Cannot resolve reference '{self.target}': "
+                f"'{context.entity.name}' has no field '{name}'."
+            )
+
+    def __repr__(self):
+        return f"ReferencePath('{self.target}')"
+
+
+@lru_cache(maxsize=None)
+def compile_path(target: str) -> ReferencePath:
+    """ Return the compiled path of a reference target """
+    return ReferencePath(target)
 
 
 class ReferenceResolver:
-    def resolve_references(self, instances):
+    """Deprecated: references are resolved when values are evaluated.
+
+    Instance values no longer store resolved references, so resolving them up
+    front has no effect on generation. This wrapper over `compile_path` only
+    checks that the references resolve, and returns what they resolve to.
+    """
+
+    def __init__(self):
+        warnings.warn(
+            "ReferenceResolver is deprecated. References are resolved through "
+            "compile_path when values are evaluated.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+
+    def resolve_references(self, instances: Iterable[Instance]):
         for instance in instances:
             for ivalue in instance.instance_values.values():
                 self.resolve_references_of_instance_value(ivalue)
 
-    def resolve_references_of_instance_value(self, ivalue: InstanceValue):
-        for ref in ivalue.unresolved_references():
-            target = ref.target
-            tokens = target.split(".")
-            resolved_target = self._resolve_token(tokens, ivalue.context)
-            resolved_ref = ref.resolve_to(resolved_target)
-            ivalue.add_resolved_reference(resolved_ref)
-
-    @classmethod
-    def _resolve_token(cls, tokens, context):
-        if len(tokens) == 1:
-            token = tokens[0]
-            if token == "SELF":
-                return context
-            else:
-                return context.instance_values[token]
-        else:
-            token = tokens[0]
-            if token == "SELF":
-                pass
-            else:
-                context = context.instance_values[token].value()
-            return cls._resolve_token(tokens[1:], context)
+    def resolve_references_of_instance_value(
+        self, ivalue: InstanceValue
+    ) -> Dict[str, Union[Instance, InstanceValue]]:
+        """ Return the resolved target of each reference target of `ivalue` """
+        return {
+            ref.target: compile_path(ref.target).resolve(ivalue.context)
+            for ref in ivalue.unresolved_references()
+        }
@@ -1,20 +1,52 @@
 import random
-import re
 from collections import defaultdict
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from factory_boss.entity import Entity
 from factory_boss.errors import ConfigurationError
 from factory_boss.instance import Instance, InstanceValue
-from factory_boss.reference_resolver import ReferenceResolver
+from factory_boss.profiling import Profiler
+from factory_boss.random_streams import child_keys, randint, value_seed
+from factory_boss.target_index import TargetIndex
 from factory_boss.value_spec import RelationSpec
 
 
 class RelationMaker:
-    def __init__(self, known_instances: List[Instance], entities: Dict[str, Entity]):
+    """Populate the relations of instances, creating new instances if necessary.
+
+    Parameters
+    ----------
+    known_instances : List[Instance]
+        instances which can be chosen as targets of a "pick_random" relation
+    entities : Dict[str, Entity]
+        all entities of the spec
+    link_picked_targets : bool, optional
+        if True, the remote side of a "pick_random" relation is updated to point
+        back to the picking instance. The batched generation mode disables this so
+        that long-lived target instances do not keep references to all instances
+        that picked them. Default: True
+    profiler : Profiler, optional
+        if given, the number of instances created per relation is recorded
+
+    Random decisions of instances with a `key` are seeded with the key and the name
+    of the relation, and instances they create get keys derived from theirs. See
+    `factory_boss.random_streams`. Targets of "pick_random" relations are picked
+    with one `TargetIndex` per relation.
+    """
+
+    def __init__(
+        self,
+        known_instances: List[Instance],
+        entities: Dict[str, Entity],
+        link_picked_targets: bool = True,
+        profiler: Profiler = None,
+    ):
         self.known_instances: Dict[str, List[Instance]] = defaultdict(list)
         self.add_known_instances(known_instances)
         self.entities = entities
+        self.link_picked_targets = link_picked_targets
+        self.profiler = profiler
+        self.target_indices: Dict[Tuple[str, str], TargetIndex] = {}
 
     def add_known_instances(self, new_instances):
         """Add new instances to this `RelationMaker`s known instances.
@@ -24,44 +56,92 @@ class RelationMaker:
         for i in new_instances:
             self.known_instances[i.entity.name].append(i)
 
-    def make_relations(self, instances) -> List[Instance]:
-        all_new_instances = []
-        for instance in instances:
-            new_instances = self.make_relations_for_instance(instance)
-            all_new_instances += new_instances
-        return all_new_instances
-
-    def make_relations_for_instance(self, instance) -> List[Instance]:
-        resolver = ReferenceResolver()
-        all_new_instances = []
-        for rel in instance.relations():
+    def snapshot(self) -> Dict[str, int]:
+        """ Return the number of known instances per entity. """
+        return {ename: len(known) for ename, known in self.known_instances.items()}
+
+    def restore(self, snapshot: Dict[str, int]):
+        """Forget all instances that have been added after `snapshot` was taken.
+
+        Used by the batched generation mode to release the instances of a batch.
+        """
+        for ename, known in self.known_instances.items():
+            del known[snapshot.get(ename, 0) :]
+        for index, known in self._indices_with_targets():
+            index.truncate(len(known))
+
+    def target_index(self, rel: InstanceValue) -> TargetIndex:
+        """ Return the index which picks the targets of `rel` """
+        key = (rel.owner.entity.name, rel.name)
+        try:
+            return self.target_indices[key]
+        except KeyError:
+            relspec: RelationSpec = rel.spec  # type: ignore
+            options = relspec.relation_strategy_options
+            options.validate(self.entities[relspec.target_entity], f"{key[0]}.{key[1]}")
+            known = self.known_instances[relspec.target_entity]
+            weight_of = _WeightOf(known, options.weight_field)
+            index = self.target_indices[key] = TargetIndex(options, weight_of)
+            return index
+
+    def _indices_with_targets(self):
+        for (ename, fname), index in self.target_indices.items():
+            target = self.entities[ename].fields[fname].target_entity
+            yield index, self.known_instances[target]
+
+    def make_relations(self, instances: List[Instance]) -> List[Instance]:
+        """Populate the relations of `instances` and of all instances they create.
+
+        Instances are processed breadth first from one work queue, which starts with
+        `instances`. Created instances are appended to the queue. The instances of
+        each level become known (and can be picked) before their relations are made.
+        Every instance is visited once, so the run time is linear in the number of
+        instances.
+
+        Returns
+        -------
+        List[Instance]
+            a new list of `instances`, followed by all created instances in order of
+            creation
+        """
+        queue = list(instances)
+        start = 0
+        while start < len(queue):
+            stop = len(queue)
+            self.add_known_instances(queue[start:stop])
+            for position in range(start, stop):
+                self.make_relations_for_instance(queue[position], queue)
+            start = stop
+        return queue
+
+    def make_relations_for_instance(self, instance: Instance, created: List[Instance]):
+        """ Populate the relations of `instance` and append new instances to `created` """
+        instance_values = instance.instance_values
+        for fname in instance.entity.relation_fields():
+            rel = instance_values[fname]
             if rel.defined:
                 # This can happen if the instance is the target of another relation,
                 # and that relation has been defined in a previous iteration
                 continue
-            new_instances = self.make_one_relation(rel, resolver)
-            all_new_instances += new_instances
-        return all_new_instances
+            self.make_one_relation(rel, created)
 
-    def make_one_relation(self, rel: InstanceValue, resolver) -> List[Instance]:
+    def make_one_relation(self, rel: InstanceValue, created: List[Instance]):
+        """ Populate `rel` and append new instances to `created` """
         if not isinstance(rel.spec, RelationSpec):
             # relation not defined as RelationSpec. This happens when
             # it is set via relation_overrides.
-            self.resolve_overridden_relation(rel, resolver)
-            return []
+            self.resolve_overridden_relation(rel)
         else:
             rel_type = rel.spec.relation_type
             if rel_type == RelationSpec.ONE_TO_MANY:
-                return self.make_one_to_many_relation(rel)
+                created.extend(self.make_one_to_many_relation(rel))
             elif (
                 rel_type == RelationSpec.ONE_TO_ONE
                 or rel_type == RelationSpec.MANY_TO_ONE
             ):
                 new_instance = self.make_many_to_one_relation(rel)
                 if new_instance:
-                    return [new_instance]
-                else:
-                    return []
+                    created.append(new_instance)
             else:
                 raise ConfigurationError(
                     f"Unknown relation_type. Expected one of "
@@ -72,40 +152,28 @@ class RelationMaker:
     def make_one_to_many_relation(self, rel: InstanceValue) -> List[Instance]:
         relspec: RelationSpec = rel.spec  # type: ignore
         strat = relspec.relation_strategy
-        create_match = re.match(r"^create\(\s*(?P<a>\d+)(,\s*(?P<b>\d+))?\)$", strat)
         if strat == "pick_random":
             raise ConfigurationError(
                 f"{rel.owner.entity.name}.{rel.name}: 'pick_random' is not a supported strategy "
                 "for a one-to-many relationship, only 'create'"
             )
-        elif create_match:
-            astr = create_match["a"]
-            bstr = create_match["b"]
-            if bstr is None:
-                bstr = astr
-            a = int(astr)
-            b = int(bstr)
-            if b < a:
-                raise ConfigurationError(
-                    f"Lower must be less/equal upper, but {a} > {b}."
-                )
-            if a != b:
-                n = random.randint(a, b)
-            else:
-                n = a
+        elif strat.startswith("create"):
+            a, b = relspec.create_bounds()
+            n = self.random_int(rel, a, b) if a != b else a
             overrides = relspec.relation_overrides
             entity = self.entities[relspec.target_entity]
             targets = []
-            for _ in range(n):
+            for key in self.created_keys(rel, n):
                 target = entity.make_instance(
-                    overrides,
-                    override_context=rel.owner,
+                    overrides, override_context=rel.owner, key=key
                 )
                 targets.append(target)
                 if relspec.remote_name:
                     remote = target.instance_values[relspec.remote_name]
                     remote.override_value(rel.owner)
             rel.override_value(targets)
+            if self.profiler is not None:
+                self.profiler.count_created(rel.owner.entity.name, rel.name, n)
             return targets
         elif strat == "none":
             rel.override_value(relspec.default_value())
@@ -122,9 +190,14 @@ class RelationMaker:
         strat = relspec.relation_strategy
         if strat == "pick_random":
             possible_targets = self.known_instances[relspec.target_entity]
-            target = self.random_element(possible_targets)
+            index = self.target_index(rel)
+            index.extend(len(possible_targets))
+            seed = self.seed_of(rel)
+            if seed is None:
+                seed = random.getrandbits(64)
+            target = possible_targets[index.pick(seed)]
             rel.override_value(target)
-            if relspec.remote_name:
+            if relspec.remote_name and self.link_picked_targets:
                 remote = target.instance_values[relspec.remote_name]
                 if relspec.relation_type == RelationSpec.ONE_TO_ONE:
                     remote.override_value(rel.owner)
@@ -137,9 +210,9 @@ class RelationMaker:
         elif strat == "create":
             overrides = relspec.relation_overrides
             entity = self.entities[relspec.target_entity]
+            (key,) = self.created_keys(rel, 1)
             target = entity.make_instance(
-                overrides,
-                override_context=rel.owner,
+                overrides, override_context=rel.owner, key=key
             )
             rel.override_value(target)
             if relspec.remote_name:
@@ -148,6 +221,8 @@ class RelationMaker:
                     remote.override_value(rel.owner)
                 else:
                     remote.value().append(rel.owner)
+            if self.profiler is not None:
+                self.profiler.count_created(rel.owner.entity.name, rel.name)
             return target
         elif strat == "none":
             rel.override_value(relspec.default_value())
@@ -159,9 +234,7 @@ class RelationMaker:
                 f"but got '{strat}' instead."
             )
 
-    def resolve_overridden_relation(
-        self, rel: InstanceValue, resolver: ReferenceResolver
-    ) -> None:
+    def resolve_overridden_relation(self, rel: InstanceValue) -> None:
         """Resolve relation that is specified by a value that is not a `RelationValue`.
 
         This often happens for overridden relations.
@@ -170,7 +243,6 @@ class RelationMaker:
         checks.
         """
         # Let's extract its value...
-        resolver.resolve_references_of_instance_value(rel)
         target = rel.make_value()
         entity = rel.owner.entity
         # ...and check that the value is an instance:
@@ -190,8 +262,44 @@ class RelationMaker:
             )
 
     @staticmethod
-    def random_element(choices):
+    def seed_of(rel: InstanceValue) -> Optional[int]:
+        """ Seed of the random decision of `rel`, None if its owner has no key """
+        key = rel.owner.key
+        return None if key is None else value_seed(key, rel.name)
+
+    def random_int(self, rel: InstanceValue, a: int, b: int) -> int:
+        seed = self.seed_of(rel)
+        return random.randint(a, b) if seed is None else randint(seed, a, b)
+
+    @staticmethod
+    def created_keys(rel: InstanceValue, n: int) -> List[Optional[int]]:
+        """ Keys of `n` instances created by `rel` """
+        key = rel.owner.key
+        return [None] * n if key is None else child_keys(key, rel.name, n)
+
+    @staticmethod
+    def random_element(choices, seed: int = None):
         if len(choices) == 0:
             raise ValueError("choices must not be empty")
-        ix = random.randint(0, len(choices) - 1)
+        if seed is None:
+            ix = random.randint(0, len(choices) - 1)
+        else:
+            ix = randint(seed, 0, len(choices) - 1)
         return choices[ix]
+
+
+class _WeightOf:
+    """Look up the weight field of a known target.
+
+    A class rather than a closure, so that a `TargetIndex` can be pickled, e.g.,
+    when a `RelationMaker` is sent to "spawn" worker processes.
+    """
+
+    __slots__ = ("known", "field")
+
+    def __init__(self, known: List[Instance], field: Optional[str]):
+        self.known = known
+        self.field = field
+
+    def __call__(self, position: int) -> float:
+        return self.known[position].value(self.field)
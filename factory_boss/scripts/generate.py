@@ -1,21 +1,152 @@
-from pprint import pprint
+""" Command line interface: generate mock data for a schema.
 
-import yaml
+Examples::
 
+    # print the rows of the example schema as JSON lines
+    factory-boss examples/simple_schema.yaml
+
+    # write 10 million persons and everything they create as Parquet files
+    factory-boss schema.yaml --count Person=10000000 --seed 42 \\
+        --format parquet --output data --workers 8
+
+Rows are generated in batches (see `Generator.iter_rows`) and streamed to the
+output, so memory does not grow with the number of rows. Throughput and peak
+memory are printed to stderr at the end.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+from factory_boss.errors import FactoryBossError
 from factory_boss.generator import Generator
-from factory_boss.spec_parser.parser import SpecParser
-
-
-def main():
-    with open("examples/simple_schema.yaml", "r") as f:
-        schema = yaml.safe_load(f)
-    parser = SpecParser()
-    parsed_spec = parser.parse(schema)
-    generator = Generator(parsed_spec)
-    instances = generator.generate(output_with_related_objects=False)
-    print("INSTANCES")
-    print("=========")
-    pprint(instances)
+from factory_boss.profiling import Profiler
+from factory_boss.sinks import SINKS, Sink, json_default, make_sink
+from factory_boss.spec_cache import load_spec
+from factory_boss.stats import peak_rss_mb
+
+
+def parse_count(value: str) -> Dict[str, int]:
+    """ Parse "Entity=N" into {"Entity": N} """
+    entity, sep, n = value.partition("=")
+    try:
+        count = int(n)
+    except ValueError:
+        count = -1
+    if not sep or not entity or count < 0:
+        raise argparse.ArgumentTypeError(
+            f"expected ENTITY=N with a non-negative integer N, not '{value}'"
+        )
+    return {entity: count}
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="factory-boss", description="Generate mock data for a schema."
+    )
+    parser.add_argument("schema", help="path of the YAML schema")
+    parser.add_argument(
+        "-c",
+        "--count",
+        type=parse_count,
+        action="append",
+        default=[],
+        metavar="ENTITY=N",
+        help="number of root instances of an entity. Can be repeated. "
+        "Default: the count of the entity in the schema",
+    )
+    parser.add_argument("-s", "--seed", type=int, help="seed of the run")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="directory to write one file per entity into. "
+        "Default: print JSON lines to stdout",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=sorted(SINKS),
+        default="csv",
+        help="format of the files in --output. Default: csv",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes. Default: 1",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=Generator.DEFAULT_BATCH_SIZE,
+        help="number of root instances per batch. "
+        f"Default: {Generator.DEFAULT_BATCH_SIZE}",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=Sink.DEFAULT_CHUNK_SIZE,
+        help="number of rows per entity written at once. "
+        f"Default: {Sink.DEFAULT_CHUNK_SIZE}",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=Generator.BACKENDS,
+        default="objects",
+        help="how instances are stored while generating. Default: objects",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not read or write the cache of compiled schemas",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the time per phase, entity, spec and field after generating",
+    )
+    return parser
+
+
+def main(argv: List[str] = None):
+    """Run the command line interface with the arguments `argv`.
+
+    Default: the arguments of the process, i.e., `sys.argv[1:]`.
+    """
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    for option in ("workers", "batch_size", "chunk_size"):
+        if getattr(args, option) < 1:
+            flag = "--" + option.replace("_", "-")
+            parser.error(f"{flag} must be at least 1, not {getattr(args, option)}")
+    counts: Dict[str, int] = {}
+    for count in args.count:
+        counts.update(count)
+    try:
+        parsed_spec = load_spec(args.schema, use_cache=not args.no_cache)
+        profiler = Profiler() if args.profile else None
+        generator = Generator(
+            parsed_spec, backend=args.backend, seed=args.seed, profiler=profiler
+        )
+        kwargs = dict(
+            counts=counts or None, batch_size=args.batch_size, workers=args.workers
+        )
+        if args.output is not None:
+            with make_sink(args.format, args.output, args.chunk_size) as sink:
+                stats = generator.write(sink, **kwargs)
+        else:
+            for ename, row in generator.iter_rows(**kwargs):
+                row = json.dumps({"entity": ename, "row": row}, default=json_default)
+                print(row)
+            stats = generator.stats
+    except (FactoryBossError, OSError) as e:
+        parser.exit(1, f"factory-boss: error: {e}\n")
+    print(stats, file=sys.stderr)
+    print(f"Peak memory: {peak_rss_mb():.1f} MB", file=sys.stderr)
+    if profiler is not None:
+        print(file=sys.stderr)
+        print(profiler.report(), file=sys.stderr)
 
 
 if __name__ == "__main__":
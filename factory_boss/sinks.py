@@ -0,0 +1,515 @@
+""" Sinks which write generated rows to files, one flat table per entity.
+
+Rows are buffered per entity and written in chunks of `chunk_size` rows, so memory
+is bounded by one chunk per entity, no matter how many rows are written.
+
+Usage::
+
+    with CsvSink("output") as sink:
+        generator.write(sink, counts={"Person": 1_000_000})
+
+`AsyncSink`s are the counterpart for asyncio, e.g., for async database drivers,
+and are written with `Generator.awrite`.
+"""
+import asyncio
+import csv
+import datetime
+import json
+import os
+from concurrent.futures import Executor
+from graphlib import CycleError, TopologicalSorter
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Sequence, Type
+
+from factory_boss.errors import ConfigurationError
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+if TYPE_CHECKING:
+    from factory_boss.entity import Entity
+
+Row = Dict[str, Any]
+
+
+class Sink:
+    """Base class of all sinks.
+
+    Parameters
+    ----------
+    chunk_size : int, optional
+        number of rows per entity that are buffered before they are written
+    """
+
+    DEFAULT_CHUNK_SIZE = 10_000
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if chunk_size < 1:
+            raise ConfigurationError(f"chunk_size must be positive, not {chunk_size}")
+        self.chunk_size = chunk_size
+        self.rows_written: Dict[str, int] = {}
+        self._buffers: Dict[str, List[Row]] = {}
+
+    def write(self, entity: str, row: Row):
+        """ Buffer one flat `row` of `entity` and write the buffer once it is full """
+        try:
+            buffer = self._buffers[entity]
+        except KeyError:
+            buffer = self._buffers[entity] = []
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            self.flush(entity)
+
+    def write_rows(self, entity: str, rows: List[Row]):
+        for row in rows:
+            self.write(entity, row)
+
+    def flush(self, entity: str = None):
+        """ Write the buffered rows of `entity`, or of all entities if None """
+        entities = list(self._buffers) if entity is None else [entity]
+        for ename in entities:
+            rows = self._buffers.pop(ename, None)
+            if rows:
+                self.write_chunk(ename, rows)
+                self.rows_written[ename] = self.rows_written.get(ename, 0) + len(rows)
+
+    def write_chunk(self, entity: str, rows: List[Row]):
+        """ Write a chunk of rows of `entity` """
+        raise NotImplementedError
+
+    def end_batch(self):
+        """Called by `Generator.write` after all rows of a batch have been written.
+
+        The rows of a batch reference each other, but never rows of later batches.
+        """
+
+    def close(self):
+        """ Flush all buffers and release all resources """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FileSink(Sink):
+    """Base class of sinks which write one file per entity into a directory.
+
+    Parameters
+    ----------
+    directory : str
+        output directory. It is created if it does not exist.
+    chunk_size : int, optional
+        number of rows per entity that are buffered before they are written
+    """
+
+    extension: str = None
+
+    def __init__(self, directory: str, chunk_size: int = Sink.DEFAULT_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, entity: str) -> str:
+        return os.path.join(self.directory, f"{entity}.{self.extension}")
+
+
+class CsvSink(FileSink):
+    """ Write each entity into a CSV file with a header row """
+
+    extension = "csv"
+
+    def __init__(self, directory: str, chunk_size: int = Sink.DEFAULT_CHUNK_SIZE):
+        super().__init__(directory, chunk_size)
+        self._files: Dict[str, IO] = {}
+        self._writers: Dict[str, csv.DictWriter] = {}
+
+    def write_chunk(self, entity, rows):
+        writer = self._writers.get(entity)
+        if writer is None:
+            f = self._files[entity] = open(self.path(entity), "w", newline="")
+            writer = self._writers[entity] = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+        writer.writerows(rows)
+
+    def close(self):
+        super().close()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._writers = {}
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+class JsonLinesSink(FileSink):
+    """ Write each entity into a JSON Lines file, one JSON object per row """
+
+    extension = "jsonl"
+
+    def __init__(self, directory: str, chunk_size: int = Sink.DEFAULT_CHUNK_SIZE):
+        super().__init__(directory, chunk_size)
+        self._files: Dict[str, IO] = {}
+
+    def write_chunk(self, entity, rows):
+        f = self._files.get(entity)
+        if f is None:
+            f = self._files[entity] = open(self.path(entity), "w")
+        f.write("".join(json.dumps(row, default=json_default) + "\n" for row in rows))
+
+    def close(self):
+        super().close()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+class ParquetSink(FileSink):
+    """Write each entity into a Parquet file, one row group per chunk.
+
+    Requires pyarrow. The schema of each file is inferred from its first chunk.
+    A column which is None in all rows of the chunk has no type yet, so chunks are
+    held back until all columns have a type, but at most `MAX_PENDING_CHUNKS`
+    chunks. Columns which are still None then keep the null type.
+    """
+
+    extension = "parquet"
+
+    MAX_PENDING_CHUNKS = 10
+
+    def __init__(self, directory: str, chunk_size: int = Sink.DEFAULT_CHUNK_SIZE):
+        if pa is None:
+            raise ConfigurationError(
+                "The Parquet sink requires pyarrow: pip install factory_boss[parquet]"
+            )
+        super().__init__(directory, chunk_size)
+        self._writers: Dict[str, "pq.ParquetWriter"] = {}
+        self._pending: Dict[str, List["pa.Table"]] = {}
+
+    def write_chunk(self, entity, rows):
+        writer = self._writers.get(entity)
+        if writer is not None:
+            writer.write_table(pa.Table.from_pylist(rows, schema=writer.schema))
+            return
+        pending = self._pending.setdefault(entity, [])
+        pending.append(pa.Table.from_pylist(rows))
+        schema = pa.unify_schemas([table.schema for table in pending])
+        typed = not any(pa.types.is_null(field.type) for field in schema)
+        if typed or len(pending) >= self.MAX_PENDING_CHUNKS:
+            self._write_pending(entity)
+
+    def _write_pending(self, entity: str):
+        """ Open the file of `entity` and write its pending chunks """
+        pending = self._pending.pop(entity)
+        schema = pa.unify_schemas([table.schema for table in pending])
+        writer = self._writers[entity] = pq.ParquetWriter(self.path(entity), schema)
+        for table in pending:
+            writer.write_table(table.cast(schema))
+
+    def close(self):
+        super().close()
+        for entity in list(self._pending):
+            self._write_pending(entity)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+
+def load_order(entities: Dict[str, "Entity"]) -> List[str]:
+    """Return the entity names in an order that is safe for foreign keys.
+
+    The entity which holds the foreign key of a relation comes after the entity
+    it references:
+
+    * a many-to-one relation holds the foreign key, whatever its strategy. This
+      includes the remote side of a one-to-many relation, which has the strategy
+      "none", e.g., `Child.parent` of `Parent.children`;
+    * hence the target of a one-to-many relation holds the foreign key;
+    * a one-to-one relation holds the foreign key, unless it is the remote side
+      (strategy "none") of a one-to-one relation of the target entity.
+
+    Edges are derived from both sides, so the order is the same whether or not
+    the remote sides of the relations have been created yet. References of an
+    entity to itself are ignored.
+
+    Raises
+    ------
+    ConfigurationError
+        if the foreign keys between entities are circular
+    """
+    sorter: TopologicalSorter = TopologicalSorter()
+    for ename, entity in entities.items():
+        sorter.add(ename)
+        for relation in entity.relations():
+            target = relation.target_entity
+            if target == ename:
+                continue
+            if relation.relation_type == relation.ONE_TO_MANY:
+                sorter.add(target, ename)
+            elif (
+                relation.relation_type == relation.MANY_TO_ONE
+                or relation.relation_strategy != "none"
+            ):
+                sorter.add(ename, target)
+    try:
+        return list(sorter.static_order())
+    except CycleError as e:
+        raise ConfigurationError(
+            f"Circular foreign keys between entities {e.args[1]}. Load them with "
+            f"deferred constraints instead."
+        )
+
+
+class DatabaseSink(Sink):
+    """Insert rows into the tables of a database with a DB-API 2 connection.
+
+    Rows are buffered per entity. Within a batch of `Generator.iter_rows`, a row
+    may be yielded before the rows it references, e.g., a root row before the row
+    created by its "mt1" relation. Hence buffers are only inserted at the end of a
+    batch (see `end_batch`), once the buffer of one entity is full: the buffers of
+    all entities are inserted in the order of `load_order`, one `executemany` per
+    table, and the transaction is committed. Thus a row is never inserted before
+    the rows it references. Rows written without `end_batch`, i.e., not with
+    `Generator.write`, are buffered until `flush` or `close`.
+
+    Foreign keys of a table to itself (e.g., a partner) can only be enforced with
+    deferred constraints, because a row may reference a row inserted after it.
+
+    Override `insert_rows` for faster, driver specific bulk loading, e.g., COPY.
+
+    Parameters
+    ----------
+    connection
+        an open DB-API 2 connection, e.g., `sqlite3.connect("test.db")`. The
+        tables must exist. The sink does not close the connection.
+    entities : Dict[str, Entity]
+        all entities of the spec, i.e., `spec["entities"]`
+    chunk_size : int, optional
+        number of rows per entity that are buffered before they are inserted
+    paramstyle : str, optional
+        the paramstyle of the driver: "qmark" (sqlite3), "format" or "pyformat"
+        (e.g., psycopg2), "numeric" or "named". Default: "qmark"
+    table_names : Dict[str, str], optional
+        table name per entity. Default: the entity name
+    """
+
+    PARAMSTYLES = ("qmark", "format", "pyformat", "numeric", "named")
+
+    def __init__(
+        self,
+        connection,
+        entities: Dict[str, "Entity"],
+        chunk_size: int = Sink.DEFAULT_CHUNK_SIZE,
+        paramstyle: str = "qmark",
+        table_names: Dict[str, str] = None,
+    ):
+        if paramstyle not in self.PARAMSTYLES:
+            raise ConfigurationError(
+                f"Unknown paramstyle '{paramstyle}'. Expected one of "
+                f"{self.PARAMSTYLES}."
+            )
+        super().__init__(chunk_size)
+        self.connection = connection
+        self.paramstyle = paramstyle
+        self.table_names = table_names or {}
+        self.order = load_order(entities)
+        self._full = False
+
+    def write(self, entity: str, row: Row):
+        try:
+            buffer = self._buffers[entity]
+        except KeyError:
+            buffer = self._buffers[entity] = []
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            # the rows referenced by the buffered rows may follow later in the batch
+            self._full = True
+
+    def end_batch(self):
+        if self._full:
+            self.flush()
+
+    def flush(self, entity: str = None):
+        if entity is not None:
+            return super().flush(entity)
+        if not any(self._buffers.values()):
+            return
+        rank = {ename: i for i, ename in enumerate(self.order)}
+        for ename in sorted(self._buffers, key=lambda e: rank.get(e, len(rank))):
+            super().flush(ename)
+        self.connection.commit()
+        self._full = False
+
+    def write_chunk(self, entity, rows):
+        self.insert_rows(self.table_names.get(entity, entity), list(rows[0]), rows)
+
+    def insert_rows(self, table: str, columns: Sequence[str], rows: List[Row]):
+        """ Insert `rows` into `table` with one `executemany` """
+        cursor = self.connection.cursor()
+        try:
+            cursor.executemany(
+                self.insert_statement(table, columns),
+                [self.parameters(columns, row) for row in rows],
+            )
+        finally:
+            cursor.close()
+
+    def insert_statement(self, table: str, columns: Sequence[str]) -> str:
+        names = ", ".join(self.quote(column) for column in columns)
+        if self.paramstyle == "qmark":
+            placeholders = ["?"] * len(columns)
+        elif self.paramstyle == "format":
+            placeholders = ["%s"] * len(columns)
+        elif self.paramstyle == "pyformat":
+            placeholders = [f"%(p{i})s" for i in range(len(columns))]
+        elif self.paramstyle == "numeric":
+            placeholders = [f":{i}" for i in range(1, len(columns) + 1)]
+        else:
+            placeholders = [f":p{i}" for i in range(len(columns))]
+        return (
+            f"INSERT INTO {self.quote(table)} ({names}) "
+            f"VALUES ({', '.join(placeholders)})"
+        )
+
+    def parameters(self, columns: Sequence[str], row: Row):
+        if self.paramstyle in ("pyformat", "named"):
+            # column names are not necessarily valid parameter names
+            return {f"p{i}": row[column] for i, column in enumerate(columns)}
+        return tuple(row[column] for column in columns)
+
+    @staticmethod
+    def quote(identifier: str) -> str:
+        return '"' + identifier.replace('"', '""') + '"'
+
+
+class AsyncSink:
+    """Base class of sinks whose writes are coroutines.
+
+    Rows are buffered per entity like in `Sink`, and `write_chunk` is awaited once
+    the buffer of an entity is full.
+
+    Parameters
+    ----------
+    chunk_size : int, optional
+        number of rows per entity that are buffered before they are written
+    """
+
+    def __init__(self, chunk_size: int = Sink.DEFAULT_CHUNK_SIZE):
+        if chunk_size < 1:
+            raise ConfigurationError(f"chunk_size must be positive, not {chunk_size}")
+        self.chunk_size = chunk_size
+        self.rows_written: Dict[str, int] = {}
+        self._buffers: Dict[str, List[Row]] = {}
+
+    async def write(self, entity: str, row: Row):
+        """ Buffer one flat `row` of `entity` and write the buffer once it is full """
+        try:
+            buffer = self._buffers[entity]
+        except KeyError:
+            buffer = self._buffers[entity] = []
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            await self.flush(entity)
+
+    async def write_rows(self, entity: str, rows: List[Row]):
+        for row in rows:
+            await self.write(entity, row)
+
+    async def flush(self, entity: str = None):
+        """ Write the buffered rows of `entity`, or of all entities if None """
+        entities = list(self._buffers) if entity is None else [entity]
+        for ename in entities:
+            rows = self._buffers.pop(ename, None)
+            if rows:
+                await self.write_chunk(ename, rows)
+                self.rows_written[ename] = self.rows_written.get(ename, 0) + len(rows)
+
+    async def write_chunk(self, entity: str, rows: List[Row]):
+        """ Write a chunk of rows of `entity` """
+        raise NotImplementedError
+
+    async def end_batch(self):
+        """ Called by `Generator.awrite` after all rows of a batch have been written """
+
+    async def close(self):
+        """ Flush all buffers and release all resources """
+        await self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class ThreadedSink(AsyncSink):
+    """Write to a synchronous `Sink` in an executor, without blocking the loop.
+
+    Chunks are passed on to `sink` in order, one at a time. Sinks whose resources
+    are bound to a thread, e.g., a `DatabaseSink` with a sqlite3 connection that
+    checks the thread, need an executor with a single thread.
+
+    Parameters
+    ----------
+    sink : Sink
+        the synchronous sink
+    executor : Executor, optional
+        executor which runs the writes. Default: None, i.e., the default executor
+        of the running event loop
+    """
+
+    def __init__(self, sink: Sink, executor: Executor = None):
+        super().__init__(sink.chunk_size)
+        self.sink = sink
+        self.executor = executor
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def write_chunk(self, entity, rows):
+        await self._run(self.sink.write_rows, entity, rows)
+
+    async def flush(self, entity: str = None):
+        await super().flush(entity)
+        if entity is None:
+            await self._run(self.sink.flush)
+
+    async def end_batch(self):
+        # pass on the buffered rows of the batch before the batch ends
+        await super().flush()
+        await self._run(self.sink.end_batch)
+
+    async def close(self):
+        await super().close()
+        await self._run(self.sink.close)
+
+
+SINKS: Dict[str, Type[FileSink]] = {
+    "csv": CsvSink,
+    "jsonl": JsonLinesSink,
+    "parquet": ParquetSink,
+}
+""" file sinks by format name """
+
+
+def make_sink(
+    format: str, directory: str, chunk_size: int = Sink.DEFAULT_CHUNK_SIZE
+) -> FileSink:
+    """ Create the file sink for `format` ("csv", "jsonl" or "parquet") """
+    try:
+        sink_cls = SINKS[format]
+    except KeyError:
+        raise ConfigurationError(
+            f"Unknown output format '{format}'. Expected one of {sorted(SINKS)}."
+        )
+    return sink_cls(directory, chunk_size)
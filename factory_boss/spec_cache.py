@@ -0,0 +1,136 @@
+""" On-disk cache of compiled specs.
+
+Reading a spec from YAML involves parsing the YAML, creating a `ValueSpec` for
+every field, parsing the code of all dynamic fields, creating the remote sides of
+all relations and compiling the evaluation plans. `load_spec` pickles the result
+into a cache directory, keyed by a hash of the YAML file and of the factory_boss
+sources, so that later runs with the same file skip all of that.
+
+Usage::
+
+    spec = load_spec("examples/simple_schema.yaml")
+    generator = Generator(spec)
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict
+
+import yaml
+
+from factory_boss.generator import Generator
+from factory_boss.spec_parser.parser import SpecParser
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_VARIABLE = "FACTORY_BOSS_CACHE_DIR"
+""" environment variable which overrides the default cache directory """
+
+
+def default_cache_dir() -> str:
+    """Return the default cache directory.
+
+    `$FACTORY_BOSS_CACHE_DIR` if set, else `factory_boss` in `$XDG_CACHE_HOME` or
+    `~/.cache`.
+    """
+    if os.environ.get(CACHE_DIR_VARIABLE):
+        return os.environ[CACHE_DIR_VARIABLE]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "factory_boss")
+
+
+def compile_spec(schema: Dict[str, Any]) -> Dict:
+    """Parse a schema and compile everything that does not depend on a run.
+
+    Returns the spec as returned by `SpecParser.parse`, with the remote sides of
+    all relations and the evaluation plans of all entities.
+    """
+    spec = SpecParser().parse(schema)
+    entities = spec["entities"]
+    Generator(spec).complete_relation_specs(entities)
+    for entity in entities.values():
+        entity.evaluation_plan()
+        entity.relation_fields()
+        for relation in entity.relations():
+            if relation.relation_overrides:
+                target = entities[relation.target_entity]
+                target.evaluation_plan(relation.relation_overrides)
+    return spec
+
+
+def load_spec(path: str, cache_dir: str = None, use_cache: bool = True) -> Dict:
+    """Read the schema in the YAML file `path` and return the compiled spec.
+
+    Parameters
+    ----------
+    path : str
+        path of the YAML file
+    cache_dir : str, optional
+        directory of the cache. Default: `default_cache_dir()`
+    use_cache : bool, optional
+        if False, the spec is compiled without reading or writing the cache.
+        Default: True
+
+    Returns
+    -------
+    Dict
+        the spec, see `compile_spec`
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    if not use_cache:
+        return compile_spec(yaml.safe_load(content))
+    cache_dir = cache_dir or default_cache_dir()
+    cache_path = os.path.join(cache_dir, f"{spec_key(content)}.pickle")
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:  # corrupt or incompatible cache entry
+        logger.warning(f"Ignoring cached spec {cache_path}: {e!r}")
+    spec = compile_spec(yaml.safe_load(content))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to a temporary file first, so that readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning(f"Cannot cache the spec in {cache_dir}: {e!r}")
+    return spec
+
+
+def spec_key(content: bytes) -> str:
+    """Return the cache key of a YAML file with `content`.
+
+    The key also depends on the factory_boss sources, so that an upgrade does not
+    load specs pickled by another version.
+    """
+    digest = hashlib.sha256(content)
+    digest.update(_sources_fingerprint().encode())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _sources_fingerprint() -> str:
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(package_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".py"):
+                with open(os.path.join(root, name), "rb") as f:
+                    digest.update(name.encode())
+                    digest.update(f.read())
+    return digest.hexdigest()
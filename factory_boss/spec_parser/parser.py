@@ -1,6 +1,7 @@
 from typing import TYPE_CHECKING, Any, Dict
 
 from factory_boss.entity import Entity
+from factory_boss.errors import ConfigurationError
 from factory_boss.spec_parser.value_spec_registry import ValueSpecRegistry
 
 if TYPE_CHECKING:
@@ -16,14 +17,25 @@ class SpecParser:
         return {"entities": entities}
 
     def parse_entitity(self, name: str, espec: Dict) -> Entity:
+        from factory_boss.value_spec import FakerField
+
         fields: Dict[str, ValueSpec] = {}
+        locale = espec.get("locale")
         for fname, fspec in espec["fields"].items():
             new_field = self.value_spec_from_dict(fspec, fname)
+            if locale and isinstance(new_field, FakerField) and not new_field.locale:
+                # the locale of the entity is the default of its fields
+                new_field.set_locale(locale)
 
             extra_fields = new_field.derived_fields()
             fields[fname] = new_field
             fields.update(extra_fields)
-        entity = Entity(name, fields)
+        count = espec.get("count")
+        if count is not None and (not isinstance(count, int) or count < 0):
+            raise ConfigurationError(
+                f"{name}: 'count' must be a non-negative integer, but got '{count}'."
+            )
+        entity = Entity(name, fields, count=count)
         return entity
 
     @classmethod
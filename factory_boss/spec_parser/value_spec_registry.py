@@ -9,22 +9,41 @@ class ValueSpecRegistry:
 
     @classmethod
     def value_spec_cls_from_dict(cls, spec: Union[Dict, Any]) -> Type["ValueSpec"]:
+        from factory_boss.errors import ConfigurationError
         from factory_boss.value_spec import (
             DynamicField,
             FakerField,
+            IdField,
             RelationSpec,
+            SequenceField,
             TypeFakerSpec,
+            UUIDField,
+            is_id,
         )
 
         if isinstance(spec, dict):
             mock_info = spec.get("mock")
             if spec.get("type") == "relation":
                 return RelationSpec
+            elif is_id(spec):
+                if spec.get("type") == "integer":
+                    return IdField
+                elif spec.get("type") == "string":
+                    return UUIDField
+                raise ConfigurationError(
+                    f"IDs must be of type integer or string, not {spec.get('type')}."
+                )
             elif mock_info is None:
                 return TypeFakerSpec
             elif isinstance(mock_info, dict):
                 if "faker" in mock_info:
                     return FakerField
+                elif "id" in mock_info:
+                    return IdField
+                elif "sequence" in mock_info:
+                    return SequenceField
+                elif "uuid" in mock_info:
+                    return UUIDField
                 else:
                     return DynamicField
             else:
@@ -0,0 +1,63 @@
+import sys
+import time
+from collections import defaultdict
+from typing import Dict
+
+try:
+    import resource
+except ImportError:  # pragma: no cover, not available on Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """ Peak resident set size of this process in MB, NaN if unknown """
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class GenerationStats:
+    """Number of generated rows and wall time of one generation run."""
+
+    def __init__(self):
+        self.rows: Dict[str, int] = defaultdict(int)
+        self.seconds: float = 0.0
+        self._started: float = None
+
+    def start(self):
+        self._started = time.perf_counter()
+
+    def stop(self):
+        if self._started is not None:
+            self.seconds += time.perf_counter() - self._started
+            self._started = None
+
+    def add_rows(self, entity: str, n: int = 1):
+        self.rows[entity] += n
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+    @property
+    def rows_per_second(self) -> float:
+        if self.seconds == 0:
+            return 0.0
+        return self.total_rows / self.seconds
+
+    def __str__(self):
+        s = (
+            f"{self.total_rows} rows in {self.seconds:.3f} s "
+            f"({self.rows_per_second:,.0f} rows/s)"
+        )
+        for ename, n in self.rows.items():
+            s += f"\n* {ename}: {n} rows"
+        return s
+
+    def __repr__(self):
+        return (
+            f"GenerationStats(rows={self.total_rows}, seconds={self.seconds:.3f}, "
+            f"rows_per_second={self.rows_per_second:.0f})"
+        )
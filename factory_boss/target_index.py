@@ -0,0 +1,264 @@
+""" Selection of the targets of "pick_random" relations. """
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+from factory_boss.errors import ConfigurationError
+from factory_boss.random_streams import splitmix64, splitmix64_array
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+if TYPE_CHECKING:
+    from factory_boss.entity import Entity
+
+_TO_UNIT = 2.0 ** -53
+
+
+def uniform(seed: int) -> float:
+    """ Random float in [0, 1), derived from `seed` """
+    return (splitmix64(seed) >> 11) * _TO_UNIT
+
+
+class PickOptions:
+    """Options of a "pick_random" relation, set via `relation_strategy_options`.
+
+    Parameters
+    ----------
+    distribution : str, optional
+        * "uniform": every target is equally likely;
+        * "zipf": the i-th target (in order of creation) is picked with a
+          probability proportional to 1 / i ** `exponent`.
+        Default: "uniform"
+    exponent : float, optional
+        exponent of the "zipf" distribution. Default: 1.0
+    replace : bool, optional
+        if False, every target is picked at most once, e.g., for one-to-one
+        relations. Default: True
+    weight_field : str, optional
+        name of a numeric field of the target entity. Targets are picked with a
+        probability proportional to its value (times the zipf weight, if any). The
+        field must not have references.
+    """
+
+    DISTRIBUTIONS = ("uniform", "zipf")
+
+    def __init__(
+        self,
+        distribution: str = "uniform",
+        exponent: float = 1.0,
+        replace: bool = True,
+        weight_field: Optional[str] = None,
+    ):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ConfigurationError(
+                f"Unknown distribution '{distribution}'. "
+                f"Expected one of {self.DISTRIBUTIONS}."
+            )
+        if not isinstance(exponent, (int, float)) or exponent <= 0:
+            raise ConfigurationError(f"exponent must be positive, not {exponent}.")
+        if not isinstance(replace, bool):
+            raise ConfigurationError(f"replace must be true or false, not {replace}.")
+        self.distribution = distribution
+        self.exponent = exponent
+        self.replace = replace
+        self.weight_field = weight_field
+
+    @classmethod
+    def from_dict(cls, options: Dict[str, Any]) -> "PickOptions":
+        options = options or {}
+        unknown = set(options) - {"distribution", "exponent", "replace", "weight_field"}
+        if unknown:
+            raise ConfigurationError(
+                f"Unknown relation_strategy_options {sorted(unknown)}."
+            )
+        return cls(**options)
+
+    def validate(self, target: "Entity", relation: str):
+        """ Check that the `weight_field` exists in `target` and has no references """
+        if self.weight_field is None:
+            return
+        spec = target.fields.get(self.weight_field)
+        if spec is None or spec.type == "relation" or spec.references():
+            raise ConfigurationError(
+                f"{relation}: weight_field '{self.weight_field}' must be a field of "
+                f"{target.name} without references."
+            )
+
+    @property
+    def weighted(self) -> bool:
+        return self.distribution != "uniform" or self.weight_field is not None
+
+    def __repr__(self):
+        return (
+            f"PickOptions(distribution='{self.distribution}', "
+            f"exponent={self.exponent}, replace={self.replace}, "
+            f"weight_field={self.weight_field!r})"
+        )
+
+
+class TargetIndex:
+    """Pick targets of a relation by their position among the known targets.
+
+    Targets are added in order of creation with `extend`. Every pick is derived
+    from a seed, so picks are reproducible.
+
+    * uniform picks with replacement take O(1) and store nothing per target;
+    * uniform picks without replacement keep the positions of all targets which
+      have not been picked yet and remove a picked one in O(1);
+    * weighted picks (zipf and/or `weight_field`) keep the weights in a Fenwick
+      tree, so that picking, adding and removing a target takes O(log n).
+
+    Parameters
+    ----------
+    options : PickOptions
+        how to pick targets
+    weight_of : Callable[[int], float], optional
+        returns the value of `options.weight_field` of the target at a position.
+        Required if `options.weight_field` is set.
+    """
+
+    def __init__(self, options: PickOptions, weight_of: Callable[[int], float] = None):
+        self.options = options
+        self.weight_of = weight_of
+        self.size = 0
+        self._available: List[int] = []
+        self._tree: List[float] = [0.0]
+        self._weights: List[float] = []
+        self._total = 0.0
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, n: int):
+        """ Add the targets at positions `len(self)` to `n - 1` """
+        options = self.options
+        for position in range(self.size, n):
+            if options.weighted:
+                self._append_weight(self.weight(position))
+            elif not options.replace:
+                self._available.append(position)
+        self.size = max(self.size, n)
+
+    def truncate(self, n: int):
+        """ Remove all targets from position `n` on """
+        if n >= self.size:
+            return
+        if not self.options.replace:
+            raise ConfigurationError(
+                "Targets picked without replacement cannot be released."
+            )
+        if self.options.weighted:
+            del self._tree[n + 1 :]
+            del self._weights[n:]
+            self._total = sum(self._weights)
+        self.size = n
+
+    def weight(self, position: int) -> float:
+        weight = 1.0
+        if self.options.distribution == "zipf":
+            weight = (position + 1) ** -self.options.exponent
+        if self.options.weight_field is not None:
+            value = self.weight_of(position)
+            if not isinstance(value, (int, float)) or value < 0:
+                raise ConfigurationError(
+                    f"Values of weight_field '{self.options.weight_field}' must be "
+                    f"non-negative numbers, not {value!r}."
+                )
+            weight *= value
+        return weight
+
+    def pick(self, seed: int) -> int:
+        """ Pick the position of a target with the random number `seed` """
+        u = uniform(seed)
+        if self.options.weighted:
+            if self._total <= 0:
+                raise self._empty()
+            position = self._find(u * self._total)
+            if not self.options.replace:
+                self._update(position, -self._weights[position])
+            return position
+        if self.options.replace:
+            if self.size == 0:
+                raise self._empty()
+            return int(u * self.size)
+        available = self._available
+        if not available:
+            raise self._empty()
+        slot = int(u * len(available))
+        position = available[slot]
+        available[slot] = available[-1]
+        available.pop()
+        return position
+
+    def pick_many(self, seeds: Sequence[int]) -> List[int]:
+        """Pick one target per seed.
+
+        Equivalent to calling `pick` for each seed, but uniform picks with
+        replacement are vectorized with NumPy.
+        """
+        options = self.options
+        if np is None or options.weighted or not options.replace or len(seeds) < 64:
+            return [self.pick(seed) for seed in seeds]
+        if self.size == 0:
+            raise self._empty()
+        bits = splitmix64_array(np.asarray(seeds, dtype=np.uint64)) >> np.uint64(11)
+        u = bits.astype(np.float64) * _TO_UNIT
+        return (u * self.size).astype(np.int64).tolist()
+
+    def _empty(self) -> Exception:
+        if self.size == 0:
+            return ValueError("choices must not be empty")
+        return ConfigurationError(
+            f"All {self.size} targets have been picked already. Create more targets "
+            f"or pick with replacement."
+        )
+
+    # ----------------------------------------------------------------------------
+    # Fenwick tree of the weights. `_tree` is 1-based.
+
+    def _append_weight(self, weight: float):
+        i = len(self._tree)
+        # node i covers the positions (i - lowbit(i), i]
+        covered = weight
+        child = i - 1
+        stop = i - (i & -i)
+        while child > stop:
+            covered += self._tree[child]
+            child -= child & -child
+        self._tree.append(covered)
+        self._weights.append(weight)
+        self._total += weight
+
+    def _update(self, position: int, delta: float):
+        self._weights[position] += delta
+        self._total += delta
+        i = position + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _find(self, target: float) -> int:
+        """ Return the first position whose cumulative weight exceeds `target` """
+        tree = self._tree
+        position = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            i = position + step
+            if i < len(tree) and tree[i] <= target:
+                position = i
+                target -= tree[i]
+            step >>= 1
+        # guard against rounding errors: the sums in the tree may be slightly off,
+        # so the position may have zero weight or lie beyond the last target. Take
+        # the next target with a positive weight, or else the previous one.
+        weights = self._weights
+        position = min(position, len(weights) - 1)
+        for candidate in range(position, len(weights)):
+            if weights[candidate] > 0:
+                return candidate
+        for candidate in range(position - 1, -1, -1):
+            if weights[candidate] > 0:
+                return candidate
+        # only rounding errors are left of the total
+        raise self._empty()
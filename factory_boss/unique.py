@@ -0,0 +1,98 @@
+""" Enforcement of unique values.
+
+A unique field remembers a 64-bit fingerprint of every value it has generated. If
+a new value has been generated before, it draws a new one, at most
+`MAX_ATTEMPTS` times. Seeded values draw their retries from seeds derived from the
+original seed (see `retry_seed`), so they stay reproducible.
+
+Fingerprints take less memory than most values. Two different values with the
+same fingerprint only cause an unnecessary retry, so the values stay unique.
+
+In batched generation, every shard remembers only its own values (see
+`UniqueValues.new_shard`), and `BatchRunner.merge` makes the values of all shards
+unique in the main process.
+"""
+import hashlib
+from typing import Any, Callable, Iterable, Set
+
+from factory_boss.errors import UniqueValueError
+from factory_boss.random_streams import MASK64, splitmix64
+
+MAX_ATTEMPTS = 100
+""" number of values drawn for one unique value before giving up """
+
+
+def fingerprint(value: Any) -> int:
+    """ 64-bit fingerprint of a value; integers are their own fingerprint """
+    if isinstance(value, int):
+        return value
+    data = value.encode() if isinstance(value, str) else repr(value).encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def retry_seed(seed: int, attempt: int) -> int:
+    """ Seed of the `attempt`-th value drawn for a unique value seeded with `seed` """
+    if attempt == 0:
+        return seed
+    # hash first, so that the retries of neighbouring seeds do not overlap
+    return splitmix64((splitmix64(seed) + attempt) & MASK64)
+
+
+class UniqueValues:
+    """The fingerprints of all values of a unique field.
+
+    Parameters
+    ----------
+    name : str
+        name of the field, for error messages
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name
+        self.fingerprints: Set[int] = set()
+        self.excluded: Set[int] = set()
+
+    def __len__(self):
+        return len(self.fingerprints) + len(self.excluded)
+
+    def clear(self):
+        self.fingerprints = set()
+        self.excluded = set()
+
+    def new_shard(self):
+        """Forget the values generated so far, but not the excluded values.
+
+        The fingerprints of the previous shard are not modified.
+        """
+        self.fingerprints = set()
+
+    def add(self, value: Any) -> bool:
+        """ Add `value` and return True if it is new, else return False """
+        fp = fingerprint(value)
+        if fp in self.excluded:
+            return False
+        fingerprints = self.fingerprints
+        size = len(fingerprints)
+        fingerprints.add(fp)
+        return len(fingerprints) > size
+
+    def update(self, values: Iterable[Any]):
+        """ Add values which must not be generated, e.g., of existing rows """
+        self.excluded.update(fingerprint(v) for v in values if v is not None)
+
+    def draw(self, candidate: Callable[[int], Any]) -> Any:
+        """Return the first new value of `candidate(0)`, `candidate(1)`, ...
+
+        Raises
+        ------
+        UniqueValueError
+            if none of the first `MAX_ATTEMPTS` candidates is new
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            value = candidate(attempt)
+            if self.add(value):
+                return value
+        raise UniqueValueError(
+            f"Found no new value for the unique field {self.name} in {MAX_ATTEMPTS} "
+            f"attempts after {len(self)} values. Are there enough possible values?"
+        )
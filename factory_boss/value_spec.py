@@ -1,20 +1,29 @@
+import datetime
 import logging
 import re
-from typing import Any, Dict, List
-
-from faker import Faker
-
-from factory_boss.errors import (
-    ConfigurationError,
-    InvalidReferenceError,
-    UnresolvedReferenceError,
-)
-from factory_boss.instance import Instance, InstanceValue
+import string
+import uuid
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from factory_boss.errors import ConfigurationError, UnresolvedReferenceError
+from factory_boss.faker_pool import faker_pool
+from factory_boss.grammar import Accessor, parse_code, reference_str
+from factory_boss.instance import BoundReference, Instance, InstanceValue
+from factory_boss.random_streams import splitmix64, splitmix64_array
+from factory_boss.reference_resolver import compile_path
 from factory_boss.spec_parser.value_spec_registry import ValueSpecRegistry
+from factory_boss.target_index import PickOptions
+from factory_boss.unique import UniqueValues, retry_seed
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
 logger = logging.getLogger(__name__)
 
-fake = Faker()
+fake = faker_pool.faker()
 
 
 class CodeToken:
@@ -23,16 +32,43 @@ class CodeToken:
 
 
 class Reference(CodeToken):
-    """ Reference to another ValueSpec """
+    """Reference to another ValueSpec
+
+    Parameters
+    ----------
+    target : str
+        path to the referenced field, e.g., "current_address.postcode"
+    accessor : int or slice, optional
+        index or slice that is applied to the referenced value, e.g., `slice(4)`
+        for "$postcode[:4]". Default: None, i.e., the whole value
+    """
 
-    def __init__(self, target: str):
+    def __init__(self, target: str, accessor: Accessor = None):
         self.target: str = target
+        self.accessor: Accessor = accessor
+        self.path = compile_path(target)
+
+    @property
+    def index(self) -> Optional[int]:
+        """ the index of the referenced value, if any """
+        return self.accessor if isinstance(self.accessor, int) else None
+
+    @property
+    def slice(self) -> Optional[slice]:
+        """ the slice of the referenced value, if any """
+        return self.accessor if isinstance(self.accessor, slice) else None
+
+    def access(self, value: Any) -> Any:
+        """ Apply the index or slice of this reference to the referenced `value` """
+        if self.accessor is None or value is None:
+            return value
+        return value[self.accessor]
 
     def resolve_to(self, target: InstanceValue) -> "ResolvedReference":
         return ResolvedReference(self, target)
 
     def __str__(self):
-        return f"Reference({self.target})"
+        return f"Reference({reference_str(self.target, self.accessor)})"
 
     def __repr__(self):
         return str(self)
@@ -45,7 +81,7 @@ class Reference(CodeToken):
 
 class ResolvedReference(Reference):
     def __init__(self, reference: Reference, resolved_target: InstanceValue):
-        super().__init__(reference.target)
+        super().__init__(reference.target, reference.accessor)
         self.parent = reference
         self.resolved_target: InstanceValue = resolved_target
 
@@ -55,7 +91,8 @@ class ResolvedReference(Reference):
         elif isinstance(self.resolved_target, Instance):
             return self.resolved_target
         else:
-            return self.resolved_target.value()
+            # generates the target value on demand in lazy mode
+            return self.resolved_target.make_value()
 
 
 class Literal(CodeToken):
@@ -69,6 +106,10 @@ class Literal(CodeToken):
 
 
 class ValueSpec:
+    indexed = False
+    """ if True, values are generated with `generate_indexed` where possible """
+    _bound_references: Dict[Reference, BoundReference] = None
+
     def __init__(self, type: str, name: str = None):
         self.name = name
         self.type = type
@@ -79,11 +120,85 @@ class ValueSpec:
     ) -> Any:
         raise NotImplementedError(f"Not implemented for {self}")
 
+    def generate_seeded(
+        self, resolved_references: Dict[Reference, ResolvedReference], seed: int
+    ) -> Any:
+        """Generate a value whose randomness only depends on `seed`.
+
+        The default implementation reseeds the faker before generating the value.
+        Subclasses which use other sources of randomness must override this.
+        """
+        fake.random.seed(seed)
+        return self.generate_value(resolved_references)
+
+    def generate_batch(
+        self,
+        n: int,
+        resolved_references: Dict[Reference, ResolvedReference] = None,
+        seeds: List[int] = None,
+    ) -> List[Any]:
+        """Generate `n` values at once.
+
+        Only valid if the references resolve to the same values for all `n` values,
+        e.g., if the spec has no references at all. Subclasses override this with
+        faster implementations than calling `generate_value` `n` times.
+
+        If `seeds` are given, the i-th value is the value `generate_seeded` returns
+        for the i-th seed.
+        """
+        resolved_references = resolved_references or {}
+        if seeds is not None:
+            return [self.generate_seeded(resolved_references, s) for s in seeds]
+        return [self.generate_value(resolved_references) for _ in range(n)]
+
+    def generate_indexed(self, indices: Sequence[Optional[int]]) -> List[Any]:
+        """Generate one value per row from the indices of the rows.
+
+        Only used if `indexed` is True and the spec has no references. `indices`
+        are the indices of root rows among all root rows of their entity (see
+        `reset`), or None for rows created by relations.
+        """
+        raise NotImplementedError(f"Not implemented for {self}")
+
+    def reset(self, roots: range = range(0)):
+        """Forget the state of previous runs, e.g., the values of a unique field.
+
+        Called at the start of every run. `roots` are the indices of the root rows
+        of the spec's entity generated in this run.
+        """
+
+    def start_shard(self, shard: int, shards: int):
+        """Prepare the generation of shard number `shard` of `shards`.
+
+        Batched generation splits a run into shards, i.e., batches, which may be
+        generated in any order and in different processes. Specs which must
+        generate disjoint values in all shards, like `SequenceField`, use this to
+        partition their values.
+        """
+
+    def exclude(self, values: Iterable[Any]):
+        """ Never generate any of `values`, e.g., the values of existing rows """
+
     def references(self) -> List["Reference"]:
         return self._references
 
     def add_reference(self, ref: Reference):
         self._references.append(ref)
+        self._bound_references = None
+
+    def bound_references(self) -> Dict[Reference, BoundReference]:
+        """Return the references of this spec, bound once for all its values.
+
+        `InstanceValue.make_value` passes them to `generate_value`, and each one
+        looks up its target for the value being evaluated, see `BoundReference`.
+        """
+        bound = self._bound_references
+        if bound is None:
+            bound = self._bound_references = {
+                ref: BoundReference(position, ref.path)
+                for position, ref in enumerate(self.references())
+            }
+        return bound
 
     def derived_fields(self) -> Dict[str, "ValueSpec"]:
         """Return fields derived from this field.
@@ -106,13 +221,41 @@ class Constant(ValueSpec):
     def generate_value(self, resolved_references):
         return self.value
 
+    def generate_seeded(self, resolved_references, seed):
+        return self.value
+
+    def generate_batch(self, n, resolved_references=None, seeds=None):
+        return [self.value] * n
+
 
 class DynamicField(ValueSpec):
+    """A value computed from literals and references to other fields.
+
+    The code is parsed into an AST of `Literal`s and `Reference`s and then compiled
+    into the fastest equivalent evaluation:
+
+    * code without references is a constant;
+    * code which is one single reference passes the referenced value through,
+      keeping its type;
+    * everything else is a format string, in which consecutive literals are merged
+      and every reference is a replacement field.
+
+    `interpret` evaluates the AST token by token instead. It returns the same
+    values and is kept as a reference implementation.
+    """
+
     def __init__(self, code, type, name: str = None):
         super().__init__(type=type, name=name)
         self.code = code
         self.ast: List[CodeToken] = None
+        self._constant: Any = None
+        self._reference: Reference = None
+        self._format: str = None
+        self._format_references: Tuple[Reference, ...] = ()
+        self._has_accessors = False
+        self._evaluate: Callable[[Dict], Any] = None
         self.parse()
+        self.compile()
 
     @classmethod
     def create(cls, spec: Dict[str, Any], name: str) -> ValueSpec:
@@ -127,47 +270,148 @@ class DynamicField(ValueSpec):
             return cls(code=spec, type=None)
 
     def parse(self) -> List:
+        """Parse the code into a list of `Literal`s and `Reference`s.
+
+        See `factory_boss.grammar` for the syntax.
+        """
         ast: List[CodeToken] = []
         if isinstance(self.code, str):
-            tokens = self.code.split(" ")
-            for t in tokens:
-                if len(ast) > 0:
-                    ast.append(Literal(" "))
-                if t.startswith("$"):
-                    pattern = r"\$([a-zA-Z_][\w\.]*\w).*"
-                    m = re.match(pattern, t)
-                    if m is None:
-                        raise InvalidReferenceError(t)
-                    ref = Reference(m[1])
+            for part in parse_code(self.code) or ("",):
+                if isinstance(part, str):
+                    ast.append(Literal(part))
+                else:
+                    ref = Reference(*part)
                     self.add_reference(ref)
                     ast.append(ref)
-                else:
-                    ast.append(Literal(t))
         else:
             ast = [Literal(self.code)]
         self.ast = ast
         return ast
 
+    def compile(self):
+        """ Compile `ast` into a constant, a passthrough or a format string """
+        if len(self.ast) == 1 and isinstance(self.ast[0], Reference):
+            self._reference = self.ast[0]
+            self._evaluate = self._passthrough
+            return
+        if len(self.ast) == 1:
+            self._constant = self.ast[0].value()
+            self._evaluate = self._constant_value
+            return
+        parts: List[str] = []
+        references: List[Reference] = []
+        for token in self.ast:
+            if isinstance(token, Reference):
+                parts.append("{}")
+                references.append(token)
+            else:
+                literal = str(token.value())
+                parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if references:
+            self._format = "".join(parts)
+            self._format_references = tuple(references)
+            self._has_accessors = any(ref.accessor is not None for ref in references)
+            self._evaluate = self._formatted
+        else:
+            self._constant = "".join(str(token.value()) for token in self.ast)
+            self._evaluate = self._constant_value
+
+    def _constant_value(self, resolved_references) -> Any:
+        return self._constant
+
+    def _passthrough(self, resolved_references) -> Any:
+        ref = self._reference
+        return ref.access(resolved_references.get(ref, ref).value())
+
+    def _formatted(self, resolved_references) -> str:
+        try:
+            values = [
+                resolved_references[ref].value() for ref in self._format_references
+            ]
+        except KeyError:
+            # unresolved references raise UnresolvedReferenceError
+            values = [
+                resolved_references.get(ref, ref).value()
+                for ref in self._format_references
+            ]
+        if self._has_accessors:
+            values = [
+                ref.access(value) for ref, value in zip(self._format_references, values)
+            ]
+        return self._format.format(*values)
+
     def generate_value(self, resolved_references) -> Any:
-        resolved_ast = [
-            resolved_references[v] if v in resolved_references else v for v in self.ast
+        return self._evaluate(resolved_references)
+
+    def interpret(self, resolved_references) -> Any:
+        """ Evaluate the AST token by token, without the compiled form """
+        values = [
+            v.access(resolved_references.get(v, v).value())
+            if isinstance(v, Reference)
+            else v.value()
+            for v in self.ast
         ]
-        if len(resolved_ast) == 1:
-            return resolved_ast[0].value()
+        if len(values) == 1:
+            return values[0]
         else:
-            return "".join([str(v.value()) for v in resolved_ast])
+            return "".join([str(v) for v in values])
+
+    def generate_seeded(self, resolved_references, seed) -> Any:
+        # deterministic, no need to reseed the faker
+        return self.generate_value(resolved_references)
 
     def __repr__(self):
         return f"{self.__class__.__name__}(code={self.code}, type={self.type}, name={self.name})"
 
 
 class FakerField(ValueSpec):
+    """A value generated by a Faker function.
+
+    The provider method of `faker_func` is looked up in the `Faker` of `locale`
+    (see `factory_boss.faker_pool`) and checked against `faker_kwargs` once, when
+    the field is created. An unknown function, locale or argument raises a
+    `ConfigurationError`.
+
+    If `unique` is True, every value is different from all other values of the
+    field in the same run, see `factory_boss.unique`.
+    """
+
     def __init__(
-        self, type: str, faker_func: str, faker_kwargs: Dict = {}, name: str = None
+        self,
+        type: str,
+        faker_func: str,
+        faker_kwargs: Dict = {},
+        name: str = None,
+        unique: bool = False,
+        locale: str = None,
     ):
         super().__init__(type, name=name)
         self.faker_func = faker_func
-        self.faker_kwargs = faker_kwargs
+        self.faker_kwargs = faker_kwargs or {}
+        self.unique: Optional[UniqueValues] = UniqueValues(name) if unique else None
+        self.locale = locale
+        self._method = self._resolve()
+
+    def _resolve(self) -> Callable:
+        try:
+            return faker_pool.method(self.faker_func, self.faker_kwargs, self.locale)
+        except ConfigurationError as e:
+            raise ConfigurationError(f"{self.name}: {e}")
+
+    def set_locale(self, locale: str):
+        """ Generate the values with the `Faker` of `locale` """
+        self.locale = locale
+        self._method = self._resolve()
+
+    def __getstate__(self):
+        # bound methods of Faker providers are neither small nor shareable
+        state = self.__dict__.copy()
+        del state["_method"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._method = self._resolve()
 
     @classmethod
     def create(cls, spec: Dict, name: str):
@@ -182,18 +426,254 @@ class FakerField(ValueSpec):
                 faker_kwargs = kwargs
         else:
             faker_func = fakespec
-        return cls(spec.get("type"), faker_func, faker_kwargs)
+        return cls(
+            spec.get("type"),
+            faker_func,
+            faker_kwargs,
+            name,
+            is_unique(spec),
+            spec["mock"].get("locale"),
+        )
+
+    def reset(self, roots=range(0)):
+        if self.unique is not None:
+            self.unique.clear()
+
+    def start_shard(self, shard, shards):
+        if self.unique is not None:
+            self.unique.new_shard()
+
+    def exclude(self, values):
+        if self.unique is not None:
+            self.unique.update(values)
 
     def generate_value(self, resolved_references):
-        f = getattr(fake, self.faker_func)
+        if self.unique is None:
+            return self._fake()
+        return self.unique.draw(lambda attempt: self._fake())
+
+    def generate_seeded(self, resolved_references, seed):
+        if self.unique is None:
+            return self._generate_seeded(resolved_references, seed)
+        return self.unique.draw(
+            lambda attempt: self._generate_seeded(
+                resolved_references, retry_seed(seed, attempt)
+            )
+        )
+
+    def generate_batch(self, n, resolved_references=None, seeds=None):
+        values = self._generate_batch(n, resolved_references, seeds)
+        if self.unique is not None:
+            self._make_unique(values, resolved_references or {}, seeds)
+        return values
+
+    def _fake(self):
+        return self._method(**self.faker_kwargs)
+
+    def _generate_seeded(self, resolved_references, seed):
+        """ Generate a seeded value, without enforcing uniqueness """
+        fake.random.seed(seed)
+        return self._fake()
+
+    def _make_unique(self, values: List, resolved_references, seeds: List[int]):
+        """ Replace the values of a batch which are not new by new values """
+        unique = self.unique
+        for i, value in enumerate(values):
+            if unique.add(value):
+                continue
+            if seeds is None:
+                values[i] = unique.draw(lambda attempt: self._fake())
+            else:
+                seed = seeds[i]
+                values[i] = unique.draw(
+                    lambda attempt: self._generate_seeded(
+                        resolved_references, retry_seed(seed, attempt)
+                    )
+                )
+
+    def _generate_batch(self, n, resolved_references=None, seeds=None):
+        """ Generate a batch of values, without enforcing uniqueness """
+        f = self._method
         kwargs = self.faker_kwargs
-        value = f(**kwargs)
-        return value
+        if seeds is None:
+            return [f(**kwargs) for _ in range(n)]
+        values = []
+        reseed = fake.random.seed
+        for seed in seeds:
+            reseed(seed)
+            values.append(f(**kwargs))
+        return values
 
     def __repr__(self):
         return f"FakerField({self.__class__.__name__}('{self.type}', '{self.faker_func}', {self.faker_kwargs})"
 
 
+def is_unique(spec: Dict[str, Any]) -> bool:
+    """ Whether the field configuration `spec` requires unique values """
+    return bool(spec.get("unique") or spec.get("primary_key"))
+
+
+def is_id(spec: Dict[str, Any]) -> bool:
+    """ Whether the field configuration `spec` is an ID without a mock """
+    return spec.get("mock") is None and (
+        spec.get("value_type") == "id" or bool(spec.get("primary_key"))
+    )
+
+
+class IdField(ValueSpec):
+    """Random signed 64-bit integer IDs, e.g., for BIGINT columns.
+
+    Configured as ``mock: {id: null}``, or implied by ``value_type: id`` or
+    ``primary_key: true`` on an integer field without mock.
+
+    A seeded ID is a bijective hash of its seed, so IDs neither depend on the
+    order of generation nor on the process. Seeds are unique per row for all root
+    rows of an entity (see `factory_boss.random_streams`), hence the IDs of root
+    rows are unique. Rows created by relations have hashed keys, which collide
+    with a probability of about n ** 2 / 2 ** 65 for n rows of an entity, e.g.,
+    about 3e-6 for ten million rows, but 3% for a billion rows. Such IDs are not
+    checked for duplicates. Unseeded IDs are unique per run, like the values of
+    unique Faker fields.
+    """
+
+    def __init__(self, type: str = "integer", name: str = None):
+        super().__init__(type, name=name)
+        self.unique = UniqueValues(name)
+
+    @classmethod
+    def create(cls, spec: Dict, name: str):
+        return cls(spec.get("type", "integer"), name=name)
+
+    def reset(self, roots=range(0)):
+        self.unique.clear()
+
+    def generate_value(self, resolved_references):
+        return self.unique.draw(lambda attempt: _signed64(fake.random.getrandbits(64)))
+
+    def generate_seeded(self, resolved_references, seed):
+        return _signed64(splitmix64(seed))
+
+
+def _signed64(value: int) -> int:
+    """ Map an unsigned 64-bit integer bijectively to a signed one """
+    return value - (1 << 64) if value >> 63 else value
+
+
+class SequenceField(ValueSpec):
+    """Sequential integers `start`, `start + step`, `start + 2 * step`, ...
+
+    Configured as ``mock: {sequence: {start: 1, step: 1}}``.
+
+    Root rows are numbered by their index (see `generate_indexed`), so the values
+    of root rows are contiguous and the same in `Generator.generate` and batched
+    generation, for any batch size and number of workers. Rows created by
+    relations are numbered after all root rows of the run, in the order in which
+    they are generated. In shard `s` of `n` shards (see `start_shard`), the
+    `i`-th created row is number `i * n + s`, so the values of all shards are
+    disjoint, no matter which process generates which shard. Hence the values of
+    created rows only depend on the seed in `Generator.generate`.
+    """
+
+    indexed = True
+
+    def __init__(
+        self, type: str = "integer", start: int = 1, step: int = 1, name: str = None
+    ):
+        super().__init__(type, name=name)
+        if not isinstance(start, int) or not isinstance(step, int) or step == 0:
+            raise ConfigurationError(
+                f"{name}: sequence start and step must be integers and step must "
+                f"not be 0, but got start={start!r}, step={step!r}."
+            )
+        self.start = start
+        self.step = step
+        self.reset()
+
+    @classmethod
+    def create(cls, spec: Dict, name: str):
+        options = (spec.get("mock") or {}).get("sequence") or {}
+        unknown = set(options) - {"start", "step"}
+        if unknown:
+            raise ConfigurationError(f"{name}: unknown sequence options {unknown}.")
+        return cls(spec.get("type", "integer"), name=name, **options)
+
+    def reset(self, roots=range(0)):
+        self._roots = roots
+        self._excluded = 0
+        self._next = 0
+        self._shard = 0
+        self._shards = 1
+
+    def start_shard(self, shard, shards):
+        self._next = 0
+        self._shard = shard
+        self._shards = shards
+
+    def exclude(self, values):
+        numbers = [(v - self.start) // self.step for v in values if v is not None]
+        if numbers:
+            # continue after the last excluded value
+            self._excluded = max(self._excluded, max(numbers) + 1)
+
+    def generate_value(self, resolved_references):
+        return self.generate_indexed([None])[0]
+
+    def generate_seeded(self, resolved_references, seed):
+        return self.generate_indexed([None])[0]
+
+    def generate_batch(self, n, resolved_references=None, seeds=None):
+        return self.generate_indexed([None] * n)
+
+    def generate_indexed(self, indices):
+        roots = self._roots
+        # number of the root row with index 0, which is > 0 after `exclude`
+        offset = max(0, self._excluded - roots.start)
+        created = offset + roots.stop
+        shards, shard = self._shards, self._shard
+        start, step = self.start, self.step
+        values = []
+        for index in indices:
+            if index is None:
+                index = created + self._next * shards + shard
+                self._next += 1
+            else:
+                index += offset
+            values.append(start + step * index)
+        return values
+
+    def __repr__(self):
+        return f"SequenceField(start={self.start}, step={self.step}, name={self.name})"
+
+
+class UUIDField(ValueSpec):
+    """Random UUIDs (version 4) as strings.
+
+    Configured as ``mock: {uuid: null}``, or implied by ``value_type: id`` or
+    ``primary_key: true`` on a string field without mock.
+
+    A seeded UUID contains a bijective hash of its seed, so rows with different
+    keys (see `factory_boss.random_streams`) get different UUIDs, no matter which
+    process generates them.
+    """
+
+    _LOW_58 = (1 << 58) - 1
+
+    @classmethod
+    def create(cls, spec: Dict, name: str):
+        return cls(spec.get("type", "string"), name=name)
+
+    def generate_value(self, resolved_references):
+        return str(uuid.UUID(int=fake.random.getrandbits(128), version=4))
+
+    def generate_seeded(self, resolved_references, seed):
+        h = splitmix64(seed)
+        g = splitmix64(h)
+        # the 64 bits of h fill the bits which are not fixed by version and variant
+        high = ((h >> 16) << 16) | (4 << 12) | ((h >> 4) & 0xFFF)
+        low = (0b10 << 62) | ((h & 0xF) << 58) | (g & self._LOW_58)
+        return str(uuid.UUID(int=(high << 64) | low))
+
+
 class RelationSpec(ValueSpec):
     """Specifies a relation between entities.
 
@@ -220,6 +700,9 @@ class RelationSpec(ValueSpec):
     relation_overrides : Dict[str, ValueSpec]
         when `relation_strategy` is "create", this dictionary specifies overrides
         for fields of the remote instance.
+    relation_strategy_options : PickOptions, optional
+        when `relation_strategy` is "pick_random", specifies the distribution of
+        the picked targets and whether targets can be picked more than once.
     """
 
     ONE_TO_MANY = "1tm"
@@ -236,6 +719,7 @@ class RelationSpec(ValueSpec):
         remote_name: str,
         relation_strategy: str,
         relation_overrides: Dict[str, ValueSpec],
+        relation_strategy_options: PickOptions = None,
     ):
         super().__init__(name=name, type="relation")
         self.target_entity = target_entity
@@ -245,6 +729,7 @@ class RelationSpec(ValueSpec):
         self.remote_name = remote_name
         self.relation_strategy = relation_strategy
         self.relation_overrides: Dict[str, ValueSpec] = relation_overrides
+        self.relation_strategy_options = relation_strategy_options or PickOptions()
 
     @classmethod
     def create(cls, spec: Dict, name: str = None):
@@ -263,6 +748,12 @@ class RelationSpec(ValueSpec):
             extra = specs_from_dict.derived_fields()
             relation_overrides[k] = specs_from_dict
             relation_overrides.update(extra)
+        options = mock_info.get("relation_strategy_options")
+        if options and relation_strategy != "pick_random":
+            raise ConfigurationError(
+                f"{name}: relation_strategy_options are only supported for the "
+                f"'pick_random' relation_strategy."
+            )
 
         return cls(
             name=name,
@@ -273,8 +764,17 @@ class RelationSpec(ValueSpec):
             local_field=local_field,
             relation_strategy=relation_strategy,
             relation_overrides=relation_overrides,
+            relation_strategy_options=PickOptions.from_dict(options),
         )
 
+    def create_bounds(self) -> Tuple[int, int]:
+        """Return the bounds of the number of instances a one-to-many relation creates.
+
+        The strategy "create(a)" creates `a` instances and "create(a, b)" between `a`
+        and `b` instances. The strategy is parsed only once.
+        """
+        return _create_bounds(self.relation_strategy)
+
     def default_value(self):
         if self.relation_type == self.ONE_TO_MANY:
             return []
@@ -339,28 +839,126 @@ class RelationSpec(ValueSpec):
             return super().derived_fields()
 
 
+@lru_cache(maxsize=None)
+def _create_bounds(strategy: str) -> Tuple[int, int]:
+    """ Parse a "create(a, b)" relation strategy into its bounds """
+    create_match = re.match(r"^create\(\s*(?P<a>\d+)(,\s*(?P<b>\d+))?\)$", strategy)
+    if not create_match:
+        raise ConfigurationError(
+            f"Invalid relation_strategy. "
+            f"Expected one of 'pick_random', 'create', "
+            f"but got '{strategy}' instead."
+        )
+    a = int(create_match["a"])
+    b = int(create_match["b"] or create_match["a"])
+    if b < a:
+        raise ConfigurationError(f"Lower must be less/equal upper, but {a} > {b}.")
+    return a, b
+
+
 class TypeFakerSpec(FakerField):
-    """ Faker for different data types """
+    """Faker for different data types
+
+    If NumPy is installed, `generate_batch` generates integers, strings and dates
+    with vectorized NumPy functions instead of calling Faker once per value. Unseeded
+    batches use a NumPy random generator seeded from Faker's random generator.
+    Seeded values are counter-based hashes of their seed, so they are the same
+    whether they are generated one by one or in a batch.
+    """
+
+    _LETTERS = string.ascii_letters
+
+    LAST_SEEDED_DATE = datetime.date(2025, 12, 31)
+    """ end of the range of seeded dates, so that a seed gives the same dates on
+    every day """
 
     @classmethod
     def create(cls, spec: Dict, name: str):
         type = spec["type"]
-        return cls.create_faker_for_type(type, name)
+        return cls.create_faker_for_type(type, name, is_unique(spec))
 
     @classmethod
-    def create_faker_for_type(cls, type: str, name):
+    def create_faker_for_type(cls, type: str, name, unique: bool = False):
         if type == "integer":
             return cls(
                 type,
                 "pyint",
                 {"min_value": -1_000_000, "max_value": +1_000_000},
                 name=name,
+                unique=unique,
             )
         elif type == "string":
-            return cls(type, "pystr", {"max_chars": 20}, name=name)
+            return cls(type, "pystr", {"max_chars": 20}, name=name, unique=unique)
         elif type == "date":
-            return cls(type, "date", name=name)
+            return cls(type, "date", name=name, unique=unique)
         else:
             # TODO better error handling
             logger.warning(f'{cls}: unknown type "{type}". Returning Constant(None)')
             return Constant(type, None)
+
+    def _generate_seeded(self, resolved_references, seed):
+        values = self._generate_numpy(1, [seed])
+        if values is None:
+            return super()._generate_seeded(resolved_references, seed)
+        return values[0]
+
+    def _generate_batch(self, n, resolved_references=None, seeds=None):
+        values = self._generate_numpy(n, seeds)
+        if values is None:
+            return super()._generate_batch(n, resolved_references, seeds)
+        return values
+
+    def _generate_numpy(self, n: int, seeds: List[int] = None) -> Optional[List]:
+        """Generate `n` values with NumPy.
+
+        Returns None if NumPy is not installed or the faker function or its
+        arguments are not supported.
+        """
+        if np is None:
+            return None
+        if seeds is None:
+            rng = np.random.default_rng(fake.random.getrandbits(64))
+
+            def draw(high, width=None):
+                return rng.integers(0, high, size=n if width is None else (n, width))
+
+        else:
+            keys = np.asarray(seeds, dtype=np.uint64)
+
+            def draw(high, width=None):
+                # counter-based: the i-th number of a value is a hash of (seed, i)
+                counters = np.arange(width or 1, dtype=np.uint64)
+                bits = splitmix64_array(keys[:, None] + counters[None, :])
+                numbers = (bits % np.uint64(high)).astype(np.int64)
+                return numbers if width is not None else numbers[:, 0]
+
+        kwargs = self.faker_kwargs
+        if self.faker_func == "pyint" and set(kwargs) <= {
+            "min_value",
+            "max_value",
+            "step",
+        }:
+            min_value = kwargs.get("min_value", 0)
+            max_value = kwargs.get("max_value", 9999)
+            step = kwargs.get("step", 1)
+            steps = draw((max_value - min_value) // step + 1)
+            return (min_value + step * steps).tolist()
+        elif self.faker_func == "pystr" and set(kwargs) <= {"max_chars"}:
+            max_chars = kwargs.get("max_chars", 20)
+            if max_chars == 0:
+                return [""] * n
+            letters = np.array(list(self._LETTERS))
+            chars = letters[draw(len(letters), max_chars)]
+            return chars.view(f"<U{max_chars}")[:, 0].tolist()
+        elif self.faker_func == "date" and not kwargs:
+            # like Faker: a random day between the unix epoch and today, but
+            # seeded dates must not depend on the day they are generated on
+            if seeds is None:
+                last = datetime.datetime.now(datetime.timezone.utc).date()
+            else:
+                last = self.LAST_SEEDED_DATE
+            epoch = datetime.date(1970, 1, 1)
+            days = draw((last - epoch).days + 1)
+            dates = np.datetime64("1970-01-01") + days.astype("timedelta64[D]")
+            return dates.astype(str).tolist()
+        return None
@@ -0,0 +1,16 @@
+import pytest
+import yaml
+
+from factory_boss.spec_parser.parser import SpecParser
+
+
+def _load_spec(path="examples/simple_schema.yaml"):
+    with open(path, "r") as f:
+        schema = yaml.safe_load(f)
+    return SpecParser().parse(schema)
+
+
+@pytest.fixture
+def load_spec():
+    """ Function which parses a schema file, by default the example schema """
+    return _load_spec
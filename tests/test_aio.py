@@ -0,0 +1,67 @@
+import asyncio
+
+from factory_boss.aio import iterate_in_executor
+from factory_boss.generator import Generator
+from factory_boss.sinks import AsyncSink, JsonLinesSink
+
+COUNTS = {"Person": 20, "Address": 3, "AddressHistory": 0}
+
+
+class ListSink(AsyncSink):
+    def __init__(self):
+        super().__init__(chunk_size=7)
+        self.chunks = []
+
+    async def write_chunk(self, entity, rows):
+        await asyncio.sleep(0)
+        self.chunks.append((entity, rows))
+
+
+def test_async_generation_equals_sync_generation(load_spec):
+    async def generate():
+        output = await Generator(load_spec(), seed=3).agenerate(False, COUNTS)
+        generator = Generator(load_spec(), seed=3)
+        rows = [row async for row in generator.aiter_rows(COUNTS, batch_size=6)]
+        return output, rows
+
+    output, rows = asyncio.run(generate())
+    assert output == Generator(load_spec(), seed=3).generate(False, COUNTS)
+    expected = Generator(load_spec(), seed=3).iter_rows(COUNTS, batch_size=6)
+    assert rows == list(expected)
+
+
+def test_awrite_to_async_and_sync_sinks(tmp_path, load_spec):
+    async def write(sink):
+        generator = Generator(load_spec(), seed=4)
+        return await generator.awrite(sink, COUNTS, batch_size=6)
+
+    sink = ListSink()
+    stats = asyncio.run(write(sink))
+    assert sink.rows_written == dict(stats.rows)
+    assert sum(len(rows) for _, rows in sink.chunks) == stats.total_rows
+
+    with JsonLinesSink(str(tmp_path)) as jsonl:
+        asyncio.run(write(jsonl))
+    with open(tmp_path / "Person.jsonl") as f:
+        assert len(f.readlines()) == 40
+
+
+def test_iterate_in_executor_closes_the_iterator():
+    closed = []
+
+    def numbers():
+        try:
+            yield from range(10)
+        finally:
+            closed.append(True)
+
+    async def first_two():
+        items = []
+        async for i in iterate_in_executor(numbers()):
+            items.append(i)
+            if len(items) == 2:
+                break
+        return items
+
+    assert asyncio.run(first_two()) == [0, 1]
+    assert closed == [True]
@@ -0,0 +1,46 @@
+from factory_boss.columnar import ColumnarEngine, ColumnarInstance
+from factory_boss.generator import Generator
+
+
+def test_columnar_generate(load_spec):
+    generator = Generator(load_spec(), backend="columnar")
+    output = generator.generate(counts={"Person": 5, "Address": 2})
+    assert len(output["Person"]) == 10
+    addresses = {a["address_id"]: a for a in output["Address"]}
+    for person in output["Person"]:
+        assert person["address_id"] in addresses
+        assert person["address_string"] == person["current_address"]["full_address"]
+        # partners point to each other and share the address
+        partner = person["partner"]
+        assert partner["partner"] is person
+        assert partner["partner_id"] == person["person_id"]
+        assert partner["address_id"] == person["address_id"]
+
+
+def test_columnar_instances_are_views(load_spec):
+    spec = load_spec()
+    Generator(spec).complete_relation_specs(spec["entities"])
+    engine = ColumnarEngine(spec["entities"])
+    engine.add_rows("Address", 2)
+    engine.add_rows("Person", 3)
+    engine.make_relations()
+    engine.evaluate()
+    table = engine.tables["Person"]
+    assert table.n_rows == 6
+    person = engine.instances("Person")[0]
+    address = person.value("current_address")
+    assert isinstance(address, ColumnarInstance)
+    assert address.value("address_id") == person.value("address_id")
+    assert person in address.value("persons")
+    assert person.value("partner").value("partner") == person
+    assert "current_address" not in person.to_dict(with_related_objects=False)
+
+
+def test_columnar_iter_rows(load_spec):
+    generator = Generator(load_spec(), backend="columnar")
+    counts = {"Person": 25, "Address": 4, "AddressHistory": 0}
+    output = generator.generate_batched(counts=counts, batch_size=10)
+    assert len(output["Address"]) == 4
+    assert len(output["Person"]) == 50
+    address_ids = {a["address_id"] for a in output["Address"]}
+    assert {p["address_id"] for p in output["Person"]} <= address_ids
@@ -0,0 +1,39 @@
+import pytest
+
+from factory_boss.errors import ConfigurationError
+from factory_boss.generator import Generator
+from factory_boss.spec_parser.parser import SpecParser
+
+
+def parse(entities):
+    return SpecParser().parse({"entities": entities})
+
+
+def test_plan_is_compiled_once_per_entity():
+    spec = parse(
+        {
+            "A": {
+                "fields": {
+                    "full": "$first $last",
+                    "first": {"type": "string", "mock": {"faker": "first_name"}},
+                    "last": {"type": "string", "mock": {"faker": "last_name"}},
+                }
+            }
+        }
+    )
+    generator = Generator(spec)
+    instances = generator.make_instances({"A": 2})
+    assert instances[0].plan is instances[1].plan
+    order = instances[0].plan.order
+    assert order.index("full") > order.index("first")
+    assert not instances[0].plan.crossing
+
+    output = generator.generate(counts={"A": 2})
+    for row in output["A"]:
+        assert row["full"] == f"{row['first']} {row['last']}"
+
+
+def test_circular_fields_raise():
+    spec = parse({"A": {"fields": {"aa": "$bb", "bb": "$aa"}}})
+    with pytest.raises(ConfigurationError):
+        Generator(spec).generate()
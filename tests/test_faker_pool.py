@@ -0,0 +1,59 @@
+import pickle
+
+import pytest
+
+from factory_boss.errors import ConfigurationError
+from factory_boss.faker_pool import FakerPool, faker_pool
+from factory_boss.spec_parser.parser import SpecParser
+from factory_boss.value_spec import FakerField
+
+
+def parse_fields(fields, **entity_options):
+    spec = SpecParser().parse({"entities": {"E": {"fields": fields, **entity_options}}})
+    return spec["entities"]["E"].fields
+
+
+def test_one_faker_per_locale():
+    pool = FakerPool()
+    assert pool.faker("de_DE") is pool.faker("de_DE")
+    assert pool.faker() is not pool.faker("de_DE")
+    assert pool.faker("de_DE").random is pool.random
+    with pytest.raises(ConfigurationError):
+        pool.faker("xx_XX")
+
+
+@pytest.mark.parametrize(
+    "mock",
+    [
+        {"faker": "no_such_function"},
+        {"faker": {"pyint": {"no_such_argument": 1}}},
+        {"faker": "name", "locale": "xx_XX"},
+    ],
+)
+def test_invalid_faker_fields_raise_when_parsed(mock):
+    with pytest.raises(ConfigurationError):
+        parse_fields({"f": {"type": "string", "mock": mock}})
+
+
+def test_locales_of_fields_and_entities():
+    fields = parse_fields(
+        {
+            "name": {"type": "string", "mock": {"faker": "name"}},
+            "city": {"type": "string", "mock": {"faker": "city", "locale": "fr_FR"}},
+        },
+        locale="de_DE",
+    )
+    assert fields["name"].locale == "de_DE"
+    assert fields["city"].locale == "fr_FR"
+    faker_pool.random.seed(7)
+    expected = faker_pool.faker("de_DE").name()
+    assert fields["name"].generate_seeded({}, 7) == expected
+
+
+def test_pickled_faker_fields_resolve_their_method_again():
+    field = FakerField("string", "name", name="name", locale="de_DE")
+    copy = pickle.loads(pickle.dumps(field))
+    assert copy.locale == "de_DE"
+    assert copy.generate_batch(3, seeds=[1, 2, 3]) == field.generate_batch(
+        3, seeds=[1, 2, 3]
+    )
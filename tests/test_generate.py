@@ -1,6 +1,101 @@
+import json
+import sys
+
+import pytest
+
 from factory_boss.scripts.generate import main
+from factory_boss.spec_cache import CACHE_DIR_VARIABLE
 
 
-def test_generate_does_not_raise():
-    main()
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """ Keep the cache of compiled schemas out of the home directory """
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_VARIABLE, str(cache_dir))
+    return cache_dir
+
+
+def test_generate_does_not_raise(cache_dir):
+    main(["examples/simple_schema.yaml"])
+    assert len(list(cache_dir.iterdir())) == 1
     assert True, "if we reach this line then main() from generate did not raise"
+
+
+def test_generate_streams_files(tmp_path, capsys):
+    output = tmp_path / "out"
+    main(
+        [
+            "examples/simple_schema.yaml",
+            "--count",
+            "Person=25",
+            "-c",
+            "Address=4",
+            "--seed",
+            "1",
+            "--format",
+            "jsonl",
+            "--output",
+            str(output),
+            "--batch-size",
+            "10",
+            "--chunk-size",
+            "7",
+            "--no-cache",
+        ]
+    )
+    with open(output / "Person.jsonl") as f:
+        assert len(f.readlines()) == 50
+    with open(output / "Address.jsonl") as f:
+        assert len(f.readlines()) == 4
+    stderr = capsys.readouterr().err
+    assert "rows/s" in stderr and "Peak memory" in stderr
+
+
+def test_generate_prints_json_lines(capsys):
+    main(
+        [
+            "examples/simple_schema.yaml",
+            "--count",
+            "Person=2",
+            "--count",
+            "Address=1",
+            "--seed",
+            "3",
+        ]
+    )
+    lines = capsys.readouterr().out.splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert sum(row["entity"] == "Person" for row in rows) == 4
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        [],
+        ["examples/simple_schema.yaml", "--count", "Person"],
+        ["examples/simple_schema.yaml", "--count", "Person=-1"],
+        ["missing.yaml"],
+        ["examples/simple_schema.yaml", "--workers", "0"],
+        ["examples/simple_schema.yaml", "--batch-size", "0"],
+        ["examples/simple_schema.yaml", "--chunk-size", "-1"],
+    ],
+)
+def test_generate_rejects_invalid_arguments(argv):
+    with pytest.raises(SystemExit) as e:
+        main(argv)
+    assert e.value.code != 0
+
+
+def test_generate_reads_sys_argv(monkeypatch, capsys):
+    argv = [
+        "factory-boss",
+        "examples/simple_schema.yaml",
+        "--count",
+        "Person=1",
+        "--count",
+        "Address=1",
+    ]
+    monkeypatch.setattr(sys, "argv", argv)
+    main()
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sum(row["entity"] == "Person" for row in rows) == 2
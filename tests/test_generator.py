@@ -0,0 +1,283 @@
+import weakref
+
+import pytest
+
+from factory_boss.errors import ConfigurationError
+from factory_boss.generator import Generator
+from factory_boss.spec_parser.parser import SpecParser
+
+
+def test_counts_from_spec_and_arguments(load_spec):
+    spec = load_spec()
+    spec["entities"]["Address"].count = 5
+    generator = Generator(spec)
+    output = generator.generate(counts={"Person": 4})
+    persons = output["Person"]
+    # every person creates a partner
+    assert len(persons) == 8
+    assert len(output["Address"]) == 5
+    assert generator.stats.total_rows == sum(len(rows) for rows in output.values())
+
+
+def test_counts_of_unknown_entity_raise(load_spec):
+    generator = Generator(load_spec())
+    with pytest.raises(ConfigurationError):
+        generator.generate(counts={"Unknown": 1})
+
+
+def test_generate_batched(load_spec):
+    generator = Generator(load_spec())
+    output = generator.generate_batched(
+        counts={"Person": 25, "Address": 4, "AddressHistory": 0}, batch_size=10
+    )
+    assert len(output["Address"]) == 4
+    assert len(output["Person"]) == 50
+    address_ids = {a["address_id"] for a in output["Address"]}
+    assert {p["address_id"] for p in output["Person"]} <= address_ids
+    assert generator.stats.rows["Person"] == 50
+    assert generator.stats.rows_per_second > 0
+
+
+def test_iter_rows_releases_batches(load_spec, monkeypatch):
+    generator = Generator(load_spec())
+    instances_of_batches = []
+    make_instances = generator.make_instances
+
+    def spy(*args, **kwargs):
+        instances = make_instances(*args, **kwargs)
+        instances_of_batches.append([weakref.ref(i) for i in instances])
+        return instances
+
+    monkeypatch.setattr(generator, "make_instances", spy)
+    batches = generator.iter_batches(
+        counts={"Person": 3, "Address": 2, "AddressHistory": 0}, batch_size=1
+    )
+    rows = next(batches)
+    assert {ename for ename, _ in rows} == {"Address"}
+    rows += next(batches)
+    kept, first_persons = instances_of_batches
+    assert all(ref() is not None for ref in kept)
+    # the first batch of persons is released as soon as its rows are returned
+    assert all(ref() is None for ref in first_persons)
+    for batch in batches:
+        rows += batch
+    persons = [row for ename, row in rows if ename == "Person"]
+    assert len(persons) == 6
+    assert all(set(row) >= {"person_id", "address_id"} for row in persons)
+    assert generator.stats.total_rows == len(rows)
+
+
+def test_lazy_generation_skips_fields_which_are_not_output(monkeypatch, load_spec):
+    columns = {"Person": ["person_id", "address_string"]}
+    counts = {"Person": 5, "Address": 3}
+    eager = Generator(load_spec(), seed=4).generate(False, counts=counts)
+    spec = load_spec()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("name must not be generated")
+
+    monkeypatch.setattr(
+        spec["entities"]["Person"].fields["name"], "generate_seeded", fail
+    )
+    lazy = Generator(spec, seed=4, lazy=True).generate(False, counts, columns)
+    assert lazy["Person"] == [
+        {f: p[f] for f in columns["Person"]} for p in eager["Person"]
+    ]
+    assert lazy["Address"] == eager["Address"]
+    rows = Generator(spec, seed=4, lazy=True).generate_batched(
+        counts=counts, columns=columns, batch_size=2
+    )
+    assert sorted(rows["Person"], key=str) == sorted(lazy["Person"], key=str)
+
+
+def test_unknown_columns_raise(load_spec):
+    with pytest.raises(ConfigurationError):
+        Generator(load_spec()).generate(columns={"Person": ["unknown"]})
+    with pytest.raises(ConfigurationError):
+        Generator(load_spec(), backend="columnar", lazy=True)
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_fields_which_are_not_needed_are_pruned(backend, monkeypatch, load_spec):
+    columns = {"Person": ["person_id", "address_id"], "Address": ["address_id"]}
+    counts = {"Person": 5, "Address": 3}
+    full = Generator(load_spec(), backend, seed=2).generate(False, counts=counts)
+    spec = load_spec()
+    person_fields = spec["entities"]["Person"].fields
+    address_fields = spec["entities"]["Address"].fields
+    for field in [person_fields["name"], address_fields["full_address"]]:
+        # calling a pruned field fails
+        monkeypatch.setattr(field, "generate_batch", None)
+        monkeypatch.setattr(field, "generate_seeded", None)
+    generator = Generator(spec, backend, seed=2)
+    output = generator.generate(False, counts, columns)
+    for ename, fields in columns.items():
+        assert output[ename] == [{f: row[f] for f in fields} for row in full[ename]]
+    # the partner relation creates persons, so it is kept
+    assert set(generator.entities["Person"].fields) == {
+        "person_id",
+        "address_id",
+        "current_address",
+        "address_history",
+        "partner",
+    }
+
+
+def test_make_relations_visits_each_instance_once(load_spec):
+    generator = Generator(load_spec(), seed=5)
+    generator.complete_relation_specs(generator.spec["entities"])
+    roots = generator.make_instances({"Person": 4, "Address": 2})
+    instances = generator.make_relations(roots)
+    assert len(roots) == 6
+    assert instances[:6] == roots
+    assert len({id(instance) for instance in instances}) == len(instances)
+    assert all(rel.defined for i in instances for rel in i.relations())
+
+
+def test_generate_delta_picks_existing_rows(load_spec):
+    counts = {"Person": 4, "Address": 3, "AddressHistory": 0}
+    existing = Generator(load_spec(), seed=6).generate(False, counts=counts)
+    generator = Generator(load_spec(), seed=6)
+    delta = generator.generate_delta(existing, counts={"Person": 5})
+    assert set(delta) <= {"Person", "AddressHistory"}
+    # every new person creates a partner
+    assert len(delta["Person"]) == 10
+    address_ids = {a["address_id"] for a in existing["Address"]}
+    assert {p["address_id"] for p in delta["Person"]} <= address_ids
+    old_ids = {p["person_id"] for p in existing["Person"]}
+    assert not old_ids & {p["person_id"] for p in delta["Person"]}
+    assert generator.generate_delta(existing, counts={"Person": 5}) == delta
+    with pytest.raises(ConfigurationError):
+        generator.generate_delta({"Unknown": []}, counts={"Person": 1})
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_related_objects_are_output_as_row_references(backend, load_spec):
+    counts = {"Person": 3, "Address": 2, "AddressHistory": 0}
+    generator = Generator(load_spec(), backend=backend, seed=7)
+    output = generator.generate("references", counts=counts)
+    assert output == Generator(load_spec(), backend=backend, seed=7).generate(
+        "references", counts=counts
+    )
+    for person in output["Person"]:
+        address = person["current_address"]
+        assert address.entity == "Address"
+        assert output["Address"][address.index]["address_id"] == person["address_id"]
+        partner = output["Person"][person["partner"].index]
+        assert output["Person"][partner["partner"].index] is person
+    flat = Generator(load_spec(), backend=backend, seed=7).generate(False, counts)
+    assert [p["name"] for p in flat["Person"]] == [p["name"] for p in output["Person"]]
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_embedded_related_objects_are_shared(backend, load_spec):
+    counts = {"Person": 3, "Address": 1, "AddressHistory": 0}
+    output = Generator(load_spec(), backend=backend, seed=8).generate(counts=counts)
+    address = output["Address"][0]
+    assert all(p["current_address"] is address for p in output["Person"])
+    person = output["Person"][0]
+    assert person["partner"]["partner"] is person
+
+
+def test_flat_dict_does_not_shadow_dict_with_related_objects(load_spec):
+    generator = Generator(load_spec(), seed=9)
+    generator.complete_relation_specs(generator.spec["entities"])
+    roots = generator.make_instances({"Person": 1, "Address": 1})
+    instances = generator.make_relations(roots)
+    person = next(i for i in instances if i.entity.name == "Person")
+    assert "partner" not in person.to_dict(with_related_objects=False)
+    assert person.to_dict()["partner"]["partner"] is person.to_dict()
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_batched_sequences_equal_generate(backend):
+    spec = SpecParser().parse(
+        {
+            "entities": {
+                "Order": {
+                    "fields": {
+                        "order_id": {"type": "integer", "mock": {"sequence": None}},
+                        "shop": {
+                            "type": "relation",
+                            "relation_type": "mt1",
+                            "to": "Shop.shop_id",
+                            "local_field": "shop_id",
+                            "mock": {"relation_strategy": "pick_random"},
+                        },
+                    }
+                },
+                "Shop": {
+                    "fields": {
+                        "shop_id": {"type": "integer", "mock": {"sequence": None}}
+                    }
+                },
+            }
+        }
+    )
+    counts = {"Order": 10, "Shop": 3}
+    generator = Generator(spec, backend=backend, seed=1)
+    expected = generator.generate(False, counts=counts)
+    assert [o["order_id"] for o in expected["Order"]] == list(range(1, 11))
+    for batch_size in (1, 3, 100):
+        rows = generator.generate_batched(counts=counts, batch_size=batch_size)
+        assert rows == expected
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_batches_pick_targets_created_in_the_same_batch(backend):
+    def create(target):
+        return {
+            "type": "relation",
+            "relation_type": "1tm",
+            "to": f"{target}.{target.lower()}_id",
+            "remote_name": "a",
+            "local_field": "a_id",
+            "mock": {"relation_strategy": "create(1, 2)"},
+        }
+
+    # A creates B and C, and C picks a B, which is not kept
+    spec = SpecParser().parse(
+        {
+            "entities": {
+                "A": {"fields": {"bs": create("B"), "cs": create("C")}},
+                "B": {
+                    "count": 0,
+                    "fields": {"b_id": {"type": "integer", "primary_key": True}},
+                },
+                "C": {
+                    "count": 0,
+                    "fields": {
+                        "b": {
+                            "type": "relation",
+                            "relation_type": "mt1",
+                            "to": "B.b_id",
+                            "local_field": "b_id",
+                            "mock": {"relation_strategy": "pick_random"},
+                        },
+                    },
+                },
+            }
+        }
+    )
+    outputs = []
+    for workers in (1, 2):
+        generator = Generator(spec, backend=backend, seed=1)
+        batches = generator.iter_batches({"A": 10}, batch_size=3, workers=workers)
+        outputs.append(list(batches))
+    assert outputs[0] == outputs[1]
+    for rows in outputs[0]:
+        b_ids = {row["b_id"] for ename, row in rows if ename == "B"}
+        assert {row["b_id"] for ename, row in rows if ename == "C"} <= b_ids
+    assert sum(1 for rows in outputs[0] for ename, _ in rows if ename == "C") > 0
+
+
+def test_generate_delta_continues_sequences(load_spec):
+    spec = load_spec()
+    spec["entities"]["Address"].fields["address_id"] = SpecParser.value_spec_from_dict(
+        {"type": "integer", "mock": {"sequence": {"start": 100}}}, "address_id"
+    )
+    counts = {"Person": 0, "Address": 3, "AddressHistory": 0}
+    existing = Generator(spec, seed=2).generate(False, counts=counts)
+    assert [a["address_id"] for a in existing["Address"]] == [100, 101, 102]
+    delta = Generator(spec, seed=2).generate_delta(existing, counts={"Address": 2})
+    assert [a["address_id"] for a in delta["Address"]] == [103, 104]
@@ -0,0 +1,56 @@
+import pytest
+
+from factory_boss.errors import InvalidReferenceError
+from factory_boss.generator import Generator
+from factory_boss.grammar import parse_code
+from factory_boss.spec_parser.parser import SpecParser
+
+
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        (
+            "$street $no, $city",
+            (("street", None), " ", ("no", None), ", ", ("city", None)),
+        ),
+        ("$postcode[:4]", (("postcode", slice(None, 4)),)),
+        ("$a.b[-1].", (("a.b", -1), ".")),
+        ("${ SELF.a }b", (("SELF.a", None), "b")),
+        ("$x [1] $y. z", (("x", None), " [1] ", ("y", None), ". z")),
+        (r"5\$ and \\", ("5$ and \\",)),
+        ("$a[1:10:2]", (("a", slice(1, 10, 2)),)),
+    ],
+)
+def test_parse_code(code, expected):
+    assert parse_code(code) == expected
+
+
+@pytest.mark.parametrize("code", ["$", "costs 5$", "$ x", "${x", "$a[1].b"])
+def test_invalid_code_raises(code):
+    with pytest.raises(InvalidReferenceError):
+        parse_code(code)
+
+
+def test_parsing_is_memoized():
+    parse_code.cache_clear()
+    parse_code("$a $b")
+    parse_code("$a $b")
+    assert parse_code.cache_info().hits == 1
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_slice_in_generated_values(backend):
+    spec = SpecParser().parse(
+        {
+            "entities": {
+                "Address": {
+                    "fields": {
+                        "postcode": {"type": "string", "mock": "1234AB"},
+                        "postcode4": {"type": "string", "mock": "$postcode[:4]"},
+                    }
+                }
+            }
+        }
+    )
+    output = Generator(spec, backend=backend).generate(counts={"Address": 1})
+    assert output["Address"][0]["postcode4"] == "1234"
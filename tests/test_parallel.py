@@ -0,0 +1,131 @@
+import multiprocessing
+
+import pytest
+
+from factory_boss.generator import Generator
+from factory_boss.spec_parser.parser import SpecParser
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_parallel_output_does_not_depend_on_workers(backend, load_spec):
+    counts = {"Person": 40, "Address": 3}
+    outputs = []
+    for workers in (1, 2):
+        generator = Generator(load_spec(), backend=backend, seed=1)
+        rows = generator.iter_rows(counts=counts, batch_size=7, workers=workers)
+        outputs.append(list(rows))
+    assert outputs[0] == outputs[1]
+    persons = [row for ename, row in outputs[0] if ename == "Person"]
+    assert len(persons) == 80
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_sequence_ids_are_unique_across_workers(backend, load_spec):
+    spec = load_spec()
+    person = spec["entities"]["Person"]
+    person.fields["person_id"] = SpecParser.value_spec_from_dict(
+        {"type": "integer", "mock": {"sequence": None}}, "person_id"
+    )
+    counts = {"Person": 40, "Address": 3}
+    outputs = []
+    for workers in (1, 2):
+        generator = Generator(spec, backend=backend, seed=1)
+        rows = generator.iter_rows(counts=counts, batch_size=7, workers=workers)
+        outputs.append(list(rows))
+    assert outputs[0] == outputs[1]
+    ids = [row["person_id"] for ename, row in outputs[0] if ename == "Person"]
+    assert len(set(ids)) == len(ids) == 80
+    partner_ids = {row["partner_id"] for ename, row in outputs[0] if ename == "Person"}
+    assert partner_ids == set(ids)
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_unique_fakers_are_unique_across_workers(backend, load_spec):
+    spec = load_spec()
+    # 80 of 150 possible values, so that batches repeat values of other batches
+    spec["entities"]["Person"].fields["name"] = SpecParser.value_spec_from_dict(
+        {
+            "type": "integer",
+            "unique": True,
+            "mock": {"faker": {"pyint": {"min_value": 0, "max_value": 149}}},
+        },
+        "name",
+    )
+    counts = {"Person": 40, "Address": 3}
+    outputs = []
+    for workers in (1, 2):
+        generator = Generator(spec, backend=backend, seed=1)
+        rows = generator.iter_rows(counts=counts, batch_size=7, workers=workers)
+        outputs.append(list(rows))
+    assert outputs[0] == outputs[1]
+    names = [row["name"] for ename, row in outputs[0] if ename == "Person"]
+    assert len(set(names)) == len(names) == 80
+
+
+def chained_picks_spec():
+    """ Persons pick addresses, which pick cities, both weighted """
+    return SpecParser().parse(
+        {
+            "entities": {
+                "City": {
+                    "count": 4,
+                    "fields": {
+                        "city_id": {"type": "integer", "mock": {"sequence": None}},
+                        "population": {
+                            "type": "integer",
+                            "mock": {"faker": {"pyint": {"max_value": 100}}},
+                        },
+                    },
+                },
+                "Address": {
+                    "count": 6,
+                    "fields": {
+                        "address_id": {"type": "integer", "mock": {"sequence": None}},
+                        "size": {"type": "integer", "mock": 2},
+                        "city": {
+                            "type": "relation",
+                            "relation_type": "mt1",
+                            "to": "City.city_id",
+                            "local_field": "city_id",
+                            "mock": {
+                                "relation_strategy": "pick_random",
+                                "relation_strategy_options": {
+                                    "weight_field": "population"
+                                },
+                            },
+                        },
+                    },
+                },
+                "Person": {
+                    "count": 30,
+                    "fields": {
+                        "name": {"type": "string", "mock": {"faker": "name"}},
+                        "address": {
+                            "type": "relation",
+                            "relation_type": "mt1",
+                            "to": "Address.address_id",
+                            "local_field": "address_id",
+                            "mock": {
+                                "relation_strategy": "pick_random",
+                                "relation_strategy_options": {"weight_field": "size"},
+                            },
+                        },
+                    },
+                },
+            }
+        }
+    )
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_parallel_output_with_spawned_workers(backend):
+    # spawned workers receive the runner, including its target indices, pickled
+    outputs = []
+    for workers, mp_context in ((1, None), (2, multiprocessing.get_context("spawn"))):
+        generator = Generator(chained_picks_spec(), backend=backend, seed=1)
+        rows = generator.iter_rows(batch_size=7, workers=workers, mp_context=mp_context)
+        outputs.append(list(rows))
+    assert outputs[0] == outputs[1]
+    persons = [row for ename, row in outputs[0] if ename == "Person"]
+    assert len(persons) == 30
+    assert {row["address_id"] for row in persons} <= set(range(1, 7))
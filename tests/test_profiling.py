@@ -0,0 +1,36 @@
+import pytest
+
+from factory_boss.generator import Generator
+from factory_boss.profiling import Profiler
+from factory_boss.scripts.generate import main
+from factory_boss.spec_cache import load_spec
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_profiler_records_phases_fields_and_created_instances(backend):
+    profiler = Profiler()
+    generator = Generator(
+        load_spec("examples/simple_schema.yaml", use_cache=False),
+        backend=backend,
+        profiler=profiler,
+    )
+    output = generator.generate(counts={"Person": 4, "Address": 2})
+    assert profiler.phases["make_relations"].calls == 1
+    assert profiler.phases["instances_to_dict"].seconds > 0
+    assert profiler.fields["Person", "name"].calls == len(output["Person"])
+    assert profiler.specs["FakerField(name)"].calls >= len(output["Person"])
+    assert profiler.created["Person.partner"] == 4
+    assert profiler.entities()["Address"].calls > 0
+    assert set(profiler.to_dict()) == {
+        "phases",
+        "entities",
+        "fields",
+        "specs",
+        "created",
+    }
+
+
+def test_profile_flag_prints_report(capsys):
+    main(["examples/simple_schema.yaml", "--profile", "--no-cache"])
+    err = capsys.readouterr().err
+    assert "Phases" in err and "Created instances" in err
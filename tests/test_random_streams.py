@@ -0,0 +1,56 @@
+import pytest
+
+from factory_boss.generator import Generator
+from factory_boss.random_streams import value_seeds
+from factory_boss.value_spec import TypeFakerSpec
+
+
+def generate(spec, backend, seed=1, counts=None):
+    generator = Generator(spec, backend=backend, seed=seed)
+    return generator.generate(output_with_related_objects=False, counts=counts)
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_same_seed_same_output(backend, load_spec):
+    spec = load_spec()
+    assert generate(spec, backend, seed=1) == generate(spec, backend, seed=1)
+    assert generate(spec, backend, seed=1) != generate(spec, backend, seed=2)
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_rows_do_not_depend_on_other_rows(backend, load_spec):
+    few = generate(load_spec(), backend, counts={"Person": 3})
+    many = generate(load_spec(), backend, counts={"Person": 5})
+    assert many["Person"][:3] == few["Person"][:3]
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_adding_a_field_does_not_change_other_fields(backend, load_spec):
+    before = generate(load_spec(), backend)
+    spec = load_spec()
+    spec["entities"]["Person"].add_field(
+        "nickname", TypeFakerSpec.create_faker_for_type("string", "nickname")
+    )
+    after = generate(spec, backend)
+    for person_before, person_after in zip(before["Person"], after["Person"]):
+        nickname = person_after.pop("nickname")
+        assert isinstance(nickname, str)
+        assert person_after == person_before
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_batched_output_does_not_depend_on_batch_size(backend, load_spec):
+    outputs = []
+    for batch_size in (1, 4):
+        generator = Generator(load_spec(), backend=backend, seed=1)
+        output = generator.generate_batched(counts={"Person": 9}, batch_size=batch_size)
+        outputs.append({e: sorted(map(str, rows)) for e, rows in output.items()})
+    assert outputs[0] == outputs[1]
+
+
+def test_seeded_values_are_the_same_in_batches():
+    spec = TypeFakerSpec.create_faker_for_type("string", "s")
+    seeds = value_seeds(range(100), "s")
+    batch = spec.generate_batch(len(seeds), seeds=seeds)
+    assert batch == [spec.generate_seeded({}, seed) for seed in seeds]
+    assert len(set(batch)) == len(batch)
@@ -0,0 +1,77 @@
+import pytest
+
+from factory_boss.entity import Entity
+from factory_boss.errors import InvalidReferenceError
+from factory_boss.reference_resolver import ReferenceResolver, compile_path
+from factory_boss.value_spec import Constant, DynamicField
+
+
+def test_references_are_resolved_through_compiled_paths():
+    path = compile_path("SELF.address.city")
+    assert compile_path("SELF.address.city") is path
+    assert (path.hops, path.field) == (("address",), "city")
+    assert compile_path("SELF").field is None
+
+    address = Entity("Address", {"city": Constant("string", "Berlin")})
+    person = Entity(
+        "Person",
+        {
+            "address": Constant("relation", None),
+            "greeting": DynamicField("Hi from $address.city", type="string"),
+            "typo": DynamicField("$address.town", type="string"),
+        },
+    )
+    home = address.make_instance({})
+    someone = person.make_instance({})
+    someone.instance_values["address"].override_value(home)
+    assert path.resolve(someone) is home.instance_values["city"]
+    assert someone.value("greeting") == "Hi from Berlin"
+    with pytest.raises(InvalidReferenceError):
+        someone.value("typo")
+
+
+def test_reference_resolver_is_deprecated():
+    address = Entity("Address", {"city": Constant("string", "Berlin")})
+    person = Entity(
+        "Person",
+        {
+            "address": Constant("relation", None),
+            "greeting": DynamicField("Hi from $address.city", type="string"),
+        },
+    )
+    home = address.make_instance({})
+    someone = person.make_instance({})
+    someone.instance_values["address"].override_value(home)
+    with pytest.deprecated_call():
+        resolver = ReferenceResolver()
+    resolver.resolve_references([home, someone])
+    greeting = someone.instance_values["greeting"]
+    targets = resolver.resolve_references_of_instance_value(greeting)
+    assert targets == {"address.city": home.instance_values["city"]}
+
+
+def test_references_are_bound_once_per_spec():
+    address = Entity("Address", {"city": Constant("string", "Berlin")})
+    greeting = DynamicField("Hi from $address.city", type="string")
+    person = Entity(
+        "Person",
+        {
+            "address": Constant("relation", None),
+            "greeting": greeting,
+            "shout": DynamicField("$greeting!", type="string"),
+        },
+    )
+    bound = greeting.bound_references()
+    assert greeting.bound_references() is bound
+    for city in ("Berlin", "Paris"):
+        home = address.make_instance({})
+        home.instance_values["city"].override_value(city)
+        someone = person.make_instance({})
+        someone.instance_values["address"].override_value(home)
+        # targets resolved while planning are used once, then dropped
+        ivalue = someone.instance_values["greeting"]
+        assert ivalue.resolved_targets(keep=True) == [home.instance_values["city"]]
+        # evaluates `greeting` on demand, while `shout` is being evaluated
+        assert someone.value("shout") == f"Hi from {city}!"
+        assert ivalue._targets is None
+    assert greeting.bound_references() is bound
@@ -0,0 +1,199 @@
+import asyncio
+import csv
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from factory_boss.errors import ConfigurationError
+from factory_boss.generator import Generator
+from factory_boss.sinks import DatabaseSink, load_order, make_sink
+from factory_boss.spec_parser.parser import SpecParser
+
+
+def write(spec, tmp_path, format):
+    generator = Generator(spec, seed=1)
+    with make_sink(format, str(tmp_path), chunk_size=4) as sink:
+        generator.write(sink, counts={"Person": 10, "Address": 3}, batch_size=3)
+    assert sink.rows_written["Person"] == 20
+    return generator.generate_batched(counts={"Person": 10, "Address": 3}, batch_size=3)
+
+
+def test_csv_sink(tmp_path, load_spec):
+    expected = write(load_spec(), tmp_path, "csv")
+    with open(tmp_path / "Person.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["name"] for row in rows] == [p["name"] for p in expected["Person"]]
+    assert set(rows[0]) == set(expected["Person"][0])
+
+
+def test_json_lines_sink(tmp_path, load_spec):
+    expected = write(load_spec(), tmp_path, "jsonl")
+    with open(tmp_path / "Address.jsonl") as f:
+        rows = [json.loads(line) for line in f]
+    assert rows == expected["Address"]
+
+
+def test_parquet_sink(tmp_path, load_spec):
+    pq = pytest.importorskip("pyarrow.parquet")
+    expected = write(load_spec(), tmp_path, "parquet")
+    table = pq.read_table(tmp_path / "Person.parquet")
+    assert table.num_rows == 20
+    assert table.column("age").to_pylist() == [p["age"] for p in expected["Person"]]
+
+
+def test_parquet_sink_types_columns_which_start_with_none(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    rows = [{"id": i, "nickname": None} for i in range(5)]
+    rows += [{"id": 5, "nickname": "Bob"}, {"id": 6, "nickname": None}]
+    with make_sink("parquet", str(tmp_path), chunk_size=2) as sink:
+        sink.write_rows("Person", rows)
+    table = pq.read_table(tmp_path / "Person.parquet")
+    assert str(table.schema.field("nickname").type) == "string"
+    assert table.to_pylist() == rows
+
+
+def test_unknown_format_raises(tmp_path):
+    with pytest.raises(ConfigurationError):
+        make_sink("xml", str(tmp_path))
+
+
+def test_load_order(load_spec):
+    order = load_order(load_spec()["entities"])
+    assert order.index("Address") < order.index("Person")
+    assert order.index("Address") < order.index("AddressHistory")
+
+
+def test_database_sink(tmp_path, load_spec):
+    spec = load_spec()
+    connection = sqlite3.connect(str(tmp_path / "test.db"))
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(
+        """
+        CREATE TABLE Address (
+            address_id INTEGER PRIMARY KEY, postcode TEXT, postcode4 TEXT,
+            street TEXT, housenumber TEXT, full_address TEXT
+        );
+        CREATE TABLE Person (
+            person_id TEXT, name TEXT, birthday DATE, age INTEGER,
+            address_string TEXT, partner_id TEXT, adress_history_id INTEGER,
+            address_id INTEGER REFERENCES Address(address_id)
+        );
+        """
+    )
+    generator = Generator(spec, seed=1)
+    rows = generator.generate_batched(counts={"Person": 10, "Address": 3})
+    sink = DatabaseSink(connection, spec["entities"], chunk_size=8)
+    # some persons first: the sink must still insert the addresses before them
+    sink.write_rows("Person", rows["Person"][:5])
+    sink.write_rows("Address", rows["Address"])
+    sink.write_rows("Person", rows["Person"][5:])
+    sink.close()
+    assert sink.rows_written == {"Address": 3, "Person": 20}
+    (n,) = connection.execute(
+        "SELECT COUNT(*) FROM Person JOIN Address USING (address_id)"
+    ).fetchone()
+    assert n == 20
+    connection.close()
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_database_sink_inserts_created_targets_first(backend, asynchronous):
+    # every A creates the B it references, after the row of the A is yielded
+    spec = SpecParser().parse(
+        {
+            "entities": {
+                "A": {
+                    "fields": {
+                        "a_id": {"type": "integer", "primary_key": True},
+                        "b": {
+                            "type": "relation",
+                            "relation_type": "mt1",
+                            "to": "B.b_id",
+                            "local_field": "b_id",
+                            "mock": {"relation_strategy": "create"},
+                        },
+                    }
+                },
+                "B": {
+                    "count": 0,
+                    "fields": {"b_id": {"type": "integer", "primary_key": True}},
+                },
+            }
+        }
+    )
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(
+        """
+        CREATE TABLE B (b_id INTEGER PRIMARY KEY);
+        CREATE TABLE A (
+            a_id INTEGER PRIMARY KEY, b_id INTEGER NOT NULL REFERENCES B(b_id)
+        );
+        """
+    )
+    generator = Generator(spec, backend=backend, seed=1)
+    # batches span several chunks
+    with DatabaseSink(connection, spec["entities"], chunk_size=5) as sink:
+        if asynchronous:
+            with ThreadPoolExecutor(1) as executor:
+                write = generator.awrite(
+                    sink, counts={"A": 23}, batch_size=10, executor=executor
+                )
+                asyncio.run(write)
+        else:
+            generator.write(sink, counts={"A": 23}, batch_size=10)
+    assert sink.rows_written == {"A": 23, "B": 23}
+    (n,) = connection.execute("SELECT COUNT(*) FROM A JOIN B USING (b_id)").fetchone()
+    assert n == 23
+    connection.close()
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_database_sink_inserts_parents_of_created_children_first(backend):
+    # the foreign key is on the remote side of the one-to-many relation
+    spec = SpecParser().parse(
+        {
+            "entities": {
+                "Child": {
+                    "count": 0,
+                    "fields": {
+                        "child_id": {"type": "integer", "primary_key": True},
+                        "parent_id": {"type": "integer", "mock": "$parent.parent_id"},
+                    },
+                },
+                "Parent": {
+                    "fields": {
+                        "parent_id": {"type": "integer", "primary_key": True},
+                        "children": {
+                            "type": "relation",
+                            "relation_type": "1tm",
+                            "to": "Child.parent_id",
+                            "local_field": "parent_id",
+                            "remote_name": "parent",
+                            "mock": {"relation_strategy": "create(2)"},
+                        },
+                    }
+                },
+            }
+        }
+    )
+    assert load_order(spec["entities"]) == ["Parent", "Child"]
+    connection = sqlite3.connect(":memory:")
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(
+        """
+        CREATE TABLE Parent (parent_id INTEGER PRIMARY KEY);
+        CREATE TABLE Child (
+            child_id INTEGER PRIMARY KEY,
+            parent_id INTEGER NOT NULL REFERENCES Parent(parent_id)
+        );
+        """
+    )
+    generator = Generator(spec, backend=backend, seed=1)
+    with DatabaseSink(connection, spec["entities"], chunk_size=3) as sink:
+        generator.write(sink, counts={"Parent": 7}, batch_size=4)
+    assert sink.rows_written == {"Parent": 7, "Child": 14}
+    connection.close()
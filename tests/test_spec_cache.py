@@ -0,0 +1,33 @@
+import os
+
+from factory_boss.generator import Generator
+from factory_boss.spec_cache import load_spec
+
+SCHEMA = "examples/simple_schema.yaml"
+
+
+def test_cached_spec_generates_the_same_rows(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cold = load_spec(SCHEMA, cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    warm = load_spec(SCHEMA, cache_dir)
+    assert warm is not cold
+    assert set(warm["entities"]["Address"].fields) == set(
+        cold["entities"]["Address"].fields
+    )
+    uncached = load_spec(SCHEMA, use_cache=False)
+    outputs = [
+        Generator(spec, seed=1).generate(False) for spec in [cold, warm, uncached]
+    ]
+    assert outputs[0] == outputs[1] == outputs[2]
+
+
+def test_corrupt_cache_entries_are_replaced(tmp_path):
+    cache_dir = str(tmp_path)
+    load_spec(SCHEMA, cache_dir)
+    (name,) = os.listdir(cache_dir)
+    with open(os.path.join(cache_dir, name), "wb") as f:
+        f.write(b"garbage")
+    spec = load_spec(SCHEMA, cache_dir)
+    assert "Person" in spec["entities"]
+    assert load_spec(SCHEMA, cache_dir)["entities"].keys() == spec["entities"].keys()
@@ -0,0 +1,137 @@
+import pickle
+from collections import Counter
+
+import pytest
+
+import factory_boss.generator
+from factory_boss.errors import ConfigurationError
+from factory_boss.generator import Generator
+from factory_boss.random_streams import value_seeds
+from factory_boss.spec_parser.parser import SpecParser
+from factory_boss.target_index import PickOptions, TargetIndex
+
+SEEDS = value_seeds(range(20_000), "pick")
+
+
+def test_uniform_picks():
+    index = TargetIndex(PickOptions())
+    index.extend(10)
+    picks = index.pick_many(SEEDS)
+    assert picks == [index.pick(seed) for seed in SEEDS]
+    assert set(picks) == set(range(10))
+
+
+def test_zipf_and_weighted_picks():
+    index = TargetIndex(PickOptions(distribution="zipf", exponent=2))
+    index.extend(4)
+    counts = Counter(index.pick_many(SEEDS))
+    assert counts[0] > 3.5 * counts[1] > 1.5 * 3.5 * counts[2]
+
+    weights = [0, 2, 0, 1]
+    index = TargetIndex(PickOptions(weight_field="w"), weights.__getitem__)
+    index.extend(4)
+    counts = Counter(index.pick_many(SEEDS))
+    assert set(counts) == {1, 3}
+    assert 1.8 < counts[1] / counts[3] < 2.2
+
+
+@pytest.mark.parametrize("distribution", ["uniform", "zipf"])
+def test_picks_without_replacement(distribution):
+    index = TargetIndex(PickOptions(distribution=distribution, replace=False))
+    index.extend(50)
+    picks = index.pick_many(SEEDS[:50])
+    assert sorted(picks) == list(range(50))
+    with pytest.raises(ConfigurationError):
+        index.pick(SEEDS[50])
+    index.extend(51)
+    assert index.pick(SEEDS[50]) == 50
+
+
+def test_weighted_picks_without_replacement_never_repeat():
+    # after all targets are picked, rounding errors leave a positive total
+    weights = [0.1, 0.2, 0.7]
+    options = PickOptions(weight_field="w", replace=False)
+    index = TargetIndex(options, weights.__getitem__)
+    index.extend(3)
+    picks = [index.pick(seed) for seed in SEEDS[:3]]
+    assert sorted(picks) == [0, 1, 2]
+    with pytest.raises(ConfigurationError):
+        index.pick(SEEDS[3])
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"distribution": "normal"}, {"exponent": 0}, {"replace": "no"}, {"other": 1}],
+)
+def test_invalid_options_raise(options):
+    with pytest.raises(ConfigurationError):
+        PickOptions.from_dict(options)
+
+
+def shop_spec(options):
+    return SpecParser().parse(
+        {
+            "entities": {
+                "Customer": {
+                    "count": 30,
+                    "fields": {
+                        "id": {"type": "integer"},
+                        "vip": {"type": "integer", "mock": 1},
+                    },
+                },
+                "Order": {
+                    "count": 30,
+                    "fields": {
+                        "customer": {
+                            "type": "relation",
+                            "relation_type": "1t1",
+                            "to": "Customer.id",
+                            "local_field": "customer_id",
+                            "mock": {
+                                "relation_strategy": "pick_random",
+                                "relation_strategy_options": options,
+                            },
+                        }
+                    },
+                },
+            }
+        }
+    )
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_one_to_one_without_replacement(backend):
+    spec = shop_spec({"replace": False, "weight_field": "vip"})
+    output = Generator(spec, backend=backend, seed=3).generate()
+    customers = [order["customer"]["id"] for order in output["Order"]]
+    assert sorted(customers) == sorted(c["id"] for c in output["Customer"])
+
+
+def test_without_replacement_is_not_supported_in_batches():
+    generator = Generator(shop_spec({"replace": False}))
+    with pytest.raises(ConfigurationError):
+        generator.generate_batched()
+
+
+def test_invalid_weight_field_raises():
+    generator = Generator(shop_spec({"weight_field": "unknown"}))
+    with pytest.raises(ConfigurationError):
+        generator.generate()
+
+
+@pytest.mark.parametrize("backend", ["objects", "columnar"])
+def test_weighted_target_indices_can_be_pickled(backend, monkeypatch):
+    # the runner, including its target indices, is sent to worker processes
+    run_batches = factory_boss.generator.run_batches
+    pickled = []
+
+    def pickling_run_batches(runner, *args):
+        for rows in run_batches(runner, *args):
+            pickled.append(pickle.loads(pickle.dumps(runner)))
+            yield rows
+
+    monkeypatch.setattr(factory_boss.generator, "run_batches", pickling_run_batches)
+    generator = Generator(shop_spec({"weight_field": "vip"}), backend=backend, seed=3)
+    rows = list(generator.iter_rows(batch_size=10))
+    assert len(rows) == 60
+    assert len(pickled) == 4
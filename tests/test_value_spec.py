@@ -0,0 +1,168 @@
+import datetime
+
+import pytest
+
+from factory_boss.errors import (
+    ConfigurationError,
+    UniqueValueError,
+    UnresolvedReferenceError,
+)
+from factory_boss.spec_parser.parser import SpecParser
+from factory_boss.value_spec import (
+    Constant,
+    DynamicField,
+    FakerField,
+    IdField,
+    Literal,
+    SequenceField,
+    TypeFakerSpec,
+    UUIDField,
+)
+
+
+def test_type_faker_batches():
+    integers = TypeFakerSpec.create_faker_for_type("integer", "i").generate_batch(50)
+    assert len(integers) == 50
+    assert all(isinstance(i, int) and -1_000_000 <= i <= 1_000_000 for i in integers)
+
+    strings = TypeFakerSpec.create_faker_for_type("string", "s").generate_batch(50)
+    assert all(isinstance(s, str) and len(s) == 20 for s in strings)
+
+    dates = TypeFakerSpec.create_faker_for_type("date", "d").generate_batch(50)
+    assert all(datetime.date.fromisoformat(d) <= datetime.date.today() for d in dates)
+
+
+def test_seeded_dates_do_not_depend_on_today(monkeypatch):
+    pytest.importorskip("numpy")
+    spec = TypeFakerSpec.create_faker_for_type("date", "d")
+    dates = spec.generate_batch(50, seeds=list(range(50)))
+    assert max(dates) <= TypeFakerSpec.LAST_SEEDED_DATE.isoformat()
+
+    class Tomorrow(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.datetime.now(tz) + datetime.timedelta(days=1)
+
+    monkeypatch.setattr(datetime, "datetime", Tomorrow)
+    assert spec.generate_batch(50, seeds=list(range(50))) == dates
+
+
+def test_faker_and_constant_batches():
+    spec = FakerField("integer", "pyint", {"min_value": 3, "max_value": 5})
+    assert set(spec.generate_batch(100)) <= {3, 4, 5}
+    assert Constant("string", "x").generate_batch(3) == ["x", "x", "x"]
+    assert TypeFakerSpec.create_faker_for_type("integer", "i").generate_batch(0) == []
+
+
+def test_dynamic_field_compilation():
+    def evaluate(code):
+        field = DynamicField(code, type=None)
+        refs = {ref: Literal(ref.target.upper()) for ref in field.references()}
+        assert field.generate_value(refs) == field.interpret(refs)
+        return field.generate_value(refs)
+
+    assert evaluate(42) == 42
+    assert evaluate("a {b} c") == "a {b} c"
+    assert evaluate("$street") == "STREET"
+    assert evaluate("{$street} $no, $city") == "{STREET} NO, CITY"
+    assert evaluate("$street[:3]") == "STR"
+    assert evaluate("${street[-2:]}x") == "ETx"
+    with pytest.raises(UnresolvedReferenceError):
+        DynamicField("x $street", type=None).generate_value({})
+
+
+def test_unique_faker_values():
+    spec = FakerField("integer", "pyint", {"min_value": 0, "max_value": 59}, "n", True)
+    values = spec.generate_batch(50, seeds=list(range(50)))
+    assert len(set(values)) == 50
+    spec.reset()
+    assert [spec.generate_seeded({}, seed) for seed in range(50)] == values
+    spec.exclude(range(60))
+    with pytest.raises(UniqueValueError):
+        spec.generate_value({})
+
+    integers = TypeFakerSpec.create_faker_for_type("integer", "i", unique=True)
+    integers.faker_kwargs = {"min_value": 0, "max_value": 999}
+    assert len(set(integers.generate_batch(900, seeds=list(range(900))))) == 900
+
+
+def test_sequences_are_disjoint_across_shards():
+    spec = SequenceField(start=10, step=2)
+    assert spec.generate_batch(3) + [spec.generate_value({})] == [10, 12, 14, 16]
+    spec.reset()
+    shards = []
+    for shard in range(3):
+        spec.start_shard(shard, 3)
+        shards.append(spec.generate_batch(4))
+    values = sorted(v for shard in shards for v in shard)
+    assert values == list(range(10, 34, 2))
+    spec.reset()
+    spec.exclude([10, 15, None])
+    assert spec.generate_batch(2) == [16, 18]
+
+
+def test_sequences_number_root_rows_by_index():
+    spec = SequenceField(start=1)
+    spec.reset(range(4))
+    # created rows follow all root rows, whichever is generated first
+    assert spec.generate_indexed([3, None, 0]) == [4, 5, 1]
+    spec.start_shard(1, 2)
+    assert spec.generate_indexed([None, 2, None]) == [6, 3, 8]
+    spec.reset(range(5, 7))
+    spec.exclude([1, 8])
+    assert spec.generate_indexed([5, 6, None]) == [9, 10, 11]
+    with pytest.raises(ConfigurationError):
+        SequenceField(step=0)
+
+
+def test_seeded_ids():
+    ids = [IdField("integer").generate_seeded({}, seed) for seed in range(1000)]
+    assert len(set(ids)) == 1000
+    assert all(-(2 ** 63) <= i < 2 ** 63 for i in ids)
+    assert any(i < 0 for i in ids)
+    spec = IdField("integer")
+    assert len(set(spec.generate_batch(1000))) == 1000
+
+
+def test_seeded_uuids():
+    spec = UUIDField("string")
+    uuids = [spec.generate_seeded({}, seed) for seed in range(1000)]
+    assert len(set(uuids)) == 1000
+    assert uuids == [spec.generate_seeded({}, seed) for seed in range(1000)]
+    assert {u[14] for u in uuids} == {"4"}
+    assert {u[19] for u in uuids} <= set("89ab")
+    assert spec.generate_value({}) != spec.generate_value({})
+
+
+def test_id_fields_are_parsed():
+    fields = (
+        SpecParser()
+        .parse(
+            {
+                "entities": {
+                    "E": {
+                        "fields": {
+                            "id": {"type": "integer", "value_type": "id"},
+                            "uid": {"type": "string", "primary_key": True},
+                            "code": {
+                                "type": "integer",
+                                "mock": {"sequence": {"step": 5}},
+                            },
+                            "email": {
+                                "type": "string",
+                                "unique": True,
+                                "mock": {"faker": "email"},
+                            },
+                            "number": {"type": "integer", "unique": True},
+                        }
+                    }
+                }
+            }
+        )["entities"]["E"]
+        .fields
+    )
+    assert isinstance(fields["id"], IdField)
+    assert isinstance(fields["uid"], UUIDField)
+    assert fields["code"].step == 5
+    assert fields["email"].unique is not None
+    assert fields["number"].unique is not None